@@ -1,61 +1,330 @@
-"""Document processing service — extracts text from files."""
+"""Document processing service — extracts text from files.
 
+Any number of processes (or uvicorn --workers) can serve the same index; state is
+shared through the local SQLite store. SERVICE_ROLE splits the work:
+
+    all       serve queries and drain the indexing queue (default)
+    indexer   drain the indexing queue
+    query     serve queries; /process-file only enqueues for an indexer process
+"""
+
+import asyncio
 import os
-from typing import List
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from search import searchDB_initial, rankFiles
-
 # Load .env from project root (two levels up from services/python-services/)
+# before importing modules that read their configuration at import time
 dotenv_path = os.path.join(os.path.dirname(__file__), "../../.env")
 load_dotenv(dotenv_path)
 
-from indexing import uploadFileToPinecone
+from search import searchDB_initial, rankFiles
+from indexing import uploadFileToPinecone, deleteFromIndex
+from jobQueue import jobQueue, INDEX, DELETE, DONE, FAILED
 from parsers import FileProcessor
+from pineconeService import PineconeService
+import latencyBudget
+import profiling
+import queryTrace
+import shards
+from queryCache import queryCache
+from reconcile import reconcile
+from snippets import snippets, MAX_SNIPPETS
+from scheduler import scheduler
+from warmup import warmup
+
+jobQueue.register(INDEX, uploadFileToPinecone)
+jobQueue.register(DELETE, deleteFromIndex)
+
+SERVICE_ROLE = os.getenv("SERVICE_ROLE", "all")
+if SERVICE_ROLE not in ("all", "indexer", "query"):
+    raise ValueError(f"SERVICE_ROLE must be all, indexer or query, not {SERVICE_ROLE!r}")
+RUNS_INDEXER = SERVICE_ROLE in ("all", "indexer")
+
+# Heavy backends (parsers, vector store, LLM clients) load lazily by default.
+# LAZY_IMPORTS=0 restores eager loading, e.g. as a baseline for benchmarks/startup.py.
+if os.getenv("LAZY_IMPORTS", "1") == "0":
+    FileProcessor.preloadBackends()
+    import openai  # noqa: F401
+    import pinecone  # noqa: F401
+    from google import genai  # noqa: F401
+
+
+async def _warmAfterStartup():
+    # Give uvicorn a moment to bind the port so warm-up never delays "up"
+    await asyncio.sleep(float(os.getenv("WARMUP_DELAY_MS", "100")) / 1000)
+    warmup.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume work interrupted by a crash or restart, then start draining the queue.
+    # The content cache and index manifest persist, so unchanged files are skipped.
+    if RUNS_INDEXER:
+        jobQueue.recover()
+        jobQueue.start()
+    if os.getenv("WARM_ON_STARTUP", "1") == "1":
+        asyncio.create_task(_warmAfterStartup())
+    else:
+        warmup.skip()
+    yield
+    jobQueue.stop()
+    scheduler.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+PROFILE_HEADER = "X-Profile"
+
+
+def _requestedProfile(request: Request) -> str | None:
+    mode = request.headers.get(PROFILE_HEADER)
+    if mode is None or not profiling.PROFILING_ENABLED:
+        return None
+    if mode not in profiling.PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"{PROFILE_HEADER} must be one of {profiling.PROFILE_MODES}")
+    return mode
 
-app = FastAPI()
 
-# Clear the content cache at startup so each session starts fresh
-FileProcessor.clearCache()
+# Opt-in per-request profiling — the middleware only exists when PROFILING=1
+if profiling.PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profileRequests(request: Request, call_next):
+        mode = request.headers.get(PROFILE_HEADER)
+        if mode not in profiling.PROFILE_MODES:
+            return await call_next(request)
+
+        token = profiling.begin(mode, request.url.path.strip("/") or "root")
+        try:
+            response = await call_next(request)
+        finally:
+            artifacts = profiling.end(token)
+        response.headers["X-Profile-Artifacts"] = ",".join(os.path.basename(a) for a in artifacts)
+        return response
 
 
 class ProcessFileRequest(BaseModel):
     filePath: str
+    # Wait for the job to finish (the watcher relies on this for progress tracking)
+    wait: bool = True
+
+
+class ReconcileRequest(BaseModel):
+    roots: List[str]
+
+
+class ShardRequest(BaseModel):
+    root: str
+    # Defaults to a name derived from the root; several roots may share a shard
+    shard: Optional[str] = None
+
+
+class JobProgressRequest(BaseModel):
+    jobIds: List[int]
 
 
 class RankRequest(BaseModel):
     query: str
     filePaths: List[str]
+    # The roots the candidates' /search was scoped to, if any
+    roots: Optional[List[str]] = None
+
+
+class SnippetsRequest(BaseModel):
+    query: str
+    filePaths: List[str]
+    maxSnippets: int = MAX_SNIPPETS
 
 
+# Liveness — answers as soon as the port is bound
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "role": SERVICE_ROLE,
+        "queues": scheduler.stats(),
+        "jobs": await asyncio.to_thread(jobQueue.stats),
+        "embeddings": PineconeService().embeddingStats(),
+        "caches": {**queryTrace.cacheStats(), "queryCache": queryCache.stats()},
+        "latency": latencyBudget.tracker.stats(),
+    }
+
+
+# Readiness — 200 once clients are built and connections are warm (or right away,
+# as "cold", with WARM_ON_STARTUP=0), 503 until then
+@app.get("/ready")
+async def ready():
+    return JSONResponse(warmup.state(), status_code=200 if warmup.ready() else 503)
 
 
 # Called from watcher when a new file is added or modified
-# Synchronous so the caller knows when indexing is truly done
+# Enqueues a durable job; by default waits so the caller knows when indexing is truly done
 @app.post("/process-file")
-def process_file(request: ProcessFileRequest):
+async def process_file(request: ProcessFileRequest, http_request: Request):
     if not os.path.exists(request.filePath):
         raise HTTPException(status_code=404, detail=f"File not found: {request.filePath}")
 
-    uploadFileToPinecone(request.filePath)
-    return {"status": "processed", "file": request.filePath}
+    # The job runs outside this request, so a profile request travels on the job row.
+    # Job queue reads and writes can wait on another process's lock on index.db, so
+    # they run off the event loop (but not on the interactive lane — indexing would yield to them)
+    job_id = await asyncio.to_thread(jobQueue.enqueue, request.filePath, profile=_requestedProfile(http_request))
+    if not request.wait:
+        return {"status": "queued", "file": request.filePath, "jobId": job_id}
+
+    job = await jobQueue.waitFor(job_id)
+    if job is None or job["status"] == FAILED:
+        detail = job["error"] if job else "Job disappeared"
+        raise HTTPException(status_code=500, detail=f"Indexing failed for {request.filePath}: {detail}")
+
+    status = job["result"] if job["status"] == DONE else job["status"]
+    return {"status": status, "file": request.filePath, "jobId": job_id}
+
 
+# Called from watcher at startup — one bulk diff of the watched roots against the manifest,
+# enqueuing only added/changed/deleted files. Returns immediately; track jobIds via /jobs/progress
+@app.post("/reconcile")
+async def reconcile_roots(request: ReconcileRequest):
+    missing = [root for root in request.roots if not os.path.isdir(root)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Not a directory: {', '.join(missing)}")
 
-# Called from electron app — returns initial Pinecone results immediately (fast)
+    # Bulk maintenance, so it runs on the background lane (the crawl itself uses its own
+    # thread pool) — on the interactive lane, indexing would yield for the whole crawl
+    result = await scheduler.runBackground(reconcile, request.roots)
+    return {"status": "reconciled", **result}
+
+
+@app.post("/jobs/progress")
+async def jobs_progress(request: JobProgressRequest):
+    return await asyncio.to_thread(jobQueue.progress, request.jobIds)
+
+
+# Indexing progress — counts per status plus the most recent jobs
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    stats, jobs = await asyncio.gather(
+        asyncio.to_thread(jobQueue.stats), asyncio.to_thread(jobQueue.listJobs, status, limit)
+    )
+    return {**stats, "jobs": jobs}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    job = await asyncio.to_thread(jobQueue.getJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+# Called from electron app — returns initial Pinecone results immediately (fast).
+# ?roots=... searches only files under those roots (querying just their shards with INDEX_SHARDING=roots)
 @app.get("/search")
-async def searchDatabase(query: str):
-    results = await searchDB_initial(query)
-    return {"status": "searched", "query": query, "results": results}
+async def searchDatabase(query: str, roots: Optional[List[str]] = Query(None)):
+    search = await searchDB_initial(query, roots)
+    # "degraded" when a stage missed the latency budget — `skipped` says which
+    status = "degraded" if search["skipped"] else "searched"
+    return {"status": status, "query": query, **search}
 
 
 # Called from electron app — background Gemini ranking for re-ordering + summaries
 @app.post("/rank")
 async def rankDatabase(request: RankRequest):
-    results = await rankFiles(request.query, request.filePaths)
-    return {"status": "ranked", "query": request.query, "results": results}
+    ranking = await rankFiles(request.query, request.filePaths, request.roots)
+    status = "unranked" if ranking["skipped"] else "ranked"
+    return {"status": status, "query": request.query, **ranking}
+
+
+# ── Shards: one vector namespace per watched root (INDEX_SHARDING=roots) ──
+
+async def _requireShard(name: str) -> None:
+    if name == shards.DEFAULT_NAMESPACE or name not in await asyncio.to_thread(shards.allNamespaces):
+        raise HTTPException(status_code=404, detail=f"Shard not found: {name}")
+
+
+@app.get("/shards")
+async def list_shards():
+    try:
+        vector_counts = await scheduler.runInteractive(PineconeService().namespaceVectorCounts)
+    except Exception as e:
+        # Manifest counts are still useful with the vector index unreachable
+        print(f"Could not read namespace stats: {e}")
+        vector_counts = None
+    result = await scheduler.runInteractive(shards.listShards, vector_counts)
+    return {"sharding": shards.INDEX_SHARDING, "shards": result}
+
+
+# Map a root to a shard, then reconcile it so files indexed elsewhere move into it
+@app.post("/shards")
+async def add_shard(request: ShardRequest):
+    if not shards.SHARDING_ENABLED:
+        raise HTTPException(status_code=400, detail="Sharding is off (set INDEX_SHARDING=roots)")
+    if not os.path.isdir(request.root):
+        raise HTTPException(status_code=404, detail=f"Not a directory: {request.root}")
+    try:
+        shard = await asyncio.to_thread(shards.register, request.root, request.shard)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await scheduler.runBackground(reconcile, [request.root])
+    return {"status": "registered", "shard": shard, "root": os.path.abspath(request.root), **result}
+
+
+@app.delete("/shards/{name}")
+async def drop_shard(name: str):
+    await _requireShard(name)
+    result = await scheduler.runInteractive(shards.drop, name)
+    return {"status": "dropped", **result}
+
+
+@app.post("/shards/{name}/rebuild")
+async def rebuild_shard(name: str):
+    await _requireShard(name)
+    result = await scheduler.runBackground(shards.rebuild, name)
+    return {"status": "rebuilding", **result}
+
+
+# Called from electron app — query-term passages with highlight offsets for previews,
+# from locally stored chunks (no LLM call, no re-parse)
+@app.post("/snippets")
+async def snippetsForResults(request: SnippetsRequest):
+    results = await scheduler.runInteractive(snippets, request.query, request.filePaths, request.maxSnippets)
+    return {"status": "ok", "query": request.query, "results": results}
+
+
+# ── Admin: profiling artifacts and tracemalloc (404 unless PROFILING=1) ──
+
+def _requireProfiling():
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING=1)")
+
+
+@app.get("/admin/profiles")
+async def list_profiles():
+    _requireProfiling()
+    return {"dir": profiling.PROFILE_DIR, "artifacts": profiling.listArtifacts()}
+
+
+@app.post("/admin/tracemalloc/start")
+async def tracemalloc_start(frames: int = 1):
+    _requireProfiling()
+    return profiling.startTracemalloc(frames)
+
+
+@app.post("/admin/tracemalloc/stop")
+async def tracemalloc_stop():
+    _requireProfiling()
+    return profiling.stopTracemalloc()
+
+
+# Top allocators by line, and growth since the previous snapshot
+@app.get("/admin/tracemalloc/snapshot")
+async def tracemalloc_snapshot(top: int = 20):
+    _requireProfiling()
+    try:
+        return await scheduler.runInteractive(profiling.takeSnapshot, top)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,149 @@
+"""Archive members (zip, tar, tar.gz) as virtual files — streamed, never extracted to disk.
+
+A member is addressed by a virtual path: the archive path, "!/", then the member
+name, e.g. /home/me/Downloads/archive.zip!/docs/a.pdf. Only a "!/" right after an
+archive suffix separates the two, so "!/" elsewhere in a path is just a name.
+
+    ARCHIVE_MAX_MEMBERS        1000  — members considered per archive
+    ARCHIVE_MAX_MEMBER_BYTES   50 MB — larger members are skipped
+    ARCHIVE_MAX_TOTAL_BYTES    500 MB — total uncompressed size of members considered
+"""
+
+import os
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+VIRTUAL_SEPARATOR = "!/"
+
+ARCHIVE_MAX_MEMBERS = int(os.getenv("ARCHIVE_MAX_MEMBERS", "1000"))
+ARCHIVE_MAX_MEMBER_BYTES = int(os.getenv("ARCHIVE_MAX_MEMBER_BYTES", str(50 * 1024 * 1024)))
+ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("ARCHIVE_MAX_TOTAL_BYTES", str(500 * 1024 * 1024)))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+@dataclass
+class ArchiveMember:
+    virtualPath: str
+    size: int
+    mtime: float
+    # Reads the member's bytes; only valid while iterating (tar streams are forward-only)
+    read: Callable[[], bytes]
+
+
+def _separatorIndex(path: str) -> int:
+    """Position of the "!/" ending the archive part of a virtual path, or -1 for a real path."""
+    start = 0
+    while (index := path.find(VIRTUAL_SEPARATOR, start)) != -1:
+        if path[:index].lower().endswith(ARCHIVE_SUFFIXES):
+            return index
+        start = index + 1
+    return -1
+
+
+def isMember(path: str) -> bool:
+    """True for the virtual path of an archive member."""
+    return _separatorIndex(path) != -1
+
+
+def isArchive(filePath: str) -> bool:
+    return filePath.lower().endswith(ARCHIVE_SUFFIXES) and not isMember(filePath)
+
+
+def pathExists(path: str) -> bool:
+    """os.path.exists that treats an archive member as existing while its archive does."""
+    if isMember(path):
+        return os.path.exists(splitVirtualPath(path)[0])
+    return os.path.exists(path)
+
+
+def virtualPath(archivePath: str, memberName: str) -> str:
+    return f"{os.path.abspath(archivePath)}{VIRTUAL_SEPARATOR}{memberName}"
+
+
+def splitVirtualPath(path: str) -> tuple[str, str]:
+    """(archive path, member name) of a virtual path."""
+    index = _separatorIndex(path)
+    if index == -1:
+        raise ValueError(f"Not an archive member path: {path}")
+    return path[:index], path[index + len(VIRTUAL_SEPARATOR):]
+
+
+def _readLimited(fileobj) -> bytes:
+    # Don't trust the header size — a lying zip/tar header must not blow the memory budget
+    data = fileobj.read(ARCHIVE_MAX_MEMBER_BYTES + 1)
+    if len(data) > ARCHIVE_MAX_MEMBER_BYTES:
+        raise ValueError(f"Archive member exceeds {ARCHIVE_MAX_MEMBER_BYTES} bytes")
+    return data
+
+
+def _zipMembers(archivePath: str) -> Iterator[ArchiveMember]:
+    with zipfile.ZipFile(archivePath) as z:
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+
+            def read(info=info):
+                with z.open(info) as f:
+                    return _readLimited(f)
+
+            yield ArchiveMember(virtualPath(archivePath, info.filename), info.file_size, mtime, read)
+
+
+def _tarMembers(archivePath: str) -> Iterator[ArchiveMember]:
+    # Stream mode ("r|*") reads each member once, in order — no seeking back through gzip
+    with tarfile.open(archivePath, mode="r|*") as t:
+        for info in t:
+            if not info.isfile():
+                continue
+
+            def read(info=info):
+                return _readLimited(t.extractfile(info))
+
+            yield ArchiveMember(virtualPath(archivePath, info.name), info.size, float(info.mtime), read)
+
+
+def _members(archivePath: str) -> Iterator[ArchiveMember]:
+    if archivePath.lower().endswith(".zip"):
+        return _zipMembers(archivePath)
+    return _tarMembers(archivePath)
+
+
+def iterMembers(archivePath: str, accept: Callable[[str], bool] = None) -> Iterator[ArchiveMember]:
+    """
+    Yield indexable members of an archive in archive order, enforcing the member-count
+    and size limits. `accept` filters by member name (e.g. supported extensions).
+    Nested archives are skipped.
+    """
+    count = 0
+    total_bytes = 0
+    for member in _members(archivePath):
+        name = splitVirtualPath(member.virtualPath)[1]
+        if os.path.basename(name).startswith(".") or isArchive(name):
+            continue
+        if accept is not None and not accept(name):
+            continue
+        if member.size > ARCHIVE_MAX_MEMBER_BYTES:
+            print(f"Skipping oversized archive member ({member.size} bytes): {member.virtualPath}")
+            continue
+
+        count += 1
+        total_bytes += member.size
+        if count > ARCHIVE_MAX_MEMBERS or total_bytes > ARCHIVE_MAX_TOTAL_BYTES:
+            print(f"Archive limits reached, remaining members not indexed: {archivePath}")
+            return
+        yield member
+
+
+def readMember(path: str) -> ArchiveMember:
+    """Load a single member by virtual path (for ranking and previews of archived files)."""
+    archivePath, memberName = splitVirtualPath(path)
+    for member in _members(archivePath):
+        if splitVirtualPath(member.virtualPath)[1] == memberName:
+            data = member.read()
+            return ArchiveMember(member.virtualPath, member.size, member.mtime, lambda: data)
+    raise FileNotFoundError(f"Archive member not found: {path}")
@@ -0,0 +1,94 @@
+"""Embedding batching benchmark — requests per indexed MB, fixed 100-item batches vs. the batcher.
+
+Uses a stub embedding backend with a fixed per-request latency, so no API keys are
+needed. A synthetic corpus of small and large files (chunked the way indexing does)
+is embedded file by file with INDEX_WORKERS files in flight at once.
+
+    python benchmarks/embeddingBatching.py
+    python benchmarks/embeddingBatching.py --files 500 --latency-ms 150 --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from embeddingBatcher import EmbeddingBatcher  # noqa: E402
+from parsers import FileProcessor  # noqa: E402
+
+WORDS = "the of and to in is for on that with as file report data note project code test".split()
+
+
+def syntheticFiles(n: int, seed: int = 11) -> list[list[str]]:
+    """Chunked files: mostly small notes, some long documents."""
+    rng = random.Random(seed)
+    files = []
+    for _ in range(n):
+        length = rng.choice([200, 800, 3000, 20000, 150000])
+        text = " ".join(rng.choice(WORDS) for _ in range(length // 5))
+        files.append(FileProcessor.chunkContent(text))
+    return files
+
+
+class StubBackend:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return [[0.0] for _ in texts]
+
+
+def fixedBatches(files, latency: float, workers: int) -> dict:
+    backend = StubBackend(latency)
+
+    def index(chunks):
+        for i in range(0, len(chunks), 100):
+            backend.embed(chunks[i:i + 100])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(index, files))
+    return {"requests": backend.requests, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def tokenBatches(files, latency: float, workers: int) -> dict:
+    backend = StubBackend(latency)
+    batcher = EmbeddingBatcher(backend.embed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(batcher.embed, files))
+    return {"requests": backend.requests, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INDEX_WORKERS", "2")))
+    args = parser.parse_args()
+
+    files = syntheticFiles(args.files)
+    megabytes = sum(len(c.encode()) for chunks in files for c in chunks) / 2**20
+    latency = args.latency_ms / 1000
+
+    results = {"fixed100": fixedBatches(files, latency, args.workers),
+               "tokenAware": tokenBatches(files, latency, args.workers)}
+    for result in results.values():
+        result["requestsPerMB"] = round(result["requests"] / megabytes, 2)
+
+    print(json.dumps({"files": len(files), "chunks": sum(map(len, files)),
+                      "megabytes": round(megabytes, 2), **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Embedding profile benchmark — recall vs. latency/memory for every dimension × dtype.
+
+Ground truth is exact top-k search over full 1536-dim float32 vectors; each profile
+truncates (and re-normalizes) to its dimension, round-trips through its dtype, and
+is scored by recall@k against that ground truth on a fixed query set.
+
+    python benchmarks/embeddingProfiles.py                   # local vector cache + benchmarks/queries.json
+    python benchmarks/embeddingProfiles.py --synthetic 20000 # no API keys or index needed
+
+The real-corpus mode needs a 1536-dim local vector cache (VECTOR_CACHE_DTYPE=float32
+or float16 while indexing) and OPENAI_API_KEY to embed the fixed queries once.
+numpy is used when installed; the pure-Python fallback is slow beyond a few thousand vectors.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from embeddingProfile import (  # noqa: E402
+    FULL_DIMENSIONS, SUPPORTED_DIMENSIONS, SUPPORTED_DTYPES,
+    bytesPerVector, dequantize, quantize, truncate,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    return truncate(vector, len(vector))
+
+
+def syntheticCorpus(n: int, n_queries: int, seed: int = 7) -> tuple[list, list]:
+    """
+    Clustered unit vectors; queries are noisy copies of random corpus members.
+    Variance decays with dimension index, mimicking how text-embedding-3 front-loads
+    information — without it, truncation would look far worse than on real embeddings.
+    """
+    rng = random.Random(seed)
+    scale = [1 / (1 + i / 64) ** 0.5 for i in range(FULL_DIMENSIONS)]
+    centers = [[rng.gauss(0, s) for s in scale] for _ in range(max(1, n // 50))]
+    corpus = []
+    for _ in range(n):
+        center = rng.choice(centers)
+        corpus.append(_normalize([c + rng.gauss(0, 0.6 * s) for c, s in zip(center, scale)]))
+    queries = []
+    for _ in range(n_queries):
+        base = rng.choice(corpus)
+        queries.append(_normalize([x + rng.gauss(0, 0.02 * s) for x, s in zip(base, scale)]))
+    return corpus, queries
+
+
+def realCorpus(limit: int) -> tuple[list, list]:
+    """Full-dimension vectors from the local cache, plus the fixed query set embedded at 1536."""
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(SERVICE_DIR, "../../.env"))
+
+    from indexStore import connect
+    from openai import OpenAI
+
+    rows = connect().execute(
+        "SELECT dtype, data FROM vectors WHERE dimensions = ? LIMIT ?", (FULL_DIMENSIONS, limit)
+    ).fetchall()
+    if not rows:
+        raise SystemExit("No 1536-dim vectors in the local cache — index with VECTOR_CACHE_DTYPE set, or use --synthetic")
+    corpus = [dequantize(row["data"], row["dtype"]) for row in rows]
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.json")) as f:
+        query_text = json.load(f)
+    response = OpenAI(api_key=os.getenv("OPENAI_API_KEY")).embeddings.create(
+        model="text-embedding-3-small", input=query_text
+    )
+    return corpus, [item.embedding for item in response.data]
+
+
+def _topk(corpus, query, k: int) -> list[int]:
+    if np is not None:
+        scores = corpus @ np.asarray(query, dtype=np.float32)
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        return top[np.argsort(-scores[top])].tolist()
+    scores = [sum(a * b for a, b in zip(vector, query)) for vector in corpus]
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+
+
+def _asMatrix(vectors):
+    return np.asarray(vectors, dtype=np.float32) if np is not None else vectors
+
+
+def run(corpus: list, queries: list, k: int) -> list[dict]:
+    baseline = _asMatrix(corpus)
+    truth = [set(_topk(baseline, q, k)) for q in queries]
+
+    results = []
+    for dimensions in SUPPORTED_DIMENSIONS:
+        truncated = [truncate(v, dimensions) for v in corpus]
+        query_vectors = [truncate(q, dimensions) for q in queries]
+        for dtype in SUPPORTED_DTYPES:
+            # Round-trip through storage so quantization error is included
+            stored = [dequantize(quantize(v, dtype), dtype) for v in truncated]
+            matrix = _asMatrix(stored)
+
+            latencies = []
+            recall = 0.0
+            for query, expected in zip(query_vectors, truth):
+                start = time.perf_counter()
+                found = _topk(matrix, query, k)
+                latencies.append(time.perf_counter() - start)
+                recall += len(expected.intersection(found)) / k
+
+            latencies.sort()
+            results.append({
+                "dimensions": dimensions,
+                "dtype": dtype,
+                f"recall@{k}": round(recall / len(queries), 4),
+                "p50LatencyMs": round(latencies[len(latencies) // 2] * 1000, 3),
+                "bytesPerVector": bytesPerVector(dimensions, dtype),
+                "corpusMB": round(bytesPerVector(dimensions, dtype) * len(corpus) / 2**20, 2),
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic vectors instead of the local cache")
+    parser.add_argument("--queries", type=int, default=20, help="query count in synthetic mode")
+    parser.add_argument("--limit", type=int, default=50000, help="max cached vectors to load")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus, queries = syntheticCorpus(args.synthetic, args.queries)
+    else:
+        corpus, queries = realCorpus(args.limit)
+
+    print(json.dumps({"corpusSize": len(corpus), "queries": len(queries), "numpy": np is not None,
+                      "results": run(corpus, queries, args.k)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Replay a query trace against the service — throughput, latency percentiles, cache hit rates.
+
+Re-drives the /search and /rank requests of a QUERY_TRACE_PATH trace at the recorded
+pace (or faster) against the real FastAPI app, in process, with the embedding,
+vector and LLM backends replaced by local stubs of configurable latency. Everything
+else — routing, the scheduler lanes, hydration, the content cache, ranking prompt
+building and parsing — is the service's own code.
+
+    python benchmarks/replay.py trace.jsonl --speed 10
+    python benchmarks/replay.py trace.jsonl --speed 100 --embed-ms 40 --vector-ms 25 --llm-ms 1500
+    python benchmarks/replay.py --synthetic 500 --speed 1    # no trace needed
+
+--url drives an already running service instead (its real backends, no stubs).
+Needs the service's requirements (fastapi, httpx).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+
+def loadTrace(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted((r for r in records if r.get("endpoint") in ("search", "rank")), key=lambda r: r["ts"])
+
+
+def syntheticTrace(n: int, seed: int = 3) -> list[dict]:
+    """Search-then-rank sessions over a Zipf-ish query mix, ~2 searches per second."""
+    rng = random.Random(seed)
+    queries = [f"q{i}" for i in range(max(1, n // 5))]
+    weights = [1 / (i + 1) for i in range(len(queries))]
+    files = [f"file_{i:012x}" for i in range(2000)]
+    records, ts = [], 0.0
+    while len(records) < n:
+        query = rng.choices(queries, weights)[0]
+        qrng = random.Random(query)
+        candidates = [f"{fid}_0" for fid in qrng.sample(files, 20)]
+        records.append({"endpoint": "search", "ts": ts, "queryHash": query, "candidates": candidates})
+        records.append({"endpoint": "rank", "ts": ts + 0.3, "queryHash": query,
+                        "candidates": [c.rsplit("_", 1)[0] for c in candidates[:5]]})
+        ts += rng.expovariate(2.0)
+    return records[:n]
+
+
+def queryText(record: dict) -> str:
+    # Anonymized traces replay their hash as the query — the stubs don't need real text
+    return record.get("query") or record.get("queryHash") or ""
+
+
+# ── Stub backends ──
+
+def _sleep(ms: float, jitter: float, timeout: float = None) -> None:
+    """Simulated latency; like a client request timeout, gives up after `timeout` seconds."""
+    if ms > 0:
+        seconds = max(0.0, random.gauss(ms, ms * jitter)) / 1000
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("stub request timed out")
+        time.sleep(seconds)
+
+
+class StubEmbeddings:
+    def __init__(self, latency_ms: float, jitter: float, dimensions: int, timeout: float = None):
+        self.latency_ms, self.jitter, self.dimensions = latency_ms, jitter, dimensions
+        self.timeout = timeout
+
+    def create(self, input, **kwargs):
+        _sleep(self.latency_ms, self.jitter, self.timeout)
+        texts = [input] if isinstance(input, str) else input
+        data = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+            rng = random.Random(seed)
+            data.append(SimpleNamespace(embedding=[rng.gauss(0, 1) for _ in range(self.dimensions)]))
+        return SimpleNamespace(data=data)
+
+
+class StubOpenAI:
+    def __init__(self, embeddings: StubEmbeddings):
+        self.embeddings = embeddings
+
+    def with_options(self, timeout: float = None, **options):
+        e = self.embeddings
+        return StubOpenAI(StubEmbeddings(e.latency_ms, e.jitter, e.dimensions, timeout))
+
+
+class StubIndex:
+    """Returns the trace's recorded candidates for a query (or random ones), full-payload style."""
+
+    def __init__(self, latency_ms: float, jitter: float, files_dir: str, candidates_by_query: dict):
+        self.latency_ms, self.jitter = latency_ms, jitter
+        self.files_dir = files_dir
+        self.candidates_by_query = candidates_by_query
+
+    def query(self, vector, top_k, include_metadata=True, filter=None, namespace="", _request_timeout=None):
+        _sleep(self.latency_ms, self.jitter, _request_timeout)
+        key = tuple(round(v, 6) for v in vector[:4])
+        ids = self.candidates_by_query.get(key) or [f"file_{random.getrandbits(48):012x}_0" for _ in range(top_k)]
+        matches = []
+        for rank, vector_id in enumerate(ids[:top_k]):
+            file_id = vector_id.rsplit("_", 1)[0]
+            path = stubFile(self.files_dir, file_id)
+            matches.append(SimpleNamespace(id=vector_id, score=1 - rank / 100, metadata={
+                "fileId": file_id, "chunk_index": 0, "filePath": path,
+                "fileName": os.path.basename(path), "fileType": ".txt",
+            }))
+        return SimpleNamespace(matches=matches)
+
+    def describe_index_stats(self):
+        return {}
+
+
+class StubModels:
+    def __init__(self, latency_ms: float, jitter: float):
+        self.latency_ms, self.jitter = latency_ms, jitter
+
+    def generate_content(self, model, contents, config=None):
+        http_options = getattr(config, "http_options", None)
+        timeout = http_options.timeout / 1000 if http_options and http_options.timeout else None
+        _sleep(self.latency_ms, self.jitter, timeout)
+        # Rank in the order given, like a model that agrees with the vector scores
+        paths = [line.split(":", 1)[1].strip() for line in contents.splitlines()
+                 if line.strip().startswith("- File Path:")]
+        ranked = [{"filePath": p, "summary": "Stub summary.", "rank": i + 1} for i, p in enumerate(paths)]
+        return SimpleNamespace(text=json.dumps(ranked))
+
+
+def stubFile(files_dir: str, file_id: str) -> str:
+    """A small real file per candidate, so /rank exercises parsing and the content cache."""
+    path = os.path.join(files_dir, f"{file_id}.txt")
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Replay stub document {file_id}.\n" * 20)
+    return path
+
+
+def installStubs(records: list[dict], args) -> dict:
+    """Point the service's backends at stubs. Returns where the stub candidate files live."""
+    from embeddingProfile import EMBEDDING_DIMENSIONS
+    from embeddingBatcher import EmbeddingBatcher
+    from pineconeService import PineconeService
+    from ranking import FileRankingService
+    import search
+
+    files_dir = tempfile.mkdtemp(prefix="findly-replay-")
+    embeddings = StubEmbeddings(args.embed_ms, args.jitter, EMBEDDING_DIMENSIONS)
+
+    # The stub index recognises a query by the first values of its (deterministic) embedding
+    candidates_by_query = {}
+    instant = StubEmbeddings(0, 0, EMBEDDING_DIMENSIONS)
+    for record in records:
+        if record["endpoint"] == "search" and record.get("candidates"):
+            vector = instant.create(queryText(record)).data[0].embedding
+            candidates_by_query[tuple(round(v, 6) for v in vector[:4])] = record["candidates"]
+
+    pc = PineconeService()
+    pc.client = SimpleNamespace()
+    pc.openai_client = StubOpenAI(embeddings)
+    pc.index = StubIndex(args.vector_ms, args.jitter, files_dir, candidates_by_query)
+    pc.batcher = EmbeddingBatcher(pc._embedBatch)
+    PineconeService._initialized = True
+
+    ranking = object.__new__(FileRankingService)
+    ranking.client = SimpleNamespace(models=StubModels(args.llm_ms, args.jitter))
+    ranking.model_name = "stub"
+    search._ranking_service = ranking
+
+    return {"files_dir": files_dir}
+
+
+# ── Driver ──
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+
+
+async def replay(records: list[dict], client, speed: float, files_dir: str | None) -> dict:
+    latencies = {"search": [], "rank": []}
+    errors = {"search": 0, "rank": 0}
+    t0 = records[0]["ts"] if records else 0
+    start = time.perf_counter()
+
+    async def send(record):
+        delay = (record["ts"] - t0) / speed - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        query = queryText(record)
+        began = time.perf_counter()
+        try:
+            if record["endpoint"] == "search":
+                response = await client.get("/search", params={"query": query})
+            else:
+                ids = [c.rsplit("_", 1)[0] if c.count("_") > 1 else c for c in record.get("candidates", [])]
+                paths = [stubFile(files_dir, i) for i in ids] if files_dir else ids
+                response = await client.post("/rank", json={"query": query, "filePaths": paths})
+            response.raise_for_status()
+            latencies[record["endpoint"]].append((time.perf_counter() - began) * 1000)
+        except Exception as e:
+            errors[record["endpoint"]] += 1
+            if sum(errors.values()) <= 3:
+                print(f"{record['endpoint']} failed: {e}", file=sys.stderr)
+
+    await asyncio.gather(*(send(r) for r in records))
+    elapsed = time.perf_counter() - start
+
+    report = {"requests": len(records), "seconds": round(elapsed, 2),
+              "throughputRps": round(len(records) / elapsed, 2) if elapsed else None}
+    for endpoint, values in latencies.items():
+        report[endpoint] = {
+            "count": len(values), "errors": errors[endpoint],
+            "p50Ms": percentile(values, 50), "p90Ms": percentile(values, 90),
+            "p99Ms": percentile(values, 99), "maxMs": round(max(values), 2) if values else None,
+        }
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", nargs="?", help="JSONL trace written with QUERY_TRACE_PATH")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="replay N synthetic requests instead")
+    parser.add_argument("--speed", type=float, default=1.0, help="1, 10, 100... times the recorded pace")
+    parser.add_argument("--embed-ms", type=float, default=60)
+    parser.add_argument("--vector-ms", type=float, default=40)
+    parser.add_argument("--llm-ms", type=float, default=1200)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency std-dev as a fraction of the mean")
+    parser.add_argument("--url", help="drive a running service instead of the in-process app with stubs")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        records = syntheticTrace(args.synthetic)
+    elif args.trace:
+        records = loadTrace(args.trace)
+    else:
+        parser.error("give a trace file or --synthetic N")
+
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+            report = await replay(records, client, args.speed, None)
+        print(json.dumps(report, indent=2))
+        return
+
+    # Isolated local store, and no tracing of the replay itself
+    os.environ.setdefault("INDEX_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="findly-replay-db-"), "index.db"))
+    os.environ["QUERY_TRACE_PATH"] = ""
+    os.environ["WARM_ON_STARTUP"] = "0"
+
+    stubs = installStubs(records, args)
+    from app import app
+    import queryTrace
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=120) as client:
+        report = await replay(records, client, args.speed, stubs["files_dir"])
+    report["caches"] = queryTrace.cacheStats()
+    report["stubLatencyMs"] = {"embed": args.embed_ms, "vector": args.vector_ms, "llm": args.llm_ms}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""Cold-start benchmark — import time, time-to-first-request and time-to-first-search.
+
+Compares the lazy startup mode (default) against eager imports (LAZY_IMPORTS=0).
+
+    python benchmarks/startup.py                # import-time only, no network
+    python benchmarks/startup.py --serve        # also boot uvicorn and time first requests
+    python benchmarks/startup.py --serve --query "math homework"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pymupdf", "PIL.Image", "pytesseract", "lxml.etree", "google.genai", "pinecone", "openai"]
+
+
+def _timeImport(statement: str, env: dict) -> float:
+    """Seconds to run an import statement in a fresh interpreter."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"{statement}; "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVICE_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def benchImports(repeat: int) -> dict:
+    results = {}
+    for mode, lazy in (("lazy", "1"), ("eager", "0")):
+        env = {**os.environ, "LAZY_IMPORTS": lazy, "WARM_ON_STARTUP": "0"}
+        samples = [_timeImport("import app", env) for _ in range(repeat)]
+        results[f"import app ({mode})"] = statistics.median(samples)
+
+    # What lazy mode defers — each module's standalone import cost
+    for module in HEAVY_MODULES:
+        try:
+            results[f"import {module}"] = _timeImport(f"import {module}", dict(os.environ))
+        except subprocess.CalledProcessError:
+            results[f"import {module}"] = None
+    return results
+
+
+def _get(url: str, timeout: float = 60) -> int:
+    return _fetch(url, timeout)[0]
+
+
+def _fetch(url: str, timeout: float = 60) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def benchServe(lazy: str, port: int, query: str) -> dict:
+    """
+    Boot uvicorn and time until /health answers, /search answers, and /ready is warm.
+    searchStatus says what the first search returned — "degraded" without API keys,
+    when it falls back to keyword matches. timeToWarm is None if /ready never said so.
+    """
+    env = {**os.environ, "LAZY_IMPORTS": lazy}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port)],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                if _get(f"{base}/health", timeout=1) == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        first_request = time.perf_counter() - start
+
+        code, body = _fetch(f"{base}/search?query={urllib.parse.quote(query)}")
+        first_search = time.perf_counter() - start
+        search_status = json.loads(body).get("status") if code == 200 else f"HTTP {code}"
+
+        warm = None
+        while time.perf_counter() - start < 60:
+            if _get(f"{base}/ready") == 200:
+                warm = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+
+        return {
+            "timeToFirstRequest": first_request, "timeToFirstSearch": first_search,
+            "searchStatus": search_status, "timeToWarm": warm,
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--serve", action="store_true", help="boot uvicorn and time first requests (needs API keys)")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--query", default="notes")
+    args = parser.parse_args()
+
+    report = {"imports": benchImports(args.repeat)}
+    if args.serve:
+        report["serve"] = {
+            "lazy": benchServe("1", args.port, args.query),
+            "eager": benchServe("0", args.port, args.query),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Duplicate detection at ingest — exact content hashes plus MinHash/LSH for near-duplicates.
+
+A file whose content matches an already-indexed file (exactly, or with estimated
+Jaccard similarity of word shingles >= NEAR_DUPLICATE_THRESHOLD) is recorded as a
+duplicate of that canonical file: it is not embedded or upserted, and search
+results list it under the canonical file's "alsoAt".
+
+    DEDUPE                      1 (default) | 0
+    NEAR_DUPLICATE_THRESHOLD    0.9
+"""
+
+import hashlib
+import heapq
+import os
+import random
+import re
+from array import array
+
+from archives import pathExists
+from indexStore import IndexStore
+
+DEDUPE_ENABLED = os.getenv("DEDUPE", "1") == "1"
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs at Jaccard 0.9 collide in some band with ~99.9% probability,
+# pairs at 0.5 with ~64%, so candidates are always verified against the full signature
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Bottom-k sample of shingle hashes keeps huge documents cheap to sign
+MAX_SHINGLES = 20000
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def signature(text: str) -> list[int] | None:
+    """MinHash signature of the text's word shingles, or None if there is no text."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+
+    shingles = {
+        " ".join(words[i:i + SHINGLE_WORDS])
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    hashes = heapq.nsmallest(MAX_SHINGLES, {_hash64(s.encode()) for s in shingles})
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def buckets(sig: list[int]) -> list[str]:
+    """LSH band keys for a signature."""
+    keys = []
+    for band in range(BANDS):
+        rows = array("Q", sig[band * ROWS:(band + 1) * ROWS]).tobytes()
+        keys.append(f"{band}:{hashlib.blake2b(rows, digest_size=8).hexdigest()}")
+    return keys
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity from two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def pack(sig: list[int] | None) -> bytes | None:
+    return array("Q", sig).tobytes() if sig else None
+
+
+def unpack(data: bytes | None) -> list[int] | None:
+    return array("Q", data).tolist() if data else None
+
+
+def _eligible(entry: dict, file_id: str, filePath: str, namespace: str) -> bool:
+    # Only live canonical files in the same shard (namespace) qualify, so duplicate
+    # chains never form and a scoped search still finds the vectors
+    return (
+        entry["file_id"] != file_id
+        and entry["path"] != filePath
+        and entry["canonical_id"] is None
+        and entry["namespace"] == namespace
+        and pathExists(entry["path"])
+    )
+
+
+def findExact(file_id: str, filePath: str, content_hash: str, namespace: str = "") -> dict | None:
+    """The canonical file with exactly this content, or None. Cheap — check it before signing."""
+    if not DEDUPE_ENABLED:
+        return None
+    for entry in IndexStore.findByContentHash(content_hash):
+        if _eligible(entry, file_id, filePath, namespace):
+            return entry
+    return None
+
+
+def findNear(file_id: str, filePath: str, sig: list[int] | None, namespace: str = "") -> dict | None:
+    """The most similar canonical file at or above NEAR_DUPLICATE_THRESHOLD, or None."""
+    if not DEDUPE_ENABLED or sig is None:
+        return None
+    best, best_score = None, NEAR_DUPLICATE_THRESHOLD
+    for entry in IndexStore.lshCandidates(buckets(sig), file_id):
+        candidate = unpack(entry["minhash"])
+        if candidate and _eligible(entry, file_id, filePath, namespace):
+            score = similarity(sig, candidate)
+            if score >= best_score:
+                best, best_score = entry, score
+    return best
+
+
+def findCanonical(file_id: str, filePath: str, content_hash: str, sig: list[int] | None,
+                  namespace: str = "") -> dict | None:
+    """The canonical file this content duplicates (exactly, else nearly), or None if it is unique."""
+    if sig is None:
+        return None
+    return findExact(file_id, filePath, content_hash, namespace) or findNear(file_id, filePath, sig, namespace)
@@ -0,0 +1,166 @@
+"""Token-aware embedding batcher shared by every indexing job in the process.
+
+Chunks from all files being indexed concurrently go into one queue and are packed
+into embedding requests by token count (not a fixed item count), up to the
+provider's per-request limits. Several requests are kept in flight at once, so a
+big file no longer waits on one round trip per 100 chunks and small files share
+requests instead of each paying for a near-empty one. Before each request the
+batcher yields to pending /search and /rank work, as indexing does between steps.
+
+    EMBED_MAX_BATCH_TOKENS   200000 — tokens per request (OpenAI allows 300k; the margin
+                                      covers estimated counts, see tokenizer.py)
+    EMBED_MAX_BATCH_INPUTS   2048   — inputs per request (OpenAI limit)
+    EMBED_MAX_INPUT_TOKENS   8191   — longer inputs are truncated
+    EMBED_MAX_INFLIGHT       4      — concurrent embedding requests
+    EMBED_LINGER_MS          20     — wait this long for more inputs before sending a partial batch
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from scheduler import scheduler
+from tokenizer import countTokens, truncateToTokens
+
+
+@dataclass
+class _Request:
+    """One caller's texts, and the future its embeddings are delivered to."""
+    texts: list[str]
+    tokens: list[int]
+    future: Future = field(default_factory=Future)
+    results: list = None
+    remaining: int = 0
+    next_index: int = 0
+
+
+class EmbeddingBatcher:
+
+    def __init__(self, embed: Callable[[list[str]], list[list[float]]]):
+        # embed(texts) -> one embedding per text, in order (a single provider request)
+        self._embed = embed
+        self.max_batch_tokens = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "200000"))
+        self.max_batch_inputs = int(os.getenv("EMBED_MAX_BATCH_INPUTS", "2048"))
+        self.max_input_tokens = int(os.getenv("EMBED_MAX_INPUT_TOKENS", "8191"))
+        self.max_inflight = int(os.getenv("EMBED_MAX_INFLIGHT", "4"))
+        self.linger = float(os.getenv("EMBED_LINGER_MS", "20")) / 1000
+
+        self._pending: list[_Request] = []
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="embed")
+        self._thread = threading.Thread(target=self._dispatch, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+        self._stats = {"requests": 0, "inputs": 0, "tokens": 0, "bytes": 0}
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, batched together with whatever else is being embedded. Blocks until done."""
+        if not texts:
+            return []
+        texts = list(texts)
+        tokens = []
+        for i, text in enumerate(texts):
+            count = countTokens(text)
+            if count > self.max_input_tokens:
+                texts[i] = truncateToTokens(text, self.max_input_tokens)
+                count = self.max_input_tokens
+            tokens.append(max(1, count))
+
+        request = _Request(texts, tokens, results=[None] * len(texts), remaining=len(texts))
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.future.result()
+
+    # ── Packing ──
+
+    def _pendingTokens(self) -> tuple[int, int]:
+        inputs = sum(len(r.texts) - r.next_index for r in self._pending)
+        tokens = sum(sum(r.tokens[r.next_index:]) for r in self._pending)
+        return inputs, tokens
+
+    def _takeBatch(self) -> list[tuple[_Request, int]]:
+        """Pop (request, index) pairs in arrival order until a request limit is reached."""
+        batch, tokens = [], 0
+        while self._pending:
+            request = self._pending[0]
+            idx = request.next_index
+            cost = request.tokens[idx]
+            if batch and (tokens + cost > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                break
+            batch.append((request, idx))
+            tokens += cost
+            request.next_index += 1
+            if request.next_index == len(request.texts):
+                self._pending.pop(0)
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending or self._inflight >= self.max_inflight:
+                    self._cond.wait()
+
+            # Let pending queries go first — one large file spans many requests
+            scheduler.yieldToInteractive()
+
+            with self._cond:
+                # A partial batch lingers briefly so concurrent files can share the request
+                deadline = time.monotonic() + self.linger
+                while True:
+                    inputs, tokens = self._pendingTokens()
+                    remaining = deadline - time.monotonic()
+                    full = inputs >= self.max_batch_inputs or tokens >= self.max_batch_tokens
+                    if full or remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._takeBatch()
+                if not batch:
+                    continue
+                self._inflight += 1
+            self._pool.submit(self._send, batch)
+
+    def _send(self, batch: list[tuple[_Request, int]]) -> None:
+        texts = [request.texts[idx] for request, idx in batch]
+        try:
+            embeddings = self._embed(texts)
+            error = None
+        except Exception as e:
+            embeddings, error = None, e
+
+        with self._cond:
+            self._inflight -= 1
+            self._stats["requests"] += 1
+            self._stats["inputs"] += len(texts)
+            self._stats["tokens"] += sum(request.tokens[idx] for request, idx in batch)
+            self._stats["bytes"] += sum(len(t.encode("utf-8")) for t in texts)
+
+            for pos, (request, idx) in enumerate(batch):
+                if request.future.done():
+                    continue
+                if error is not None:
+                    # The caller's job fails (and is retried) — don't send the rest of its texts
+                    request.future.set_exception(error)
+                    if request in self._pending:
+                        self._pending.remove(request)
+                    continue
+                request.results[idx] = embeddings[pos]
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(request.results)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+        megabytes = stats["bytes"] / 2**20
+        return {
+            **stats,
+            "inflight": self._inflight,
+            "requestsPerMB": round(stats["requests"] / megabytes, 2) if megabytes else None,
+        }
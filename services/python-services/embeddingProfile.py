@@ -0,0 +1,71 @@
+"""Embedding profile — output dimension for the index and dtype for locally cached vectors.
+
+text-embedding-3 models are trained so that a prefix of the full vector, re-normalized,
+is itself a valid embedding (the API's `dimensions` parameter does exactly this).
+That lets an existing 1536-dim index migrate to 256/512 dims without re-embedding.
+
+    EMBEDDING_DIMENSIONS   256 | 512 | 1536 (default) — Pinecone index dimension
+    VECTOR_CACHE_DTYPE     none (default) | float32 | float16 | int8 — local vector cache
+"""
+
+import math
+import os
+import struct
+from array import array
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+FULL_DIMENSIONS = 1536
+SUPPORTED_DIMENSIONS = (256, 512, 1536)
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(FULL_DIMENSIONS)))
+VECTOR_CACHE_DTYPE = os.getenv("VECTOR_CACHE_DTYPE", "none")
+
+if EMBEDDING_DIMENSIONS not in SUPPORTED_DIMENSIONS:
+    raise ValueError(f"EMBEDDING_DIMENSIONS must be one of {SUPPORTED_DIMENSIONS}, got {EMBEDDING_DIMENSIONS}")
+if VECTOR_CACHE_DTYPE not in SUPPORTED_DTYPES + ("none",):
+    raise ValueError(f"VECTOR_CACHE_DTYPE must be one of {SUPPORTED_DTYPES} or none, got {VECTOR_CACHE_DTYPE}")
+
+
+def embeddingKwargs(dimensions: int = EMBEDDING_DIMENSIONS) -> dict:
+    """Extra arguments for embeddings.create — omit `dimensions` at full size."""
+    if dimensions == FULL_DIMENSIONS:
+        return {"model": EMBEDDING_MODEL}
+    return {"model": EMBEDDING_MODEL, "dimensions": dimensions}
+
+
+def truncate(vector: list[float], dimensions: int) -> list[float]:
+    """Shorten an embedding to its first `dimensions` values and re-normalize to unit length."""
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def quantize(vector: list[float], dtype: str) -> bytes:
+    """Pack a vector for local storage."""
+    if dtype == "float32":
+        return array("f", vector).tobytes()
+    if dtype == "float16":
+        return struct.pack(f"<{len(vector)}e", *vector)
+    if dtype == "int8":
+        # Symmetric per-vector scale, stored as a float32 header
+        scale = max((abs(x) for x in vector), default=0.0) / 127 or 1.0
+        values = array("b", (max(-127, min(127, round(x / scale))) for x in vector))
+        return struct.pack("<f", scale) + values.tobytes()
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def dequantize(data: bytes, dtype: str) -> list[float]:
+    """Unpack a vector stored by quantize()."""
+    if dtype == "float32":
+        return array("f", data).tolist()
+    if dtype == "float16":
+        return list(struct.unpack(f"<{len(data) // 2}e", data))
+    if dtype == "int8":
+        (scale,) = struct.unpack_from("<f", data)
+        return [x * scale for x in array("b", data[4:])]
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def bytesPerVector(dimensions: int, dtype: str) -> int:
+    return {"float32": 4 * dimensions, "float16": 2 * dimensions, "int8": dimensions + 4}[dtype]
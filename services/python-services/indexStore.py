@@ -0,0 +1,519 @@
+"""Local index store — SQLite database holding the index manifest, job queue and content cache.
+
+Survives restarts, so the service can tell which files are already indexed
+and resume unfinished work instead of starting over. Safe to share between
+several service processes: WAL mode, one connection per thread, and every
+multi-statement write in a BEGIN IMMEDIATE transaction.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from embeddingProfile import quantize, dequantize
+
+INDEX_DB_PATH = os.getenv(
+    "INDEX_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.db"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    file_id     TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    indexed_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    file_path   TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    not_before  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, not_before, id);
+CREATE INDEX IF NOT EXISTS jobs_path ON jobs (file_path, status);
+"""
+
+# Applied in order on top of SCHEMA; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    # 1 — compact vector payloads: file metadata and chunk text are kept locally
+    """
+    ALTER TABLE files ADD COLUMN content_hash TEXT;
+    ALTER TABLE files ADD COLUMN metadata TEXT;
+    CREATE INDEX IF NOT EXISTS files_file_id ON files (file_id);
+    CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash);
+    CREATE TABLE IF NOT EXISTS chunks (
+        file_id     TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        text        TEXT NOT NULL,
+        PRIMARY KEY (file_id, chunk_index)
+    );
+    """,
+    # 2 — local vector cache in the configured embedding profile
+    """
+    CREATE TABLE IF NOT EXISTS vectors (
+        file_id     TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        dtype       TEXT NOT NULL,
+        dimensions  INTEGER NOT NULL,
+        data        BLOB NOT NULL,
+        PRIMARY KEY (file_id, chunk_index)
+    );
+    """,
+    # 3 — duplicate detection: canonical pointer, MinHash signature and LSH buckets
+    """
+    ALTER TABLE files ADD COLUMN canonical_id TEXT;
+    ALTER TABLE files ADD COLUMN minhash BLOB;
+    CREATE INDEX IF NOT EXISTS files_canonical_id ON files (canonical_id);
+    CREATE TABLE IF NOT EXISTS lsh_buckets (
+        bucket  TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        PRIMARY KEY (bucket, file_id)
+    );
+    CREATE INDEX IF NOT EXISTS lsh_buckets_file_id ON lsh_buckets (file_id);
+    """,
+    # 4 — multi-process service: job leases and the parsed-content cache (was localdump.json)
+    """
+    ALTER TABLE jobs ADD COLUMN owner TEXT;
+    ALTER TABLE jobs ADD COLUMN lease_until REAL;
+    CREATE TABLE IF NOT EXISTS content_cache (
+        path      TEXT PRIMARY KEY,
+        content   TEXT NOT NULL,
+        metadata  TEXT NOT NULL,
+        cached_at REAL NOT NULL
+    );
+    """,
+    # 5 — character offset of each chunk in the parsed text (for local snippets)
+    """
+    ALTER TABLE chunks ADD COLUMN start_offset INTEGER;
+    """,
+    # 6 — profile mode requested for a job (see profiling.py)
+    """
+    ALTER TABLE jobs ADD COLUMN profile TEXT;
+    """,
+    # 7 — requests folded into a job by per-file coalescing
+    """
+    ALTER TABLE jobs ADD COLUMN coalesced INTEGER NOT NULL DEFAULT 0;
+    """,
+    # 8 — index generation, bumped on every manifest change (invalidates cached query results)
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+    """,
+    # 9 — vector namespace (shard) of each file, and the watched roots mapped to shards
+    """
+    ALTER TABLE files ADD COLUMN namespace TEXT NOT NULL DEFAULT '';
+    CREATE INDEX IF NOT EXISTS files_namespace ON files (namespace);
+    CREATE TABLE IF NOT EXISTS shard_roots (
+        root  TEXT PRIMARY KEY,
+        shard TEXT NOT NULL
+    );
+    """,
+    # 10 — files whose index job failed for good, at the size/mtime that failed
+    """
+    CREATE TABLE IF NOT EXISTS index_failures (
+        path      TEXT PRIMARY KEY,
+        size      INTEGER NOT NULL,
+        mtime     REAL NOT NULL,
+        error     TEXT,
+        failed_at REAL NOT NULL
+    );
+    """,
+]
+
+# One connection per thread — sqlite3 connections must not be shared across threads
+_local = threading.local()
+
+
+def connect() -> sqlite3.Connection:
+    """Return this thread's connection to the index database, creating it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # Autocommit mode; multi-statement writes open their own transaction
+        conn = sqlite3.connect(INDEX_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _migrate(conn)
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def transaction():
+    """Write transaction on this thread's connection (takes the write lock up front)."""
+    conn = connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return
+
+    # Re-check under the write lock — another thread or process may have migrated first
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statement in MIGRATIONS[version:]:
+            for sql in statement.split(";"):
+                if sql.strip():
+                    conn.execute(sql)
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _bumpGeneration(conn: sqlite3.Connection) -> None:
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+
+def _fileRow(row: sqlite3.Row | None) -> dict | None:
+    if row is None:
+        return None
+    entry = dict(row)
+    entry["metadata"] = json.loads(entry["metadata"]) if entry.get("metadata") else {}
+    return entry
+
+
+class IndexStore:
+
+    @staticmethod
+    def generation() -> int:
+        """Counter bumped by every change to the manifest — equal values mean nothing was (re)indexed."""
+        return connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    @staticmethod
+    def traceSalt() -> int:
+        """This install's secret salt for query-trace hashes — random, created on first use."""
+        conn = connect()
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('trace_salt', ?)", (secrets.randbits(63),))
+        return conn.execute("SELECT value FROM meta WHERE key = 'trace_salt'").fetchone()[0]
+
+    @staticmethod
+    def getFile(filePath: str) -> dict | None:
+        """Return the manifest row for a file, or None if it was never indexed."""
+        row = connect().execute(
+            "SELECT * FROM files WHERE path = ?", (os.path.abspath(filePath),)
+        ).fetchone()
+        return _fileRow(row)
+
+    @staticmethod
+    def getFileById(file_id: str) -> dict | None:
+        row = connect().execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return _fileRow(row)
+
+    @staticmethod
+    def findByContentHash(content_hash: str) -> list[dict]:
+        rows = connect().execute("SELECT * FROM files WHERE content_hash = ?", (content_hash,))
+        return [_fileRow(row) for row in rows]
+
+    @staticmethod
+    def isUnchanged(filePath: str, size: int, mtime: float, namespace: str = None) -> bool:
+        """True if the file was indexed with exactly this size and mtime (and into this namespace, if given)."""
+        entry = IndexStore.getFile(filePath)
+        return (
+            entry is not None and entry["size"] == size and entry["mtime"] == mtime
+            and (namespace is None or entry["namespace"] == namespace)
+        )
+
+    @staticmethod
+    def recordFile(
+        filePath: str,
+        file_id: str,
+        size: int,
+        mtime: float,
+        chunk_count: int,
+        content_hash: str = None,
+        metadata: dict = None,
+        canonical_id: str = None,
+        namespace: str = "",
+    ) -> None:
+        """
+        Insert or update the manifest row after a successful index (the MinHash
+        signature is kept — see setSignature). canonical_id marks the file as a duplicate that reuses another file's vectors.
+        namespace is the vector namespace (shard) its vectors live in.
+        """
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO files "
+                "(path, file_id, size, mtime, chunk_count, indexed_at, content_hash, metadata, canonical_id, namespace) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET file_id = excluded.file_id, size = excluded.size, "
+                "mtime = excluded.mtime, chunk_count = excluded.chunk_count, indexed_at = excluded.indexed_at, "
+                "content_hash = excluded.content_hash, metadata = excluded.metadata, "
+                "canonical_id = excluded.canonical_id, namespace = excluded.namespace",
+                (
+                    os.path.abspath(filePath), file_id, size, mtime, chunk_count, time.time(),
+                    content_hash, json.dumps(metadata or {}, ensure_ascii=False), canonical_id, namespace,
+                ),
+            )
+            conn.execute("DELETE FROM index_failures WHERE path = ?", (os.path.abspath(filePath),))
+            _bumpGeneration(conn)
+
+    @staticmethod
+    def moveFile(oldPath: str, newPath: str) -> None:
+        """
+        Re-point a manifest row at a new path (a rename) — the file ID is kept.
+        Only the row at newPath is replaced; remove a file indexed there first (see indexing.removeFromIndex).
+        """
+        with transaction() as conn:
+            conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(newPath),))
+            conn.execute(
+                "UPDATE files SET path = ? WHERE path = ?",
+                (os.path.abspath(newPath), os.path.abspath(oldPath)),
+            )
+            _bumpGeneration(conn)
+
+    @staticmethod
+    def removeFile(filePath: str) -> None:
+        entry = IndexStore.getFile(filePath)
+        if entry is None:
+            return
+        with transaction() as conn:
+            conn.execute("DELETE FROM files WHERE path = ?", (entry["path"],))
+            conn.execute("DELETE FROM chunks WHERE file_id = ?", (entry["file_id"],))
+            conn.execute("DELETE FROM vectors WHERE file_id = ?", (entry["file_id"],))
+            conn.execute("DELETE FROM lsh_buckets WHERE file_id = ?", (entry["file_id"],))
+            conn.execute("DELETE FROM content_cache WHERE path = ?", (entry["path"],))
+            _bumpGeneration(conn)
+
+    # ── Parsed content cache (ranking and summaries reuse it instead of re-parsing) ──
+
+    @staticmethod
+    def cacheContent(filePath: str, content: str, metadata: dict) -> None:
+        connect().execute(
+            "INSERT OR REPLACE INTO content_cache (path, content, metadata, cached_at) VALUES (?, ?, ?, ?)",
+            (filePath, content, json.dumps(metadata or {}, ensure_ascii=False), time.time()),
+        )
+
+    @staticmethod
+    def getCachedContent(filePath: str) -> dict | None:
+        """Return {"content": str, "metadata": dict} for a parsed file, or None."""
+        row = connect().execute(
+            "SELECT content, metadata FROM content_cache WHERE path = ?", (filePath,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"content": row["content"], "metadata": json.loads(row["metadata"])}
+
+    @staticmethod
+    def clearContentCache() -> None:
+        connect().execute("DELETE FROM content_cache")
+
+    # ── Chunk text ──
+
+    @staticmethod
+    def storeChunks(file_id: str, chunks: list[str], offsets: list[int | None] = None) -> None:
+        """Replace all stored chunk text (and start offsets in the parsed text) for a file."""
+        offsets = offsets or [None] * len(chunks)
+        with transaction() as conn:
+            conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+            conn.executemany(
+                "INSERT INTO chunks (file_id, chunk_index, text, start_offset) VALUES (?, ?, ?, ?)",
+                [(file_id, idx, text, offset) for idx, (text, offset) in enumerate(zip(chunks, offsets))],
+            )
+
+    @staticmethod
+    def getChunks(file_id: str) -> list[str]:
+        rows = connect().execute(
+            "SELECT text FROM chunks WHERE file_id = ? ORDER BY chunk_index", (file_id,)
+        )
+        return [row["text"] for row in rows]
+
+    @staticmethod
+    def getChunkRows(file_id: str) -> list[dict]:
+        """Chunks with their index and start offset (None for chunks stored before offsets were)."""
+        rows = connect().execute(
+            "SELECT chunk_index, text, start_offset FROM chunks WHERE file_id = ? ORDER BY chunk_index",
+            (file_id,),
+        )
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def keywordMatches(terms: list[str]) -> dict[str, dict[str, int]]:
+        """
+        file_id -> {term: chunks containing it} for every file with a chunk containing
+        any of the terms (case-insensitive for ASCII). One scan of the chunks table.
+        """
+        if not terms:
+            return {}
+        patterns = ["%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    for t in terms]
+        counts = ", ".join(f"SUM(text LIKE ? ESCAPE '\\') AS t{i}" for i in range(len(terms)))
+        where = " OR ".join("text LIKE ? ESCAPE '\\'" for _ in terms)
+        rows = connect().execute(
+            f"SELECT file_id, {counts} FROM chunks WHERE {where} GROUP BY file_id",
+            (*patterns, *patterns),
+        )
+        return {
+            row["file_id"]: {term: row[f"t{i}"] for i, term in enumerate(terms) if row[f"t{i}"]}
+            for row in rows
+        }
+
+    # ── Local vector cache ──
+
+    @staticmethod
+    def storeVectors(file_id: str, embeddings: list[list[float]], dtype: str) -> None:
+        """Replace all cached vectors for a file, quantized to dtype."""
+        with transaction() as conn:
+            conn.execute("DELETE FROM vectors WHERE file_id = ?", (file_id,))
+            conn.executemany(
+                "INSERT INTO vectors (file_id, chunk_index, dtype, dimensions, data) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (file_id, idx, dtype, len(embedding), quantize(embedding, dtype))
+                    for idx, embedding in enumerate(embeddings)
+                ],
+            )
+
+    @staticmethod
+    def getVectors(file_id: str) -> list[list[float]]:
+        """Cached vectors for a file, dequantized, in chunk order (empty if not cached)."""
+        rows = connect().execute(
+            "SELECT dtype, data FROM vectors WHERE file_id = ? ORDER BY chunk_index", (file_id,)
+        )
+        return [dequantize(row["data"], row["dtype"]) for row in rows]
+
+    @staticmethod
+    def listFiles() -> list[dict]:
+        return [_fileRow(row) for row in connect().execute("SELECT * FROM files ORDER BY path")]
+
+    @staticmethod
+    def listFilesUnder(prefix: str) -> list[dict]:
+        """Manifest rows whose path starts with prefix (a directory or archive!/)."""
+        rows = connect().execute(
+            "SELECT * FROM files WHERE substr(path, 1, ?) = ? ORDER BY path", (len(prefix), prefix)
+        )
+        return [_fileRow(row) for row in rows]
+
+    # ── Duplicate detection ──
+
+    @staticmethod
+    def setSignature(file_id: str, signature: bytes | None, buckets: list[str]) -> None:
+        """Store a file's MinHash signature and replace its LSH bucket memberships."""
+        with transaction() as conn:
+            conn.execute("UPDATE files SET minhash = ? WHERE file_id = ?", (signature, file_id))
+            conn.execute("DELETE FROM lsh_buckets WHERE file_id = ?", (file_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (bucket, file_id) VALUES (?, ?)",
+                [(bucket, file_id) for bucket in buckets],
+            )
+
+    @staticmethod
+    def lshCandidates(buckets: list[str], exclude_id: str) -> list[dict]:
+        """Canonical files sharing at least one LSH bucket."""
+        if not buckets:
+            return []
+        placeholders = ",".join("?" * len(buckets))
+        rows = connect().execute(
+            f"SELECT DISTINCT f.* FROM lsh_buckets b JOIN files f ON f.file_id = b.file_id "
+            f"WHERE b.bucket IN ({placeholders}) AND f.file_id != ? AND f.canonical_id IS NULL",
+            (*buckets, exclude_id),
+        )
+        return [_fileRow(row) for row in rows]
+
+    @staticmethod
+    def duplicatesOf(file_id: str) -> list[dict]:
+        rows = connect().execute(
+            "SELECT * FROM files WHERE canonical_id = ? ORDER BY path", (file_id,)
+        )
+        return [_fileRow(row) for row in rows]
+
+    @staticmethod
+    def repointDuplicates(old_canonical_id: str, new_canonical_id: str | None) -> None:
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE files SET canonical_id = ? WHERE canonical_id = ?",
+                (new_canonical_id, old_canonical_id),
+            )
+            _bumpGeneration(conn)
+
+    # ── Failed files (reconcile doesn't re-queue them until they change) ──
+
+    @staticmethod
+    def recordFailure(filePath: str, size: int, mtime: float, error: str) -> None:
+        connect().execute(
+            "INSERT INTO index_failures (path, size, mtime, error, failed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+            "error = excluded.error, failed_at = excluded.failed_at",
+            (os.path.abspath(filePath), size, mtime, error, time.time()),
+        )
+
+    @staticmethod
+    def failuresUnder(prefix: str) -> dict[str, tuple[int, float]]:
+        """path -> (size, mtime) that failed, for failed files whose path starts with prefix."""
+        rows = connect().execute(
+            "SELECT path, size, mtime FROM index_failures WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix),
+        )
+        return {row["path"]: (row["size"], row["mtime"]) for row in rows}
+
+    @staticmethod
+    def clearFailures(paths: list[str]) -> None:
+        connect().executemany("DELETE FROM index_failures WHERE path = ?", [(p,) for p in paths])
+
+    # ── Shards (vector namespaces) ──
+
+    @staticmethod
+    def shardRoots() -> dict[str, str]:
+        """Watched root -> shard name."""
+        return {row["root"]: row["shard"] for row in connect().execute("SELECT root, shard FROM shard_roots")}
+
+    @staticmethod
+    def setShardRoot(root: str, shard: str) -> None:
+        connect().execute(
+            "INSERT INTO shard_roots (root, shard) VALUES (?, ?) ON CONFLICT (root) DO UPDATE SET shard = excluded.shard",
+            (os.path.abspath(root), shard),
+        )
+
+    @staticmethod
+    def removeShardRoots(shard: str) -> None:
+        connect().execute("DELETE FROM shard_roots WHERE shard = ?", (shard,))
+
+    @staticmethod
+    def namespaceStats() -> dict[str, dict]:
+        """namespace -> {"files", "chunks"} from the manifest."""
+        rows = connect().execute(
+            "SELECT namespace, COUNT(*) AS files, SUM(chunk_count) AS chunks FROM files GROUP BY namespace"
+        )
+        return {row["namespace"]: {"files": row["files"], "chunks": row["chunks"] or 0} for row in rows}
+
+    @staticmethod
+    def removeNamespace(namespace: str) -> int:
+        """Forget every file indexed into a namespace (its vectors are dropped separately). Returns the count."""
+        with transaction() as conn:
+            file_ids = "SELECT file_id FROM files WHERE namespace = ?"
+            for table in ("chunks", "vectors", "lsh_buckets"):
+                conn.execute(f"DELETE FROM {table} WHERE file_id IN ({file_ids})", (namespace,))
+            conn.execute(
+                "DELETE FROM content_cache WHERE path IN (SELECT path FROM files WHERE namespace = ?)", (namespace,)
+            )
+            removed = conn.execute("DELETE FROM files WHERE namespace = ?", (namespace,)).rowcount
+            _bumpGeneration(conn)
+        return removed
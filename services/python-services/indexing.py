@@ -1,18 +1,238 @@
 import hashlib
-from pineconeService import PineconeService
-from parsers import FileProcessor
+import os
+import archives
+import dedupe
+import shards
+from embeddingProfile import VECTOR_CACHE_DTYPE
+from jobQueue import jobQueue
+from pineconeService import PineconeService, VECTOR_PAYLOAD
+from parsers import FileProcessor, SUPPORTED_TYPES
+from indexStore import IndexStore
+from scheduler import scheduler
 
 
 def _file_id(file_path: str) -> str:
-    """Derive a stable, unique file ID from the absolute path."""
+    """Derive a stable file ID from the absolute path."""
     return "file_" + hashlib.md5(file_path.encode()).hexdigest()[:12]
 
 
-def uploadFileToPinecone(filePath: str):
+def _newFileId(file_path: str) -> str:
+    """
+    File ID for a path without a manifest row. A renamed file keeps the ID derived
+    from its old path, so a new file there gets the next free derived ID instead
+    of overwriting the renamed file's vectors and chunks. Still deterministic, so
+    a crashed job re-run reuses the ID of its first attempt.
+    """
+    file_id = _file_id(file_path)
+    attempt = 0
+    while IndexStore.getFileById(file_id) is not None:
+        attempt += 1
+        file_id = _file_id(f"{file_path}\x00{attempt}")
+    return file_id
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _findRenamedFrom(content_hash: str, filePath: str, namespace: str) -> dict | None:
+    """An indexed file with identical content whose path no longer exists — i.e. a rename (within a shard)."""
+    for entry in IndexStore.findByContentHash(content_hash):
+        if entry["path"] != filePath and entry["namespace"] == namespace and not archives.pathExists(entry["path"]):
+            return entry
+    return None
+
+
+def _reindexDuplicates(file_id: str) -> None:
+    """Duplicates that lost their canonical file are queued to be indexed in their own right."""
+    for duplicate in IndexStore.duplicatesOf(file_id):
+        IndexStore.removeFile(duplicate["path"])
+        jobQueue.enqueue(duplicate["path"])
+
+
+def uploadFileToPinecone(filePath: str, force: bool = False) -> str:
+    """
+    Index a file. Idempotent — safe to re-run after a crash, since vector IDs are
+    deterministic and upserts overwrite. Returns "processed", or "skipped" when the
+    file is unchanged (same size and mtime) since its last successful index.
+    In compact payload mode, returns "updated" or "renamed" when only file metadata
+    changed, without re-embedding or re-upserting any chunk. Returns "duplicate" when
+    the content matches an indexed file, whose vectors are then reused.
+    """
+    filePath = os.path.abspath(filePath)
+    stats = os.stat(filePath)
+    # A file whose root was moved to another shard has changed as far as the index is concerned
+    namespace = shards.namespaceFor(filePath)
+    if not force and IndexStore.isUnchanged(filePath, stats.st_size, stats.st_mtime, namespace):
+        print(f"Skipping unchanged file: {filePath}")
+        return "skipped"
+
+    # Let pending queries go first — parsing is CPU heavy
+    scheduler.yieldToInteractive()
+
+    if archives.isArchive(filePath):
+        result = indexArchive(filePath, force)
+        # The archive's own row has no vectors; it lets an unchanged archive be skipped outright
+        previous = IndexStore.getFile(filePath)
+        IndexStore.recordFile(
+            filePath, previous["file_id"] if previous else _newFileId(filePath),
+            stats.st_size, stats.st_mtime, 0, namespace=namespace,
+        )
+        return result
+
     # Step 1 — Parse, chunk, and prepare metadata
     toUpload = FileProcessor.prepareForPinecone(filePath)
+    return _indexPrepared(filePath, toUpload, stats.st_size, stats.st_mtime, force)
+
+
+def indexArchive(archivePath: str, force: bool = False) -> str:
+    """
+    Index every supported member of a zip/tar archive as its own virtual file
+    (archive.zip!/docs/a.pdf), streaming members from memory. Members whose size
+    and mtime are unchanged are skipped; members gone from the archive are removed.
+    """
+    def accept(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in SUPPORTED_TYPES
+
+    seen = set()
+    counts = {}
+    namespace = shards.namespaceFor(archivePath)
+    for member in archives.iterMembers(archivePath, accept):
+        seen.add(member.virtualPath)
+        if not force and IndexStore.isUnchanged(member.virtualPath, member.size, member.mtime, namespace):
+            result = "skipped"
+        else:
+            try:
+                parsed = FileProcessor.parseBytes(member.virtualPath, member.read(), member.mtime)
+            except Exception as e:
+                # One corrupt member shouldn't fail the whole archive
+                print(f"Failed to parse archive member {member.virtualPath}: {e}")
+                parsed = None
+            if parsed is None:
+                result = "failed"
+            else:
+                toUpload = FileProcessor.prepareForPinecone(member.virtualPath, parsed=parsed)
+                result = _indexPrepared(member.virtualPath, toUpload, member.size, member.mtime, force)
+        counts[result] = counts.get(result, 0) + 1
+        scheduler.yieldToInteractive()
+
+    prefix = os.path.abspath(archivePath) + archives.VIRTUAL_SEPARATOR
+    for entry in IndexStore.listFilesUnder(prefix):
+        if entry["path"] not in seen:
+            removeFromIndex(entry["path"])
+            counts["removed"] = counts.get("removed", 0) + 1
+
+    print(f"Indexed archive {archivePath}: {counts}")
+    return "processed"
 
-    # Step 2 — Upload to Pinecone (singleton handles lazy init)
+
+def removeFromIndex(filePath: str) -> bool:
+    """
+    Delete a file's vectors and manifest row (members too, for an archive).
+    Returns False if the file was never indexed.
+    """
+    filePath = os.path.abspath(filePath)
+    if archives.isArchive(filePath):
+        for entry in IndexStore.listFilesUnder(filePath + archives.VIRTUAL_SEPARATOR):
+            removeFromIndex(entry["path"])
+
+    entry = IndexStore.getFile(filePath)
+    if entry is None:
+        return False
+
+    if entry["canonical_id"] is None and entry["chunk_count"]:
+        PineconeService().deleteChunks(entry["file_id"], range(entry["chunk_count"]), entry["namespace"])
+    IndexStore.removeFile(filePath)
+    _reindexDuplicates(entry["file_id"])
+    return True
+
+
+def deleteFromIndex(filePath: str) -> str:
+    """Job handler for files deleted from disk (see reconcile.py)."""
+    if os.path.exists(filePath):
+        # Re-created since the delete was queued — leave it to its index job
+        return "skipped"
+    return "removed" if removeFromIndex(filePath) else "not-indexed"
+
+
+def _indexPrepared(filePath: str, toUpload: dict, size: int, mtime: float, force: bool) -> str:
+    """Index already parsed and chunked content for a real or virtual path."""
+    chunks = toUpload["chunks"]
+    metadata = toUpload["metadata"]
+    content_hash = _content_hash("\n".join(chunks))
+    previous = IndexStore.getFile(filePath)
+    namespace = shards.namespaceFor(filePath)
+    # Its root now maps to another shard, so its vectors have to move
+    moved = previous is not None and previous["namespace"] != namespace
+
+    # Step 2 — Compact vectors only reference the file ID, so a metadata-only
+    # change (mtime touch, rename) just updates the local store
+    if VECTOR_PAYLOAD == "compact" and not force and not moved:
+        if previous and previous["content_hash"] == content_hash:
+            IndexStore.recordFile(
+                filePath, previous["file_id"], size, mtime,
+                previous["chunk_count"], content_hash, metadata, previous["canonical_id"], namespace,
+            )
+            return "updated"
+
+        renamed_from = _findRenamedFrom(content_hash, filePath, namespace)
+        if renamed_from:
+            if previous:
+                # Renamed over an indexed file — its vectors and rows go, its duplicates get re-indexed
+                removeFromIndex(filePath)
+            IndexStore.moveFile(renamed_from["path"], filePath)
+            IndexStore.recordFile(
+                filePath, renamed_from["file_id"], size, mtime,
+                renamed_from["chunk_count"], content_hash, metadata, renamed_from["canonical_id"], namespace,
+            )
+            print(f"Renamed {renamed_from['path']} -> {filePath} (vectors reused)")
+            return "renamed"
+
+    # Keep an existing file ID so renamed-then-edited files overwrite their own vectors
     pc = PineconeService()
-    file_id = _file_id(filePath)
-    pc.indexFile(toUpload["chunks"], toUpload["metadata"], file_id)
+    file_id = previous["file_id"] if previous else _newFileId(filePath)
+    if moved and previous["canonical_id"] is None and previous["chunk_count"]:
+        pc.deleteChunks(file_id, range(previous["chunk_count"]), previous["namespace"])
+
+    # Step 3 — Copies of an indexed file reuse its vectors instead of being embedded again.
+    # An exact copy is found by its hash; only otherwise is the (costly) MinHash signature computed
+    canonical = dedupe.findExact(file_id, filePath, content_hash, namespace) if chunks else None
+    sig = None
+    if canonical is None and dedupe.DEDUPE_ENABLED:
+        sig = dedupe.signature("\n".join(chunks))
+        canonical = dedupe.findNear(file_id, filePath, sig, namespace)
+    if canonical:
+        if previous and previous["canonical_id"] is None:
+            # This file used to be canonical — hand its duplicates over and drop its own vectors
+            IndexStore.repointDuplicates(file_id, canonical["file_id"])
+            if previous["chunk_count"] and not moved:
+                pc.deleteChunks(file_id, range(previous["chunk_count"]), namespace)
+        IndexStore.recordFile(
+            filePath, file_id, size, mtime, 0, content_hash, metadata,
+            canonical["file_id"], namespace,
+        )
+        # Only canonical files are LSH candidates, so duplicate chains never form
+        IndexStore.setSignature(file_id, None, [])
+        print(f"Duplicate of {canonical['path']}: {filePath}")
+        return "duplicate"
+
+    # Step 4 — Upload to Pinecone (singleton handles lazy init)
+    embeddings = pc.indexFile(chunks, metadata, file_id, namespace)
+    IndexStore.storeChunks(file_id, chunks, toUpload.get("offsets"))
+    if VECTOR_CACHE_DTYPE != "none":
+        IndexStore.storeVectors(file_id, embeddings, VECTOR_CACHE_DTYPE)
+
+    # Step 5 — Drop chunks left over from a previous, longer version of the file
+    if previous and not moved and previous["chunk_count"] > len(chunks):
+        pc.deleteChunks(file_id, range(len(chunks), previous["chunk_count"]), namespace)
+
+    # Step 6 — Record in the manifest last, so a crash before this point re-runs the job
+    IndexStore.recordFile(
+        filePath, file_id, size, mtime, len(chunks), content_hash, metadata, namespace=namespace,
+    )
+    IndexStore.setSignature(file_id, dedupe.pack(sig), dedupe.buckets(sig) if sig else [])
+
+    # Step 7 — Duplicates of the old content no longer match; index them in their own right
+    if previous and (previous["content_hash"] != content_hash or moved):
+        _reindexDuplicates(file_id)
+    return "processed"
@@ -0,0 +1,397 @@
+"""Durable indexing job queue backed by the local SQLite index store.
+
+/process-file enqueues a job instead of indexing inline. A dispatcher thread
+claims pending jobs and runs them on the scheduler's background lane.
+Jobs are at-least-once: anything left "running" by a crash is re-queued, and
+indexing itself is idempotent (deterministic vector IDs).
+
+Requests for the same file coalesce: while a file has a pending job, further
+requests fold into it (latest wins — the job reads the file when it runs), and
+while its job is running, one pending follow-up collects everything that arrives.
+A new job waits INDEX_SETTLE_MS before it can run, and every folded request pushes
+that back, up to INDEX_SETTLE_MAX_MS after the first — so a burst of saves to a
+file being written costs one run after the burst, not one per save.
+
+Several service processes can share one queue. A claimed job carries its
+owner and a lease the owner keeps renewing; a job whose lease lapses (its
+process died, or the job has run for longer than JOB_MAX_RUN_SECONDS and is
+presumed hung) is re-queued by whichever process notices first, this one
+included. Jobs of a local process that has exited are re-queued right away.
+A file is only ever indexed by one job at a time, whatever process claimed it.
+
+    INDEX_SETTLE_MS       300
+    INDEX_SETTLE_MAX_MS   5000
+    JOB_LEASE_SECONDS     60
+    JOB_MAX_RUN_SECONDS   1800 — leases stop being renewed after this
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+
+import profiling
+from indexStore import IndexStore, connect, transaction
+from scheduler import scheduler, BACKGROUND
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+INDEX = "index"
+DELETE = "delete"
+
+# Identifies this process in jobs.owner — host:pid:nonce (the nonce tells apart two
+# processes that got the same PID, e.g. across a restart)
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _ownerExited(owner: str | None) -> bool:
+    """
+    True only if the owner is known to be gone: malformed, or a process on this
+    host whose PID no longer exists. A live PID proves nothing — PIDs are reused —
+    so those jobs, like other hosts', are reclaimed when their lease lapses.
+    """
+    try:
+        host, pid, _ = owner.rsplit(":", 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return True
+    if host != socket.gethostname() or owner == OWNER_ID:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class JobQueue:
+
+    def __init__(self):
+        self.max_attempts = int(os.getenv("INDEX_MAX_ATTEMPTS", "3"))
+        self.retry_delay = float(os.getenv("INDEX_RETRY_DELAY_MS", "5000")) / 1000
+        self.retention_seconds = float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600
+        self.lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        self.max_run_seconds = float(os.getenv("JOB_MAX_RUN_SECONDS", "1800"))
+        self.settle_seconds = float(os.getenv("INDEX_SETTLE_MS", "300")) / 1000
+        self.settle_max_seconds = float(os.getenv("INDEX_SETTLE_MAX_MS", "5000")) / 1000
+        self.poll_interval = 0.5
+
+        # kind -> callable(filePath) returning a short result string
+        self._handlers = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, kind: str, handler) -> None:
+        self._handlers[kind] = handler
+
+    # ── Producer side ──
+
+    def enqueue(self, filePath: str, kind: str = INDEX, profile: str = None) -> int:
+        """
+        Add a job for a file, to run once the file has settled. If a pending job for
+        the same file and kind already exists, the request folds into it (its settle
+        window restarts, within INDEX_SETTLE_MAX_MS) and its ID is returned.
+        `profile` (a profiling mode) profiles the job when it runs.
+        """
+        filePath = os.path.abspath(filePath)
+        now = time.time()
+        with transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE file_path = ? AND kind = ? AND status = ?",
+                (filePath, kind, PENDING),
+            ).fetchone()
+            if row:
+                job_id = row["id"]
+                # Never pull a retry backoff forward; never push past the settle cap
+                conn.execute(
+                    "UPDATE jobs SET coalesced = coalesced + 1, profile = COALESCE(?, profile), "
+                    "not_before = MAX(not_before, MIN(?, enqueued_at + ?)) WHERE id = ?",
+                    (profile, now + self.settle_seconds, self.settle_max_seconds, job_id),
+                )
+            else:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, file_path, status, enqueued_at, not_before, profile) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, filePath, PENDING, now, now + self.settle_seconds, profile),
+                ).lastrowid
+
+        self._wake.set()
+        return job_id
+
+    def enqueueMany(self, filePaths: list[str], kind: str = INDEX) -> list[int]:
+        """
+        enqueue() for many files in a single transaction, without a settle window
+        (for bulk scans of files at rest). Returns job IDs in order.
+        """
+        if not filePaths:
+            return []
+        now = time.time()
+        job_ids = []
+        with transaction() as conn:
+            for filePath in filePaths:
+                filePath = os.path.abspath(filePath)
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE file_path = ? AND kind = ? AND status = ?",
+                    (filePath, kind, PENDING),
+                ).fetchone()
+                if row:
+                    job_ids.append(row["id"])
+                else:
+                    job_ids.append(conn.execute(
+                        "INSERT INTO jobs (kind, file_path, status, enqueued_at, not_before) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (kind, filePath, PENDING, now, now),
+                    ).lastrowid)
+
+        self._wake.set()
+        return job_ids
+
+    def getJob(self, job_id: int) -> dict | None:
+        row = connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    async def waitFor(self, job_id: int, timeout: float = None) -> dict | None:
+        """Poll until a job reaches a terminal state (or timeout). Returns the job row."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            # Off the event loop — the read can wait on another process's write lock
+            job = await asyncio.to_thread(self.getJob, job_id)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            if deadline and time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(0.2)
+
+    # ── Consumer side ──
+
+    def _claim(self) -> dict | None:
+        """
+        Atomically move the oldest ready job from pending to running, owned by this
+        process. Files that already have a running job (here or in another process) wait.
+        """
+        with transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND not_before <= ? "
+                "AND file_path NOT IN (SELECT file_path FROM jobs WHERE status = ?) "
+                "ORDER BY id LIMIT 1",
+                (PENDING, time.time(), RUNNING),
+            ).fetchone()
+            job = None
+            if row:
+                now = time.time()
+                job = dict(conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                    "owner = ?, lease_until = ? WHERE id = ? RETURNING *",
+                    (RUNNING, now, OWNER_ID, now + self.lease_seconds, row["id"]),
+                ).fetchone())
+        return job
+
+    # Terminal updates only apply while this claim still holds the job — if the lease
+    # lapsed and the job was claimed again (by any process, this one included), the
+    # newer run's outcome wins. attempts identifies the claim.
+
+    def _finish(self, job: dict, status: str, result: str = None, error: str = None) -> bool:
+        return connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL, "
+            "lease_until = NULL WHERE id = ? AND owner = ? AND attempts = ?",
+            (status, result, error, time.time(), job["id"], OWNER_ID, job["attempts"]),
+        ).rowcount == 1
+
+    @staticmethod
+    def _recordFailure(job: dict, error: str) -> None:
+        """Remember the size/mtime an index job gave up on, so reconcile won't re-queue the file unchanged."""
+        if job["kind"] != INDEX:
+            return
+        try:
+            stats = os.stat(job["file_path"])
+        except OSError:
+            return
+        IndexStore.recordFailure(job["file_path"], stats.st_size, stats.st_mtime, error)
+
+    def _retry(self, job: dict, error: str) -> None:
+        with transaction() as conn:
+            newer = conn.execute(
+                "SELECT id FROM jobs WHERE file_path = ? AND kind = ? AND status = ? AND id != ?",
+                (job["file_path"], job["kind"], PENDING, job["id"]),
+            ).fetchone()
+            if newer:
+                # A follow-up run is already queued for this file — it is the retry
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL, "
+                    "lease_until = NULL WHERE id = ? AND owner = ? AND attempts = ?",
+                    (DONE, "superseded", error, time.time(), job["id"], OWNER_ID, job["attempts"]),
+                )
+                return
+
+        # Linear backoff; the job keeps its ID so waiters keep polling it
+        connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, not_before = ?, owner = NULL, lease_until = NULL "
+            "WHERE id = ? AND owner = ? AND attempts = ?",
+            (PENDING, error, time.time() + self.retry_delay * job["attempts"], job["id"], OWNER_ID,
+             job["attempts"]),
+        )
+
+    def _renewLeases(self) -> None:
+        # A job past JOB_MAX_RUN_SECONDS is presumed hung — its lease is left to lapse
+        now = time.time()
+        connect().execute(
+            "UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ? AND started_at > ?",
+            (now + self.lease_seconds, RUNNING, OWNER_ID, now - self.max_run_seconds),
+        )
+
+    def _requeueOrphans(self) -> int:
+        """Re-queue running jobs whose lease lapsed, or whose local owner process has exited."""
+        now = time.time()
+        with transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, owner, lease_until FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            orphans = [
+                row["id"] for row in rows
+                if (row["lease_until"] or 0) < now or _ownerExited(row["owner"])
+            ]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, not_before = ?, owner = NULL, lease_until = NULL WHERE id = ?",
+                [(PENDING, now, job_id) for job_id in orphans],
+            )
+        return len(orphans)
+
+    def _run(self, job: dict) -> None:
+        handler = self._handlers.get(job["kind"])
+        profile_token = profiling.begin(job["profile"], f"job{job['id']}") if job.get("profile") else None
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind: {job['kind']}")
+            result = handler(job["file_path"])
+            self._finish(job, DONE, result=result)
+        except (FileNotFoundError, ValueError) as e:
+            # Deterministic failures (file gone, unsupported type) — retrying won't help
+            if self._finish(job, FAILED, error=str(e)):
+                self._recordFailure(job, str(e))
+        except Exception as e:
+            print(f"Job {job['id']} failed (attempt {job['attempts']}): {e}")
+            if job["attempts"] < self.max_attempts:
+                self._retry(job, str(e))
+            elif self._finish(job, FAILED, error=str(e)):
+                self._recordFailure(job, str(e))
+        finally:
+            if profile_token is not None:
+                artifacts = profiling.end(profile_token)
+                print(f"Job {job['id']} profiled: {', '.join(map(os.path.basename, artifacts))}")
+            self._wake.set()
+
+    def _dispatch(self) -> None:
+        next_maintenance = 0.0
+        while not self._stop.is_set():
+            # Heartbeat well inside the lease, and pick up jobs orphaned by other processes
+            if time.monotonic() >= next_maintenance:
+                self._renewLeases()
+                if self._requeueOrphans():
+                    print("Re-queued indexing jobs orphaned by another process")
+                next_maintenance = time.monotonic() + self.lease_seconds / 3
+
+            # Only claim as many jobs as the background lane can start right away,
+            # so unclaimed jobs stay durable in the database rather than in memory
+            lane = scheduler.stats()[BACKGROUND]
+            if lane["queued"] + lane["running"] >= lane["workers"]:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            job = self._claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            scheduler.submit(BACKGROUND, self._run, job)
+
+    def recover(self) -> int:
+        """
+        Re-queue jobs left running by a crashed process and prune old finished jobs.
+        Jobs still leased by a live process are left alone. Call once at startup,
+        before start(). Returns the number of re-queued jobs.
+        """
+        recovered = self._requeueOrphans()
+        connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - self.retention_seconds),
+        )
+        if recovered:
+            print(f"Recovered {recovered} interrupted indexing jobs")
+        return recovered
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ── Status ──
+
+    def stats(self) -> dict:
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        coalesced = 0
+        for row in connect().execute(
+            "SELECT status, COUNT(*) AS n, SUM(coalesced) AS folded FROM jobs GROUP BY status"
+        ):
+            counts[row["status"]] = row["n"]
+            coalesced += row["folded"] or 0
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "coalesced": coalesced,
+            "owner": OWNER_ID,
+            "progress": round((counts[DONE] + counts[FAILED]) / total, 4) if total else 1.0,
+        }
+
+    def progress(self, job_ids: list[int]) -> dict:
+        """Status counts for a specific set of jobs (e.g. one reconcile pass)."""
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        conn = connect()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(job_ids), 900):
+            batch = job_ids[i:i + 900]
+            rows = conn.execute(
+                f"SELECT status, COUNT(*) AS n FROM jobs WHERE id IN ({','.join('?' * len(batch))}) "
+                "GROUP BY status",
+                batch,
+            )
+            for row in rows:
+                counts[row["status"]] += row["n"]
+        total = len(job_ids)
+        return {
+            **counts,
+            "total": total,
+            "progress": round((counts[DONE] + counts[FAILED]) / total, 4) if total else 1.0,
+        }
+
+    def listJobs(self, status: str = None, limit: int = 50) -> list[dict]:
+        if status:
+            rows = connect().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+            )
+        else:
+            rows = connect().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+
+# Shared process-wide queue
+jobQueue = JobQueue()
@@ -0,0 +1,190 @@
+"""Latency budgets for /search and /rank — per-stage deadlines, hedged reads, degraded results.
+
+Each request gets an end-to-end budget. Every stage (embed, vector query, load,
+LLM) runs under a deadline carved from what is left of it; a stage that misses
+its deadline (or fails) is skipped and the caller degrades instead of waiting.
+Local stages run on the interactive lane. Remote stages run on the remote lane
+and get the time left to their deadline as their client's request timeout, so
+an abandoned call (or a losing hedge) gives up too instead of holding a worker
+after the request moved on, and a stage still queued at its deadline never starts.
+
+Idempotent reads are hedged: when one is still running past the HEDGE_PERCENTILE
+of its recent latencies, an identical second request is sent and whichever
+answers first wins. Hedging starts once a stage has MIN_SAMPLES latencies.
+
+    SEARCH_BUDGET_MS   1500 (0 disables the budget — wait as long as it takes)
+    RANK_BUDGET_MS     8000 (0 disables)
+    HEDGE_PERCENTILE   90 (0 disables hedging)
+    HEDGE_MIN_MS       50
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import queryTrace
+from scheduler import scheduler, INTERACTIVE, REMOTE
+
+SEARCH_BUDGET_MS = float(os.getenv("SEARCH_BUDGET_MS", "1500"))
+RANK_BUDGET_MS = float(os.getenv("RANK_BUDGET_MS", "8000"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_MS = float(os.getenv("HEDGE_MIN_MS", "50"))
+
+MIN_SAMPLES = 20
+WINDOW = 200
+
+
+class StageSkipped(Exception):
+    """A stage missed its deadline or failed; the caller should degrade."""
+
+    def __init__(self, stage: str, reason: str):
+        super().__init__(f"{stage} skipped: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+
+class LatencyTracker:
+    """Recent latencies per stage, and counters for hedges and skips."""
+
+    def __init__(self):
+        self._samples: dict[str, deque] = {}
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=WINDOW)).append(ms)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._counters[key] += 1
+
+    def percentile(self, stage: str, p: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+    def hedgeDelay(self, stage: str) -> float | None:
+        """Seconds to wait before hedging a stage, or None to not hedge (yet)."""
+        if HEDGE_PERCENTILE <= 0:
+            return None
+        ms = self.percentile(stage, HEDGE_PERCENTILE)
+        return None if ms is None else max(ms, HEDGE_MIN_MS) / 1000
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            stages = set(self._samples) | {key.rsplit(".", 1)[0] for key in counters}
+        return {
+            stage: {
+                "p50Ms": _round(self.percentile(stage, 50)),
+                "p90Ms": _round(self.percentile(stage, 90)),
+                "p99Ms": _round(self.percentile(stage, 99)),
+                **{kind: counters.get(f"{stage}.{kind}", 0)
+                   for kind in ("hedged", "hedgeWon", "timedOut", "failed")},
+            }
+            for stage in sorted(stages)
+        }
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 2)
+
+
+tracker = LatencyTracker()
+
+
+class Budget:
+    """One request's latency budget. `skipped` lists the stages it had to give up on."""
+
+    def __init__(self, total_ms: float):
+        self.total = total_ms / 1000 if total_ms > 0 else None
+        self.started = time.perf_counter()
+        self.skipped: list[str] = []
+
+    def remaining(self) -> float | None:
+        if self.total is None:
+            return None
+        return max(0.0, self.total - (time.perf_counter() - self.started))
+
+    def _submit(self, stage: str, fn, args, deadline: float | None, remote: bool) -> asyncio.Future:
+        submitted = time.perf_counter()
+
+        def call():
+            # Queued past the deadline — the caller has moved on, so don't start at all
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"{stage} reached its deadline before it started")
+            if remote and remaining is not None:
+                return fn(*args, timeout=remaining)
+            return fn(*args)
+
+        future = scheduler.submit(REMOTE if remote else INTERACTIVE, call)
+
+        def done(f):
+            # Late completions count too, so a slow upstream raises its own percentile
+            if not f.cancelled() and f.exception() is None:
+                tracker.record(stage, (time.perf_counter() - submitted) * 1000)
+        future.add_done_callback(done)
+        wrapped = asyncio.wrap_future(future)
+        # An abandoned attempt's error is never awaited — retrieve it so it isn't logged
+        wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return wrapped
+
+    async def stage(self, name: str, fn, *args, share: float = 1.0, hedge: bool = False,
+                    remote: bool = False):
+        """
+        Run fn(*args) within `share` of the remaining budget, on the interactive lane.
+        hedge=True (idempotent reads only) sends a duplicate once the first call is
+        slower than usual. remote=True (network calls) runs it on the remote lane
+        and passes the seconds left to the deadline as fn(..., timeout=...) when
+        there is one. Raises StageSkipped if no call succeeds in time.
+        """
+        remaining = self.remaining()
+        timeout = None if remaining is None else remaining * share
+        if timeout is not None and timeout <= 0:
+            return self._skip(name, "timedOut")
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        hedge_at = tracker.hedgeDelay(name) if hedge else None
+        if hedge_at is not None:
+            hedge_at += time.perf_counter()
+
+        attempts = {self._submit(name, fn, args, deadline, remote)}
+        first = next(iter(attempts))
+        error = None
+        with queryTrace.stage(name):
+            while attempts:
+                wake = min((t for t in (deadline, hedge_at) if t is not None), default=None)
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=None if wake is None else max(0.0, wake - time.perf_counter()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            tracker.count(f"{name}.hedgeWon")
+                        return attempt.result()
+                    error = attempt.exception()
+
+                now = time.perf_counter()
+                if deadline is not None and now >= deadline:
+                    break
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    tracker.count(f"{name}.hedged")
+                    attempts.add(self._submit(name, fn, args, deadline, remote))
+
+        if error is not None and not attempts:
+            print(f"Stage {name} failed: {error}")
+            return self._skip(name, "failed")
+        return self._skip(name, "timedOut")
+
+    def _skip(self, name: str, reason: str):
+        tracker.count(f"{name}.{reason}")
+        self.skipped.append(name)
+        raise StageSkipped(name, reason)
@@ -0,0 +1,137 @@
+"""Index migration — build a Pinecone index for a different embedding profile.
+
+Run with the *current* profile in the environment (the source index), e.g.
+
+    python migrateIndex.py --dimensions 256 --target-index findly-256 --cache-dtype int8
+
+then switch the service over with PINECONE_INDEX=findly-256 EMBEDDING_DIMENSIONS=256.
+
+Vectors come from the cheapest available source, per file:
+  1. the local vector cache (VECTOR_CACHE_DTYPE), truncated and re-normalized
+  2. the source index (fetch by ID), truncated and re-normalized
+  3. re-embedding the locally stored chunk text at the target dimension
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Load .env from project root (two levels up from services/python-services/)
+load_dotenv(os.path.join(os.path.dirname(__file__), "../../.env"))
+
+from embeddingProfile import SUPPORTED_DIMENSIONS, SUPPORTED_DTYPES, embeddingKwargs, truncate
+from indexStore import IndexStore
+from pineconeService import PineconeService
+
+
+def _fetchSource(pc: PineconeService, ids: list[str], namespace: str) -> dict:
+    fetched = {}
+    for i in range(0, len(ids), 100):
+        fetched.update(pc.index.fetch(ids=ids[i:i + 100], namespace=namespace).vectors)
+    return fetched
+
+
+def _sourceVectors(pc: PineconeService, entry: dict, dimensions: int) -> tuple[list, list | None, str]:
+    """Return (values, source metadata or None, source name) for every chunk of a file."""
+    file_id = entry["file_id"]
+    count = entry["chunk_count"]
+
+    cached = IndexStore.getVectors(file_id)
+    if len(cached) == count and len(cached[0]) >= dimensions:
+        return cached, None, "cache"
+
+    ids = [f"{file_id}_{idx}" for idx in range(count)]
+    fetched = _fetchSource(pc, ids, entry["namespace"])
+    if len(fetched) == count and len(fetched[ids[0]].values) >= dimensions:
+        return [fetched[i].values for i in ids], [fetched[i].metadata for i in ids], "index"
+
+    chunks = IndexStore.getChunks(file_id)
+    if len(chunks) != count:
+        raise ValueError(f"No vectors or chunk text available for {entry['path']}")
+    values = []
+    for i in range(0, count, 100):
+        response = pc.openai_client.embeddings.create(
+            input=chunks[i:i + 100], **embeddingKwargs(dimensions)
+        )
+        values.extend(item.embedding for item in response.data)
+    return values, None, "re-embedded"
+
+
+def migrateFile(pc: PineconeService, target, entry: dict, dimensions: int, cache_dtype: str | None) -> str:
+    file_id = entry["file_id"]
+    values, source_metadata, source = _sourceVectors(pc, entry, dimensions)
+    values = [truncate(v, dimensions) for v in values]
+
+    # Prefer locally stored text/metadata; fall back to what the source vectors carried
+    chunks = IndexStore.getChunks(file_id)
+    vectors = []
+    for idx, embedding in enumerate(values):
+        if len(chunks) == len(values) and entry["metadata"]:
+            metadata = PineconeService._vectorMetadata(file_id, idx, chunks[idx], entry["metadata"])
+        elif source_metadata:
+            metadata = dict(source_metadata[idx])
+        else:
+            metadata = {"fileId": file_id, "chunk_index": idx}
+        vectors.append({"id": f"{file_id}_{idx}", "values": embedding, "metadata": metadata})
+
+    for i in range(0, len(vectors), 100):
+        target.upsert(vectors=vectors[i:i + 100], namespace=entry["namespace"])
+
+    if cache_dtype:
+        IndexStore.storeVectors(file_id, values, cache_dtype)
+    return source
+
+
+def migrate(target_index: str, dimensions: int, cache_dtype: str | None = None, workers: int = 4) -> dict:
+    from pinecone import ServerlessSpec
+
+    pc = PineconeService()
+    pc.ensure_initialize()
+
+    if target_index not in pc.client.list_indexes().names():
+        print(f"Creating index {target_index} ({dimensions} dims)...")
+        pc.client.create_index(
+            name=target_index,
+            dimension=dimensions,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+        )
+    target = pc.client.Index(target_index)
+
+    entries = [e for e in IndexStore.listFiles() if e["chunk_count"] > 0]
+    sources = {"cache": 0, "index": 0, "re-embedded": 0, "failed": 0}
+
+    def run(entry):
+        try:
+            return migrateFile(pc, target, entry, dimensions, cache_dtype)
+        except Exception as e:
+            print(f"Failed to migrate {entry['path']}: {e}")
+            return "failed"
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, source in enumerate(pool.map(run, entries), 1):
+            sources[source] += 1
+            if done % 100 == 0 or done == len(entries):
+                print(f"Migrated {done}/{len(entries)} files")
+
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-index", required=True)
+    parser.add_argument("--dimensions", type=int, required=True, choices=SUPPORTED_DIMENSIONS)
+    parser.add_argument("--cache-dtype", choices=SUPPORTED_DTYPES, help="re-cache vectors locally in this dtype")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    sources = migrate(args.target_index, args.dimensions, args.cache_dtype, args.workers)
+    print(f"Done. Vector sources: {sources}")
+    print(f"Switch over with PINECONE_INDEX={args.target_index} EMBEDDING_DIMENSIONS={args.dimensions}"
+          + (f" VECTOR_CACHE_DTYPE={args.cache_dtype}" if args.cache_dtype else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,27 @@
-"""File parsers — PDF, text, code, and image (OCR) extraction."""
-import pymupdf
+"""File parsers — PDF, text, code, and image (OCR) extraction.
+
+Parser backends (pymupdf, lxml, PIL, pytesseract) are imported lazily on the
+first file of each type, so importing this module stays cheap at startup.
+"""
+import io
 import os
-import json
 import zipfile
-from lxml import etree
-from PIL import Image
-import pytesseract
 from datetime import datetime
 
-LOCAL_DUMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "localdump.json")
+import textSampling
+import queryTrace
+import tokenizer
+from profiling import profiled
+from archives import isMember, readMember
+from indexStore import IndexStore
+
+# Extensions read as plain text: text, markdown, code, data, and extensionless (README, Makefile, etc.)
+TEXT_TYPES = (".txt", ".md", ".py", ".js", ".ts", ".json", ".csv", ".html", ".css", ".log", "")
+SUPPORTED_TYPES = TEXT_TYPES + (".pdf", ".docx", ".pptx", ".png", ".jpg", ".jpeg")
 
-# In-memory cache buffer — avoids reading/writing JSON on every storeContent call
-# Each entry: { "content": str, "metadata": dict }
-_cache_buffer: dict[str, dict] = {}
-_cache_dirty: bool = False
+# Upper bound on chunks embedded per plain-text file (TEXT_TYPES), however large —
+# documents (PDF, DOCX, PPTX) are always embedded whole
+MAX_CHUNKS_PER_FILE = int(os.getenv("MAX_CHUNKS_PER_FILE", "1000"))
 
 class File:
     def __init__(self, fileName: str):
@@ -26,24 +34,43 @@ class FileProcessor:
     def __init__(self):
         pass
 
+    @staticmethod
+    def preloadBackends() -> None:
+        """Import every parser backend up front (eager startup mode)."""
+        import pymupdf  # noqa: F401
+        import pytesseract  # noqa: F401
+        from lxml import etree  # noqa: F401
+        from PIL import Image  # noqa: F401
+
+    # Every parser takes a path or an in-memory binary file (archive members are never
+    # extracted to disk)
+
     # PDF PARSER
     @staticmethod
-    def parsePdf(fileName: str) -> str:
-        doc = pymupdf.open(fileName)
+    def parsePdf(fileName: str | io.BytesIO) -> str:
+        import pymupdf
+
+        if isinstance(fileName, str):
+            doc = pymupdf.open(fileName)
+        else:
+            doc = pymupdf.open(stream=fileName.read(), filetype="pdf")
         try:
             return "".join(page.get_text() for page in doc)
         finally:
             doc.close()
 
-    # TEXT + CODE PARSER
+    # TEXT + CODE PARSER — large files are sampled, see textSampling.py
     @staticmethod
-    def parseTxt(fileName: str) -> str:
-        with open(fileName, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+    def parseTxt(fileName: str | io.BytesIO, file_type: str = "") -> str:
+        if not isinstance(fileName, str):
+            return textSampling.extractBytes(fileName.read(), file_type)
+        return textSampling.extractText(fileName)
 
     # DOCX PARSER — direct XML extraction (faster than python-docx)
     @staticmethod
-    def parseDocx(fileName: str) -> str:
+    def parseDocx(fileName: str | io.BytesIO) -> str:
+        from lxml import etree
+
         ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
         with zipfile.ZipFile(fileName) as z:
             xml = z.read("word/document.xml")
@@ -57,7 +84,9 @@ class FileProcessor:
 
     # PPTX PARSER — direct XML extraction (faster than python-pptx)
     @staticmethod
-    def parsePptx(fileName: str) -> str:
+    def parsePptx(fileName: str | io.BytesIO) -> str:
+        from lxml import etree
+
         ns = {"a": "http://schemas.openxmlformats.org/drawingml/2006/main"}
         parts = []
         with zipfile.ZipFile(fileName) as z:
@@ -76,7 +105,10 @@ class FileProcessor:
 
     # IMAGE OCR PARSER
     @staticmethod
-    def parseImage(fileName: str) -> str:
+    def parseImage(fileName: str | io.BytesIO) -> str:
+        import pytesseract
+        from PIL import Image
+
         img = Image.open(fileName)
         text = pytesseract.image_to_string(img)
         return text.strip()
@@ -118,83 +150,30 @@ class FileProcessor:
             "lastAccessedReadable": datetime.fromtimestamp(stats.st_atime).isoformat(),
         }
 
+    # Parsed content is cached in the shared SQLite store, so every service process
+    # (and every uvicorn worker) sees the same cache without rewriting a shared file
+
     @staticmethod
     def clearCache() -> None:
-        """
-        Clear the local content cache (both in-memory buffer and localdump.json on disk).
-        Call this once at service startup so each session starts fresh.
-        """
-        global _cache_buffer, _cache_dirty
-        _cache_buffer = {}
-        _cache_dirty = False
-
-        with open(LOCAL_DUMP_PATH, 'w', encoding='utf-8') as f:
-            json.dump({}, f)
-
-        print("Cleared localdump.json cache for new session")
+        """Clear the local content cache."""
+        IndexStore.clearContentCache()
+        print("Cleared content cache")
 
     @staticmethod
     def storeContent(fileName: str, content: str, metadata: dict = None) -> None:
         """
-        Cache parsed content and metadata into the in-memory buffer.
+        Cache parsed content and metadata.
         Uses the absolute file path as key to avoid collisions.
         """
-        global _cache_buffer, _cache_dirty
-        file_path = os.path.abspath(fileName)
-        _cache_buffer[file_path] = {
-            "content": content,
-            "metadata": metadata or {}
-        }
-        _cache_dirty = True
-
-    @staticmethod
-    def flushCache() -> None:
-        """
-        Write the in-memory cache buffer to localdump.json.
-        Called after a batch of files has been parsed.
-        """
-        global _cache_buffer, _cache_dirty
-        if not _cache_dirty:
-            return
-
-        # Snapshot the buffer to avoid "dictionary changed size during iteration"
-        # when concurrent background tasks call storeContent while we serialize.
-        snapshot = dict(_cache_buffer)
-
-        with open(LOCAL_DUMP_PATH, 'w', encoding='utf-8') as f:
-            json.dump(snapshot, f, ensure_ascii=False, indent=2)
-
-        _cache_dirty = False
-        print(f"Flushed {len(snapshot)} entries to localdump.json")
+        IndexStore.cacheContent(os.path.abspath(fileName), content, metadata or {})
 
     @staticmethod
     def loadCachedFile(fileName: str) -> dict | None:
         """
-        Load cached content and metadata — checks in-memory buffer first, falls back to disk.
+        Load cached content and metadata.
         Returns {"content": str, "metadata": dict} if found, None otherwise.
         """
-        global _cache_buffer
-        file_path = os.path.abspath(fileName)
-
-        # Check in-memory buffer first (fastest)
-        if file_path in _cache_buffer:
-            return _cache_buffer[file_path]
-
-        # Fall back to disk
-        if not os.path.exists(LOCAL_DUMP_PATH):
-            return None
-
-        try:
-            with open(LOCAL_DUMP_PATH, 'r', encoding='utf-8') as f:
-                text = f.read().strip()
-                if not text:
-                    return None
-                dump = json.loads(text)
-                # Populate buffer from disk for future lookups
-                _cache_buffer.update(dump)
-                return dump.get(file_path)
-        except (json.JSONDecodeError, IOError):
-            return None
+        return IndexStore.getCachedContent(os.path.abspath(fileName))
 
     @staticmethod
     def loadContent(fileName: str) -> str | None:
@@ -208,37 +187,70 @@ class FileProcessor:
         return None
 
     @staticmethod
+    def extractContent(source: str | io.BytesIO, file_type: str) -> str:
+        """Dispatch to the parser for a (lowercase) file extension."""
+        if file_type == ".pdf":
+            return FileProcessor.parsePdf(source)
+        elif file_type in TEXT_TYPES:
+            return FileProcessor.parseTxt(source, file_type)
+        elif file_type == ".docx":
+            return FileProcessor.parseDocx(source)
+        elif file_type == ".pptx":
+            return FileProcessor.parsePptx(source)
+        elif file_type in (".png", ".jpg", ".jpeg"):
+            return FileProcessor.parseImage(source)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+    @staticmethod
+    @profiled("parseFile")
     def parseFile(fileName: str) -> dict:
         """
         Parse a file and extract both metadata and content.
 
         Handles case-insensitive file extensions and files without extensions.
+        Virtual archive paths (archive.zip!/docs/a.pdf) are read from the archive in memory.
         """
+        if isMember(fileName):
+            member = readMember(fileName)
+            return FileProcessor.parseBytes(fileName, member.read(), member.mtime)
+
         # Extracts metadata
         metadata = FileProcessor.extractMetadata(fileName)
 
         # Parses the file content - normalize to lowercase for case-insensitive matching
         file_type = metadata["fileType"].lower()
-        content = ""
-
-        if file_type == ".pdf":
-            content = FileProcessor.parsePdf(fileName)
-        elif file_type in (".txt", ".md", ".py", ".js", ".ts", ".json", ".csv", ".html", ".css", ""):
-            # Handle plain-text files: text, markdown, code, data, and extensionless (README, Makefile, etc.)
-            content = FileProcessor.parseTxt(fileName)
-        elif file_type == ".docx":
-            content = FileProcessor.parseDocx(fileName)
-        elif file_type == ".pptx":
-            content = FileProcessor.parsePptx(fileName)
-        elif file_type in (".png", ".jpg", ".jpeg"):
-            content = FileProcessor.parseImage(fileName)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        content = FileProcessor.extractContent(fileName, file_type)
 
         # Cache the parsed content and metadata for later quick reference
         FileProcessor.storeContent(fileName, content, metadata)
-        # Flush to disk after each parse so content is persisted
-        FileProcessor.flushCache()
+
+        return {
+            "metadata": metadata,
+            "content": content
+        }
+
+    @staticmethod
+    def parseBytes(virtualPath: str, data: bytes, mtime: float) -> dict:
+        """
+        Parse an in-memory file (an archive member) addressed by a virtual path.
+        Metadata mirrors extractMetadata; access time is taken to be the modification time.
+        """
+        file_type = os.path.splitext(virtualPath)[1].lower()
+        metadata = {
+            "fileName": os.path.basename(virtualPath),
+            "filePath": virtualPath,
+            "fileType": file_type,
+            "fileSize": len(data),
+            "sizeReadable": FileProcessor.format_bytes(len(data)),
+            "lastModified": mtime,
+            "lastAccessed": mtime,
+            "lastModifiedReadable": datetime.fromtimestamp(mtime).isoformat(),
+            "lastAccessedReadable": datetime.fromtimestamp(mtime).isoformat(),
+        }
+        content = FileProcessor.extractContent(io.BytesIO(data), file_type)
+
+        FileProcessor.storeContent(virtualPath, content, metadata)
 
         return {
             "metadata": metadata,
@@ -251,12 +263,13 @@ class FileProcessor:
     def sendToRankingService(fileNames: list[str]) -> list[File]:
         """
         Send files to ranking service for processing and return ranked list of File objects.
-        Uses cached content from localdump.json when available to avoid re-parsing.
+        Uses cached content when available to avoid re-parsing.
         """
         files = []
         for fileName in fileNames:
             print(f"Processing file for ranking: {fileName}")
             cached = FileProcessor.loadCachedFile(fileName)
+            queryTrace.cacheEvent("content", cached is not None)
             if cached is not None:
                 # Build File from cache — skip expensive re-parse and os.stat
                 f = object.__new__(File)
@@ -309,17 +322,49 @@ class FileProcessor:
 
 
     @staticmethod
-    def prepareForPinecone(fileName: str, chunk_size: int = 500, overlap: int = 100) -> dict:
+    def chunkOffsets(content: str, chunks: list[str]) -> list[int | None]:
+        """Start offset of each chunk in content (chunks are stripped, so search forward for each)."""
+        offsets = []
+        cursor = 0
+        for chunk in chunks:
+            found = content.find(chunk, cursor)
+            offsets.append(found if found >= 0 else None)
+            if found >= 0:
+                # Chunks overlap, so the next one starts after this one's start, not its end
+                cursor = found + 1
+        return offsets
+
+
+    @staticmethod
+    def prepareForPinecone(fileName: str, chunk_size: int = 500, overlap: int = 100, parsed: dict = None) -> dict:
         """
         Parse a file and prepare it for Pinecone ingestion.
+        Pass `parsed` to chunk content that was already parsed (e.g. by parseBytes).
         """
         # Parse file to get content and metadata
-        parsed = FileProcessor.parseFile(fileName)
+        if parsed is None:
+            parsed = FileProcessor.parseFile(fileName)
+
+        # Chunk the content (CHUNK_UNIT=tokens sizes chunks by tokens, see tokenizer.py)
+        if tokenizer.CHUNK_UNIT == "tokens":
+            chunks = tokenizer.chunkByTokens(parsed["content"])
+        else:
+            chunks = FileProcessor.chunkContent(parsed["content"], chunk_size, overlap)
+
+        offsets = FileProcessor.chunkOffsets(parsed["content"], chunks)
 
-        # Chunk the content
-        chunks = FileProcessor.chunkContent(parsed["content"], chunk_size, overlap)
+        # Keep embedding cost bounded for plain text, whose extraction is sampled anyway
+        # (see textSampling.py) — spread the kept chunks evenly over the file
+        file_type = parsed["metadata"].get("fileType", "").lower()
+        if file_type in TEXT_TYPES and len(chunks) > MAX_CHUNKS_PER_FILE:
+            print(f"Embedding {MAX_CHUNKS_PER_FILE} of {len(chunks)} chunks, evenly spaced: {fileName}")
+            step = len(chunks) / MAX_CHUNKS_PER_FILE
+            kept = [int(i * step) for i in range(MAX_CHUNKS_PER_FILE)]
+            chunks = [chunks[i] for i in kept]
+            offsets = [offsets[i] for i in kept]
 
         return {
             "chunks": chunks,
+            "offsets": offsets,
             "metadata": parsed["metadata"],
         }
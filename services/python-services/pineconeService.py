@@ -1,11 +1,31 @@
+import heapq
 import os
-from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import queryTrace
+from embeddingBatcher import EmbeddingBatcher
+from embeddingProfile import EMBEDDING_DIMENSIONS, embeddingKwargs
+from indexStore import IndexStore
+from profiling import profiled
+from scheduler import scheduler
+from shards import DEFAULT_NAMESPACE, allNamespaces
+
+# What each vector carries besides its embedding:
+#   "full"    — chunk text plus every file metadata field (original layout)
+#   "compact" — only fileId and chunk_index; text and file metadata are hydrated
+#               from the local IndexStore, so renames and mtime changes don't re-upsert
+VECTOR_PAYLOAD = os.getenv("VECTOR_PAYLOAD", "full")
+
+# Queries across several shards (namespaces) run concurrently
+_shard_queries = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SHARD_QUERY_WORKERS", "8")), thread_name_prefix="shard-query"
+)
 
 class PineconeService:
 
     _instance = None
     _initialized = False
+    _init_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -18,9 +38,19 @@ class PineconeService:
 
     def ensure_initialize(self):
         if self._initialized:
-            print("Already initialized, skipping...")
             return
 
+        # Background warm-up and the first request may race to initialize
+        with self._init_lock:
+            if self._initialized:
+                return
+            self._initialize()
+
+    def _initialize(self):
+        # Lazy — pinecone and openai are slow to import, so defer to first use
+        from pinecone import Pinecone, ServerlessSpec
+        from openai import OpenAI
+
         print("Initializing Pinecone connection...")
 
         self.client = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
@@ -32,7 +62,7 @@ class PineconeService:
             print(f"Creating index {index_name}...")
             self.client.create_index(
                 name=index_name,
-                dimension=1536,  # text-embedding-3-small dimension
+                dimension=EMBEDDING_DIMENSIONS,  # embedding profile (1536 = full text-embedding-3-small)
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -40,43 +70,70 @@ class PineconeService:
                 )
             )
 
+        else:
+            dimension = self.client.describe_index(index_name).dimension
+            if dimension != EMBEDDING_DIMENSIONS:
+                raise ValueError(
+                    f"Index {index_name} has dimension {dimension} but EMBEDDING_DIMENSIONS is "
+                    f"{EMBEDDING_DIMENSIONS}. Run migrateIndex.py to build an index for this profile."
+                )
+
         self.index = self.client.Index(index_name)
+        # Shared by all indexing jobs — packs chunks from concurrent files into token-sized requests
+        self.batcher = EmbeddingBatcher(self._embedBatch)
 
         self._initialized = True
 
-    def _embed_text(self, text: str) -> list[float]:
-        """Create embedding for text using OpenAI."""
-        response = self.openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+    def warm(self):
+        """
+        Initialize clients and open their connection pools ahead of the first search.
+        Runs in the background after startup; every call here is a cheap round trip.
+        """
+        self.ensure_initialize()
+        self.index.describe_index_stats()
+        if os.getenv("WARM_EMBEDDINGS", "1") == "1":
+            self._embed_text("warmup")
+
+    def _embed_text(self, text: str, timeout: float = None) -> list[float]:
+        """Create embedding for text using OpenAI (timeout: seconds, no retries)."""
+        client = self.openai_client
+        if timeout is not None:
+            client = client.with_options(timeout=timeout, max_retries=0)
+        response = client.embeddings.create(
+            input=text,
+            **embeddingKwargs()
         )
         return response.data[0].embedding
 
-    def indexFile(self, chunks: list[str], metadata: dict, file_id: str):
-        self.ensure_initialize()
+    def _embedBatch(self, texts: list[str]) -> list[list[float]]:
+        """One embeddings request for a batch packed by the EmbeddingBatcher."""
+        response = self.openai_client.embeddings.create(
+            input=texts,
+            **embeddingKwargs()
+        )
+        return [item.embedding for item in response.data]
 
-        # Step 1: Collect all embeddings (batch OpenAI calls in groups of 100)
-        embeddings = []
-        embed_batch_size = 100
+    def embeddingStats(self) -> dict:
+        """Request/token counters of the embedding batcher (empty until first use)."""
+        return self.batcher.stats() if self._initialized else {}
 
-        for i in range(0, len(chunks), embed_batch_size):
-            batch = chunks[i:i + embed_batch_size]
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=batch
-            )
-            embeddings.extend([item.embedding for item in response.data])
+    @profiled("indexFile")
+    def indexFile(self, chunks: list[str], metadata: dict, file_id: str,
+                  namespace: str = DEFAULT_NAMESPACE) -> list[list[float]]:
+        """Embed and upsert a file's chunks into its namespace. Returns the embeddings (for the local vector cache)."""
+        self.ensure_initialize()
+
+        # Step 1: Collect all embeddings — the batcher packs them by token count,
+        # sharing requests with other files being indexed right now, and yields
+        # to /search and /rank between requests
+        embeddings = self.batcher.embed(chunks)
 
         # Step 2: Build vectors with unique IDs
         vectors = [
             {
                 "id": f"{file_id}_{idx}",
                 "values": embedding,
-                "metadata": {
-                    "text": chunk,
-                    "chunk_index": idx,
-                    **metadata
-                }
+                "metadata": self._vectorMetadata(file_id, idx, chunk, metadata)
             }
             for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
         ]
@@ -86,37 +143,133 @@ class PineconeService:
         total_batches = (len(vectors) - 1) // upsert_batch_size + 1
 
         for i in range(0, len(vectors), upsert_batch_size):
+            scheduler.yieldToInteractive()
             batch = vectors[i:i + upsert_batch_size]
-            self.index.upsert(vectors=batch)
+            self.index.upsert(vectors=batch, namespace=namespace)
             print(f"Uploaded batch {i // upsert_batch_size + 1}/{total_batches}")
 
-    def query(self, query_text: str, filter: dict = None) -> list[dict]:
+        return embeddings
+
+    @staticmethod
+    def _vectorMetadata(file_id: str, idx: int, chunk: str, metadata: dict) -> dict:
+        if VECTOR_PAYLOAD == "compact":
+            return {"fileId": file_id, "chunk_index": idx}
+        return {
+            "text": chunk,
+            "chunk_index": idx,
+            "fileId": file_id,
+            **metadata
+        }
+
+    @staticmethod
+    def _hydrate(file_id: str, vector_metadata: dict) -> dict | None:
+        """File metadata for a match — from the vector itself (full) or the local store (compact)."""
+        if "filePath" in vector_metadata:
+            return {k: v for k, v in vector_metadata.items() if k != "text"}
+        entry = IndexStore.getFileById(file_id)
+        if entry is None:
+            return None
+        return {**entry["metadata"], "chunk_index": vector_metadata.get("chunk_index")}
+
+    def deleteChunks(self, file_id: str, chunk_indexes, namespace: str = DEFAULT_NAMESPACE) -> None:
+        """Delete specific chunk vectors of a file (e.g. after it shrank)."""
         self.ensure_initialize()
 
-        query_embedding = self._embed_text(query_text)
+        ids = [f"{file_id}_{idx}" for idx in chunk_indexes]
+        for i in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[i:i + 1000], namespace=namespace)
 
-        results = self.index.query(
-            vector=query_embedding,
-            top_k=20,
-            include_metadata=True,
-            filter=filter
-        )
+    def dropNamespace(self, namespace: str) -> None:
+        """Delete every vector of a shard in one call."""
+        self.ensure_initialize()
+        try:
+            self.index.delete(delete_all=True, namespace=namespace)
+        except Exception as e:
+            # Deleting a namespace that was never written to is a 404 — nothing to drop
+            if getattr(e, "status", None) != 404:
+                raise
 
+    def namespaceVectorCounts(self) -> dict[str, int]:
+        self.ensure_initialize()
+        stats = self.index.describe_index_stats()
+        namespaces = getattr(stats, "namespaces", None) or {}
+        return {name: getattr(info, "vector_count", 0) for name, info in namespaces.items()}
+
+    @profiled("embedQuery")
+    def embedQuery(self, query_text: str, timeout: float = None) -> list[float]:
+        self.ensure_initialize()
+        return self._embed_text(query_text, timeout)
+
+    @profiled("vectorQuery")
+    def vectorQuery(self, query_embedding: list[float], filter: dict = None, top_k: int = 20,
+                    namespaces: list[str] = None, timeout: float = None) -> list:
+        """
+        Top matches across the given namespaces (default: every shard), best first.
+        Shards are queried concurrently, each for the full top_k, and merged.
+        timeout (seconds) bounds each shard's request.
+        """
+        self.ensure_initialize()
+        namespaces = namespaces if namespaces is not None else allNamespaces()
+        request_options = {} if timeout is None else {"_request_timeout": timeout}
+
+        def search(namespace):
+            return self.index.query(
+                vector=query_embedding,
+                top_k=top_k,
+                include_metadata=True,
+                filter=filter,
+                namespace=namespace,
+                **request_options,
+            ).matches
+
+        if len(namespaces) == 1:
+            matches = search(namespaces[0])
+        else:
+            per_shard = list(_shard_queries.map(search, namespaces))
+            matches = heapq.nlargest(top_k, (m for shard in per_shard for m in shard), key=lambda m: m.score)
+        queryTrace.candidates([match.id for match in matches])
+        return matches
+
+    @profiled("hydrateMatches")
+    def hydrateMatches(self, matches: list, limit: int = 5, inScope=None) -> list[dict]:
+        """
+        One result per file, best match first, with file metadata and duplicate paths.
+        inScope(path) keeps only files with it or a duplicate in scope.
+        """
         seen_files = set()
         unique_matches = []
 
-        for match in results.matches:
-            filepath = match.metadata.get("filePath")
-            if filepath and filepath not in seen_files:
-                seen_files.add(filepath)
-                unique_matches.append({
-                    "score": match.score,
-                    **{k: v for k, v in match.metadata.items() if k != "text"}
-                })
+        for match in matches:
+            # Vectors written before fileId was stored still encode it in their ID
+            file_id = match.metadata.get("fileId") or match.id.rsplit("_", 1)[0]
+            if file_id in seen_files:
+                continue
+            seen_files.add(file_id)
 
-                if len(unique_matches) >= 5:
-                    break
+            fileMetadata = self._hydrate(file_id, match.metadata)
+            if not fileMetadata or not fileMetadata.get("filePath"):
+                continue
+            # Duplicates share the canonical file's vectors and collapse into one result
+            also_at = [d["path"] for d in IndexStore.duplicatesOf(file_id)]
+            if inScope is not None and not any(map(inScope, [fileMetadata["filePath"], *also_at])):
+                continue
+            unique_matches.append({"score": match.score, **fileMetadata, "alsoAt": also_at})
+
+            if len(unique_matches) >= limit:
+                break
 
         return unique_matches
 
+    @profiled("query")
+    def query(self, query_text: str, filter: dict = None, namespaces: list[str] = None) -> list[dict]:
+        """Embed, vector query and hydrate in one go, with no deadlines (see search.py for budgeted search)."""
+        with queryTrace.stage("embed"):
+            query_embedding = self.embedQuery(query_text)
+
+        with queryTrace.stage("vectorQuery"):
+            matches = self.vectorQuery(query_embedding, filter, namespaces=namespaces)
+
+        with queryTrace.stage("hydrate"):
+            return self.hydrateMatches(matches)
+
 
@@ -0,0 +1,238 @@
+"""On-demand profiling of live requests and indexing jobs.
+
+Disabled unless PROFILING=1. When enabled, a request carrying `X-Profile: cprofile`
+or `X-Profile: sample` profiles its path through the instrumented hot spots —
+parseFile, indexFile, the query stages and rank_files_sync — wherever they run: the request
+context is carried onto scheduler threads, and /process-file stores the mode on
+the job row so the indexing job is profiled too.
+
+    cprofile   deterministic profile per hot-spot call, saved as .prof (pstats / snakeviz)
+    sample     stack samples every PROFILE_SAMPLE_MS, saved as .folded (flamegraph.pl / speedscope)
+
+Artifacts go to PROFILE_DIR; only the newest PROFILE_MAX_FILES are kept.
+With PROFILING=0 the hot spots aren't wrapped at all; with it on, a request that
+doesn't ask for a profile costs one ContextVar lookup per hot-spot call.
+
+    PROFILING           0 (default) | 1
+    PROFILE_DIR         ./profiles
+    PROFILE_MAX_FILES   100
+    PROFILE_SAMPLE_MS   5
+"""
+
+import cProfile
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "5"))
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+PROFILE_MODES = (CPROFILE, SAMPLE)
+
+
+@dataclass
+class ProfileRequest:
+    mode: str
+    label: str
+    # Artifact paths written so far; shared by every context copied from the request
+    artifacts: list = field(default_factory=list)
+
+
+_current: ContextVar[ProfileRequest | None] = ContextVar("profile_request", default=None)
+_active = threading.local()
+
+
+def begin(mode: str, label: str):
+    """Profile everything instrumented under the current context. Returns a token for end()."""
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {mode!r} — use one of {PROFILE_MODES}")
+    return _current.set(ProfileRequest(mode, label))
+
+
+def end(token) -> list[str]:
+    """Stop profiling this context. Returns the artifacts written."""
+    request = _current.get()
+    _current.reset(token)
+    return request.artifacts if request else []
+
+
+def _artifactPath(request: ProfileRequest, name: str, suffix: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"{time.time() % 1:.3f}"[1:]
+    label = re.sub(r"[^\w.-]+", "_", request.label)[:40]
+    return os.path.join(PROFILE_DIR, f"{stamp}-{label}-{name}{suffix}")
+
+
+def _prune() -> None:
+    try:
+        entries = [os.path.join(PROFILE_DIR, n) for n in os.listdir(PROFILE_DIR)]
+    except FileNotFoundError:
+        return
+    entries.sort(key=os.path.getmtime)
+    for path in entries[:max(0, len(entries) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Sampler:
+    """Samples one thread's stack on a timer and aggregates collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _runProfiled(request: ProfileRequest, name: str, fn, args, kwargs):
+    _active.running = True
+    try:
+        if request.mode == CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                path = _artifactPath(request, name, ".prof")
+                profiler.dump_stats(path)
+                request.artifacts.append(path)
+                _prune()
+        else:
+            sampler = _Sampler(threading.get_ident(), PROFILE_SAMPLE_MS / 1000)
+            try:
+                with sampler:
+                    return fn(*args, **kwargs)
+            finally:
+                path = _artifactPath(request, name, ".folded")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in sampler.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                request.artifacts.append(path)
+                _prune()
+    finally:
+        _active.running = False
+
+
+def profiled(name: str):
+    """Instrument a hot spot: profiled when the calling context asked for it, untouched otherwise."""
+    def decorate(fn):
+        if not PROFILING_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request = _current.get()
+            # Nested hot spots are already covered by the outer profile
+            if request is None or getattr(_active, "running", False):
+                return fn(*args, **kwargs)
+            return _runProfiled(request, name, fn, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def listArtifacts() -> list[dict]:
+    try:
+        names = sorted(os.listdir(PROFILE_DIR), reverse=True)
+    except FileNotFoundError:
+        return []
+    return [
+        {"name": n, "bytes": os.path.getsize(os.path.join(PROFILE_DIR, n))}
+        for n in names
+    ]
+
+
+# ── tracemalloc ──
+
+_last_snapshot = None
+
+
+def startTracemalloc(frames: int = 1) -> dict:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracemallocStatus()
+
+
+def stopTracemalloc() -> dict:
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+    return tracemallocStatus()
+
+
+def tracemallocStatus() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {"tracing": tracing, "currentBytes": current, "peakBytes": peak}
+
+
+def takeSnapshot(top: int = 20) -> dict:
+    """
+    Snapshot traced allocations to disk and return the top allocators by line,
+    plus the biggest growth since the previous snapshot.
+    """
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc is not running — start it first")
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    path = _artifactPath(ProfileRequest(SAMPLE, "tracemalloc"), "snapshot", ".tracemalloc")
+    snapshot.dump(path)
+    _prune()
+
+    def describe(stat) -> dict:
+        frame = stat.traceback[0]
+        return {
+            "location": f"{frame.filename}:{frame.lineno}",
+            "bytes": stat.size,
+            "count": stat.count,
+            **({"bytesDiff": stat.size_diff, "countDiff": stat.count_diff} if hasattr(stat, "size_diff") else {}),
+        }
+
+    growth = []
+    if _last_snapshot is not None:
+        growth = [describe(s) for s in snapshot.compare_to(_last_snapshot, "lineno")[:top]]
+    _last_snapshot = snapshot
+
+    return {
+        **tracemallocStatus(),
+        "artifact": os.path.basename(path),
+        "top": [describe(s) for s in snapshot.statistics("lineno")[:top]],
+        "growth": growth,
+    }
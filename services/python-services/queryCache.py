@@ -0,0 +1,150 @@
+"""Semantic query cache — reuse /search candidates (and /rank results) across paraphrases.
+
+Keeps the last QUERY_CACHE_SIZE queries with their embedding, candidate list and
+the index generation they were computed at (see IndexStore.generation). A query
+whose normalized text was seen before skips the embed too; otherwise its embedding
+is compared with the cached ones, and one at cosine >= QUERY_CACHE_THRESHOLD
+("math hw" / "math homework") reuses that entry's candidates instead of a vector
+query. Any index change since invalidates every entry.
+
+The comparison is approximate-then-exact: text-embedding-3 prefixes are valid
+embeddings (see embeddingProfile), so entries are screened on the first
+SCREEN_DIMENSIONS values and only the best is checked on the full vector.
+
+/rank reuses a cached ranking when the query (or a paraphrase it was folded
+into) asks for the same candidates at the same generation, in the same scope
+as the search that found them (QUERY_CACHE_RANKING).
+
+    QUERY_CACHE_SIZE        256 (0 disables the cache)
+    QUERY_CACHE_THRESHOLD   0.95
+    QUERY_CACHE_RANKING     1 (default) | 0
+"""
+
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from embeddingProfile import truncate
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95"))
+QUERY_CACHE_RANKING = os.getenv("QUERY_CACHE_RANKING", "1") == "1"
+
+SCREEN_DIMENSIONS = 256
+# Screening on a prefix is approximate — let slightly lower scores through to the exact check
+SCREEN_SLACK = 0.03
+
+
+@dataclass
+class CachedQuery:
+    query: str
+    # Roots searched ("" for everything) — results only stand in for a search of the same roots
+    scope: str
+    generation: int
+    vector: array
+    screen: array
+    results: list
+    # tuple(filePaths) -> ranked files, for the candidate lists /rank was asked about
+    rankings: dict = field(default_factory=dict)
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _key(query: str, scope: str) -> str:
+    return f"{normalize(query)}\x00{scope}" if scope else normalize(query)
+
+
+def _unit(vector: list[float]) -> array:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array("f", (x / norm for x in vector))
+
+
+def _dot(a: array, b: array) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class QueryCache:
+
+    def __init__(self, size: int = QUERY_CACHE_SIZE, threshold: float = QUERY_CACHE_THRESHOLD):
+        self.size = size
+        self.threshold = threshold
+        # normalized query text -> entry; a paraphrase hit adds its text as an alias
+        self._entries: OrderedDict[str, CachedQuery] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, key: str, entry: CachedQuery) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def byText(self, query: str, generation: int | None, scope: str = "") -> CachedQuery | None:
+        """The entry for this exact (normalized) query; generation=None accepts stale entries."""
+        if self.size <= 0:
+            return None
+        key = _key(query, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (generation is not None and entry.generation != generation):
+                return None
+            self._touch(key, entry)
+            return entry
+
+    def byVector(self, query: str, vector: list[float], generation: int, scope: str = "") -> CachedQuery | None:
+        """The closest current entry within the similarity threshold, remembered under this query's text too."""
+        if self.size <= 0:
+            return None
+        screen = _unit(truncate(vector, SCREEN_DIMENSIONS))
+        with self._lock:
+            candidates = {id(e): e for e in self._entries.values() if e.generation == generation and e.scope == scope}
+        best, best_score = None, self.threshold - SCREEN_SLACK
+        for entry in candidates.values():
+            score = _dot(screen, entry.screen)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None or _dot(_unit(vector), best.vector) < self.threshold:
+            return None
+        with self._lock:
+            self._touch(_key(query, scope), best)
+        return best
+
+    def put(self, query: str, vector: list[float], generation: int, results: list, scope: str = "") -> None:
+        if self.size <= 0:
+            return
+        entry = CachedQuery(
+            query=normalize(query),
+            scope=scope,
+            generation=generation,
+            vector=_unit(vector),
+            screen=_unit(truncate(vector, SCREEN_DIMENSIONS)),
+            results=results,
+        )
+        with self._lock:
+            self._touch(_key(query, scope), entry)
+
+    def ranking(self, query: str, filePaths: list[str], generation: int, scope: str = "") -> list | None:
+        if not QUERY_CACHE_RANKING:
+            return None
+        entry = self.byText(query, generation, scope)
+        return entry.rankings.get(tuple(filePaths)) if entry else None
+
+    def putRanking(self, query: str, filePaths: list[str], generation: int, ranked: list,
+                   scope: str = "") -> None:
+        if not QUERY_CACHE_RANKING:
+            return
+        entry = self.byText(query, generation, scope)
+        if entry is not None:
+            with self._lock:
+                entry.rankings[tuple(filePaths)] = ranked
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len({id(e) for e in self._entries.values()}), "aliases": len(self._entries)}
+
+
+queryCache = QueryCache()
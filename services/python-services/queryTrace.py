@@ -0,0 +1,161 @@
+"""Query traces — optional JSONL log of /search and /rank traffic for tuning and replay.
+
+Each line records one request: endpoint, start time, anonymized query, candidate
+file IDs, per-stage latencies and cache hits/misses. benchmarks/replay.py re-drives
+a trace against the service with stub backends.
+
+Queries are anonymized by default: the trace keeps a keyed hash of the normalized
+query and of each of its terms (so repeats and term overlap survive), plus its
+length, but never the text. Candidates are recorded as file IDs, never paths.
+The key is a random salt created once per install and kept in the index store,
+so the hashes can't be reversed with a wordlist by anyone holding only the trace.
+
+    QUERY_TRACE_PATH        unset (default, no tracing) | path of the JSONL file
+    QUERY_TRACE_ANONYMIZE   1 (default) | 0 — keep plain query text
+    QUERY_TRACE_SALT        unset (default, the install's random salt) | a secret shared
+                            by installs whose traces should hash alike
+    QUERY_TRACE_MAX_MB      100 — the file rotates to <path>.1 past this size
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from indexStore import IndexStore
+
+QUERY_TRACE_PATH = os.getenv("QUERY_TRACE_PATH")
+QUERY_TRACE_ANONYMIZE = os.getenv("QUERY_TRACE_ANONYMIZE", "1") == "1"
+QUERY_TRACE_SALT = os.getenv("QUERY_TRACE_SALT")
+QUERY_TRACE_MAX_BYTES = int(float(os.getenv("QUERY_TRACE_MAX_MB", "100")) * 2**20)
+
+# Process-wide cache counters ("<cache>.hit" / "<cache>.miss"), traced or not
+cacheCounters = Counter()
+_counter_lock = threading.Lock()
+_write_lock = threading.Lock()
+_hash_key = None
+
+
+@dataclass
+class Trace:
+    endpoint: str
+    query: str
+    started: float = field(default_factory=time.time)
+    stages: dict = field(default_factory=dict)
+    candidates: list = field(default_factory=list)
+    cache: Counter = field(default_factory=Counter)
+
+
+_current: ContextVar[Trace | None] = ContextVar("query_trace", default=None)
+
+
+def _hashKey() -> bytes:
+    global _hash_key
+    if _hash_key is None:
+        salt = QUERY_TRACE_SALT or str(IndexStore.traceSalt())
+        _hash_key = hashlib.blake2b(salt.encode()).digest()
+    return _hash_key
+
+
+def _hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), key=_hashKey(), digest_size=8).hexdigest()
+
+
+def anonymize(query: str) -> dict:
+    normalized = " ".join(re.findall(r"\w+", query.lower()))
+    if not QUERY_TRACE_ANONYMIZE:
+        return {"query": query}
+    return {
+        "queryHash": _hash(normalized),
+        "terms": [_hash(term) for term in normalized.split()],
+        "queryChars": len(query),
+    }
+
+
+def cacheEvent(cache: str, hit: bool) -> None:
+    """Count a cache lookup — process-wide, and on the current trace if there is one."""
+    key = f"{cache}.{'hit' if hit else 'miss'}"
+    with _counter_lock:
+        cacheCounters[key] += 1
+    trace = _current.get()
+    if trace is not None:
+        trace.cache[key] += 1
+
+
+def cacheStats() -> dict:
+    with _counter_lock:
+        counts = dict(cacheCounters)
+    caches = {key.rsplit(".", 1)[0] for key in counts}
+    stats = {}
+    for cache in sorted(caches):
+        hits, misses = counts.get(f"{cache}.hit", 0), counts.get(f"{cache}.miss", 0)
+        stats[cache] = {"hits": hits, "misses": misses,
+                        "hitRate": round(hits / (hits + misses), 4) if hits + misses else None}
+    return stats
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current request (no-op when it isn't traced)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages[name] = round(trace.stages.get(name, 0) + (time.perf_counter() - start) * 1000, 3)
+
+
+def candidates(file_ids: list[str]) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.candidates = list(file_ids)
+
+
+@contextmanager
+def traced(endpoint: str, query: str):
+    """Trace one request; stages and cache events under it (on any thread) are recorded."""
+    if not QUERY_TRACE_PATH:
+        yield None
+        return
+    trace = Trace(endpoint, query)
+    token = _current.set(trace)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield trace
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _write({
+            "endpoint": endpoint,
+            "ts": round(trace.started, 3),
+            **anonymize(query),
+            "candidates": trace.candidates,
+            "stagesMs": trace.stages,
+            "totalMs": round((time.perf_counter() - start) * 1000, 3),
+            "cache": dict(trace.cache),
+            **({"error": error} if error else {}),
+        })
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _write_lock:
+        try:
+            if os.path.getsize(QUERY_TRACE_PATH) > QUERY_TRACE_MAX_BYTES:
+                os.replace(QUERY_TRACE_PATH, QUERY_TRACE_PATH + ".1")
+        except FileNotFoundError:
+            pass
+        with open(QUERY_TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
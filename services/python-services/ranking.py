@@ -4,13 +4,13 @@ import sys
 from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
 # Load environment variables from root .env file
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path)
 
+from profiling import profiled
+
 
 class FileRankingService:
     """
@@ -24,6 +24,8 @@ class FileRankingService:
         Args:
             gemini_api_key: The Google Gemini API key
         """
+        from google import genai  # Lazy — google-genai is slow to import
+
         self.client = genai.Client(api_key=gemini_api_key)
         self.model_name = 'gemini-3-flash-preview'
     
@@ -166,6 +168,8 @@ Your Response:
             print('Ranking files with Gemini API...')
             
             # Call Gemini API
+            from google.genai import types
+
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
@@ -202,10 +206,12 @@ Your Response:
                 'rankedFiles': fallback_files
             }
     
+    @profiled("rank_files_sync")
     def rank_files_sync(
         self,
         user_query: str,
-        files: List[Any]
+        files: List[Any],
+        timeout: float = None
     ) -> Dict[str, Any]:
         """
         Synchronous version of rank_files.
@@ -213,6 +219,7 @@ Your Response:
         Args:
             user_query: The user's search query
             files: List of File objects from parsers.sendToRankingService()
+            timeout: Seconds the Gemini request may take (None for the client default)
             
         Returns:
             Dictionary containing success status, message, and ranked files
@@ -274,11 +281,14 @@ Your Response:
             print('Ranking files with Gemini API...')
             
             # Call Gemini API
+            from google.genai import types
+
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_level="minimal")
+                    thinking_config=types.ThinkingConfig(thinking_level="minimal"),
+                    http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000))) if timeout else None,
                 ),
             )
             text = response.text
@@ -463,6 +473,8 @@ class FileSummaryService:
         dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
         load_dotenv(dotenv_path)
         api_key = os.getenv('GEMINI_API_KEY') or ''
+        from google import genai  # Lazy — google-genai is slow to import
+
         self.client = genai.Client(api_key=api_key)
         self.model_name = 'gemini-3-flash-preview'
 
@@ -506,6 +518,8 @@ Instructions:
 Your Summary:"""
 
         try:
+            from google.genai import types
+
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
@@ -0,0 +1,119 @@
+"""Bulk reconciliation — diff watched folders against the index manifest in one pass.
+
+Instead of one /process-file call per file at startup, the watcher hands over its
+root folders. They are crawled with os.scandir on a thread pool (one directory per
+task), each file's (size, mtime) is compared with the manifest, and only added,
+changed and deleted files become jobs. Files whose index job failed for good
+are left alone until their size or mtime changes.
+
+    RECONCILE_WORKERS   8 — directories scanned concurrently (stat work is I/O bound)
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import archives
+import shards
+from indexStore import IndexStore
+from jobQueue import jobQueue, INDEX, DELETE
+from parsers import SUPPORTED_TYPES
+
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", "8"))
+
+
+def _indexable(name: str) -> bool:
+    return archives.isArchive(name) or os.path.splitext(name)[1].lower() in SUPPORTED_TYPES
+
+
+def _scanDir(path: str) -> tuple[dict, list[str]]:
+    """Files (path -> (size, mtime)) and subdirectories of one directory."""
+    files, subdirs = {}, []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                # Same rule as the watcher: dotfiles and dot-directories are ignored
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and _indexable(entry.name):
+                        stats = entry.stat()
+                        files[os.path.abspath(entry.path)] = (stats.st_size, stats.st_mtime)
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Reconcile could not scan {path}: {e}")
+    return files, subdirs
+
+
+def scan(roots: list[str], workers: int = RECONCILE_WORKERS) -> dict:
+    """Crawl roots in parallel. Returns {absolute path: (size, mtime)} for indexable files."""
+    found = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile") as pool:
+        pending = {pool.submit(_scanDir, os.path.abspath(root)) for root in roots}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                found.update(files)
+                pending.update(pool.submit(_scanDir, d) for d in subdirs)
+    return found
+
+
+def reconcile(roots: list[str]) -> dict:
+    """
+    Enqueue index jobs for added and changed files and delete jobs for indexed files
+    that no longer exist under the roots. Returns counts plus the new job IDs.
+    With sharding on, unmapped roots get their own shard first, and files indexed
+    into another shard than their root's count as changed.
+    """
+    start = time.perf_counter()
+    shards.registerRoots(roots)
+    namespaceFor = shards.resolver()
+    found = scan(roots)
+    scanned_at = time.perf_counter()
+
+    added, changed, deleted = [], [], []
+    seen = set()
+    failed = {}
+    for root in roots:
+        prefix = os.path.join(os.path.abspath(root), "")
+        failed.update(IndexStore.failuresUnder(prefix))
+        for entry in IndexStore.listFilesUnder(prefix):
+            # Archive members are reconciled by their archive's own job
+            if archives.isMember(entry["path"]) or entry["path"] in seen:
+                continue
+            seen.add(entry["path"])
+            current = found.get(entry["path"])
+            if current is None:
+                deleted.append(entry["path"])
+            elif current != (entry["size"], entry["mtime"]) or entry["namespace"] != namespaceFor(entry["path"]):
+                changed.append(entry["path"])
+    added = [path for path in found if path not in seen]
+
+    # Unchanged since their index job gave up — re-queuing would only fail again
+    queued = len(added) + len(changed)
+    added = [path for path in added if failed.get(path) != found[path]]
+    changed = [path for path in changed if failed.get(path) != found[path]]
+    skipped_failed = queued - len(added) - len(changed)
+    IndexStore.clearFailures([path for path in failed if path not in found])
+
+    job_ids = jobQueue.enqueueMany(added + changed, INDEX) + jobQueue.enqueueMany(deleted, DELETE)
+
+    print(
+        f"Reconciled {len(found)} files under {len(roots)} roots: {len(added)} added, "
+        f"{len(changed)} changed, {len(deleted)} deleted, {skipped_failed} failed before"
+    )
+    return {
+        "scanned": len(found),
+        "added": len(added),
+        "changed": len(changed),
+        "deleted": len(deleted),
+        "unchanged": len(found) - len(added) - len(changed) - skipped_failed,
+        "failedBefore": skipped_failed,
+        "jobIds": job_ids,
+        "scanMs": round((scanned_at - start) * 1000, 1),
+        "totalMs": round((time.perf_counter() - start) * 1000, 1),
+    }
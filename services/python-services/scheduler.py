@@ -0,0 +1,137 @@
+"""Work scheduler — separate thread pools for interactive and background work.
+
+Interactive work (/search, /rank) and background indexing (/process-file) used to
+share Starlette's default threadpool, so an initial scan could starve queries.
+Each lane now has its own executor, and the indexing pipeline cooperatively
+yields to interactive work between expensive steps.
+
+A query's remote calls (embedding, vector query, LLM) run on a third, remote lane:
+they mostly wait on the network, and on the interactive lane a few slow ones
+(or abandoned hedges) would hold every worker the local steps of other queries need.
+Indexing yields to them just the same.
+
+    QUERY_WORKERS    4
+    REMOTE_WORKERS   16
+    INDEX_WORKERS    2
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+REMOTE = "remote"
+
+
+class WorkScheduler:
+
+    def __init__(self, interactive_workers: int = None, background_workers: int = None,
+                 remote_workers: int = None):
+        # Reserved capacity for queries — never shared with indexing
+        self.interactive_workers = interactive_workers or int(os.getenv("QUERY_WORKERS", "4"))
+        self.background_workers = background_workers or int(os.getenv("INDEX_WORKERS", "2"))
+        self.remote_workers = remote_workers or int(os.getenv("REMOTE_WORKERS", "16"))
+        # Longest a background step will wait for interactive work to drain
+        self.max_yield_seconds = float(os.getenv("INDEX_YIELD_MAX_MS", "2000")) / 1000
+
+        self._workers = {
+            INTERACTIVE: self.interactive_workers,
+            BACKGROUND: self.background_workers,
+            REMOTE: self.remote_workers,
+        }
+        self._executors = {
+            INTERACTIVE: ThreadPoolExecutor(
+                max_workers=self.interactive_workers, thread_name_prefix="interactive"
+            ),
+            BACKGROUND: ThreadPoolExecutor(
+                max_workers=self.background_workers, thread_name_prefix="background"
+            ),
+            REMOTE: ThreadPoolExecutor(
+                max_workers=self.remote_workers, thread_name_prefix="remote"
+            ),
+        }
+
+        # Per-lane counters: submitted but not yet started / currently running
+        self._queued = {INTERACTIVE: 0, BACKGROUND: 0, REMOTE: 0}
+        self._running = {INTERACTIVE: 0, BACKGROUND: 0, REMOTE: 0}
+        self._cond = threading.Condition()
+
+    def _wrap(self, lane: str, fn, args, kwargs):
+        def run():
+            with self._cond:
+                self._queued[lane] -= 1
+                self._running[lane] += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._cond:
+                    self._running[lane] -= 1
+                    self._cond.notify_all()
+        return run
+
+    def submit(self, lane: str, fn, *args, **kwargs):
+        """Submit blocking work to a lane. Returns a concurrent.futures.Future."""
+        with self._cond:
+            self._queued[lane] += 1
+        # Carry the caller's context (e.g. an active profile request) onto the worker thread
+        context = contextvars.copy_context()
+        return self._executors[lane].submit(context.run, self._wrap(lane, fn, args, kwargs))
+
+    async def run(self, lane: str, fn, *args, **kwargs):
+        """Run blocking work on a lane without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(lane, fn, *args, **kwargs))
+
+    async def runInteractive(self, fn, *args, **kwargs):
+        return await self.run(INTERACTIVE, fn, *args, **kwargs)
+
+    async def runBackground(self, fn, *args, **kwargs):
+        return await self.run(BACKGROUND, fn, *args, **kwargs)
+
+    def interactivePending(self) -> int:
+        """Query work not yet finished — on the interactive lane or its remote calls."""
+        with self._cond:
+            return sum(self._queued[lane] + self._running[lane] for lane in (INTERACTIVE, REMOTE))
+
+    def yieldToInteractive(self) -> float:
+        """
+        Block the calling thread (indexing work: a background job, or the embedding
+        batcher sending on its behalf) while interactive work is pending.
+        Bounded by INDEX_YIELD_MAX_MS so indexing can't be starved forever.
+        Returns the number of seconds spent waiting.
+        """
+        # An interactive thread would wait on itself
+        if threading.current_thread().name.startswith((INTERACTIVE, REMOTE)):
+            return 0.0
+
+        start = time.monotonic()
+        deadline = start + self.max_yield_seconds
+        with self._cond:
+            while sum(self._queued[lane] + self._running[lane] for lane in (INTERACTIVE, REMOTE)) > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return time.monotonic() - start
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                lane: {
+                    "workers": self._workers[lane],
+                    "queued": self._queued[lane],
+                    "running": self._running[lane],
+                }
+                for lane in (INTERACTIVE, REMOTE, BACKGROUND)
+            }
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared process-wide scheduler
+scheduler = WorkScheduler()
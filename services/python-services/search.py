@@ -1,23 +1,146 @@
 from parsers import FileProcessor, File
 from ranking import FileRankingService
 from pineconeService import PineconeService
-import asyncio
+from indexStore import IndexStore
+from scheduler import scheduler
+from latencyBudget import Budget, StageSkipped, SEARCH_BUDGET_MS, RANK_BUDGET_MS
+from snippets import queryTerms
+from queryCache import queryCache, QUERY_CACHE_RANKING
+import shards
+import queryTrace
+import hashlib
 import os
 from dotenv import load_dotenv
 
+# Reused across /rank calls so the Gemini client (and its connection pool) is built once
+_ranking_service = None
 
-async def searchDB_initial(query: str):
+# Files returned by the keyword-only fallback
+KEYWORD_RESULTS = 5
+# Vector matches fetched per search — times SCOPED_OVERFETCH when hits are filtered down to roots
+VECTOR_MATCHES = 20
+SCOPED_OVERFETCH = 5
+
+
+def getRankingService() -> FileRankingService:
+    global _ranking_service
+    if _ranking_service is None:
+        # Load API key
+        dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
+        load_dotenv(dotenv_path)
+        _ranking_service = FileRankingService(os.getenv('GEMINI_API_KEY') or '')
+    return _ranking_service
+
+
+def _traceId(filePath: str) -> str:
+    # Traces never carry paths — use the manifest's file ID (or an ID derived the same way)
+    entry = IndexStore.getFile(filePath)
+    return entry["file_id"] if entry else "file_" + hashlib.md5(os.path.abspath(filePath).encode()).hexdigest()[:12]
+
+
+def keywordCandidates(query: str, limit: int = KEYWORD_RESULTS, roots: list[str] = None) -> list[dict]:
+    """
+    Keyword-only candidates from the locally stored chunks — no embedding or vector
+    query. Files matching more distinct query terms rank first, then more matching chunks.
+    `roots` keeps only files under those roots.
+    """
+    inScope = shards.underRoots(roots) if roots else None
+    terms = queryTerms(query)[:8]
+    matches = IndexStore.keywordMatches(terms)
+    ranked = sorted(matches.items(), key=lambda item: (len(item[1]), sum(item[1].values())), reverse=True)
+
+    results = []
+    for file_id, hits in ranked:
+        entry = IndexStore.getFileById(file_id)
+        if entry is None or not entry["metadata"].get("filePath"):
+            continue
+        also_at = [d["path"] for d in IndexStore.duplicatesOf(file_id)]
+        if inScope is not None and not any(map(inScope, [entry["path"], *also_at])):
+            continue
+        results.append({"score": round(len(hits) / len(terms), 4), **entry["metadata"], "alsoAt": also_at})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def _scope(roots: list[str] | None) -> str:
+    # Query cache scope: the roots searched, "" for everything
+    return ",".join(sorted({os.path.abspath(root) for root in roots})) if roots else ""
+
+
+async def _budgetedQuery(query: str, budget: Budget, roots: list[str] | None,
+                        ) -> tuple[list[dict], str | None, str | None]:
+    """
+    Vector search within the budget, through the semantic query cache.
+    Returns (file metadatas, cache hit kind or None, fallback used or None).
+    """
+    scope = _scope(roots)
+    namespaces = shards.namespacesForRoots(roots) if roots else None
+    inScope = shards.underRoots(roots) if roots else None
+    # Roots without a shard of their own are filtered out of the default namespace
+    top_k = VECTOR_MATCHES * SCOPED_OVERFETCH if roots and shards.unshardedRoots(roots) else VECTOR_MATCHES
+    generation = IndexStore.generation()
+    cached = queryCache.byText(query, generation, scope)
+    if cached is not None:
+        queryTrace.cacheEvent("query", True)
+        return cached.results, "exact", None
+
+    pc = PineconeService()
+    try:
+        # Embedding gets at most half the budget, the vector query what's left;
+        # both are idempotent reads, so both may be hedged
+        query_embedding = await budget.stage(
+            "embed", pc.embedQuery, query, share=0.5, hedge=True, remote=True
+        )
+        cached = await scheduler.runInteractive(queryCache.byVector, query, query_embedding, generation, scope)
+        queryTrace.cacheEvent("query", cached is not None)
+        if cached is not None:
+            return cached.results, "semantic", None
+        matches = await budget.stage(
+            "vectorQuery", pc.vectorQuery, query_embedding, None, top_k, namespaces,
+            hedge=True, remote=True,
+        )
+    except StageSkipped:
+        if budget.skipped[-1] == "embed":
+            budget.skipped.append("vectorQuery")
+        # Results from before the last index change beat none at all
+        stale = queryCache.byText(query, None, scope)
+        if stale is not None:
+            return stale.results, None, "stale"
+        return await scheduler.runInteractive(keywordCandidates, query, KEYWORD_RESULTS, roots), None, "keyword"
+
+    # Hydration is local (SQLite), so it isn't budgeted
+    with queryTrace.stage("hydrate"):
+        fileMetadatas = await scheduler.runInteractive(pc.hydrateMatches, matches, 5, inScope)
+    queryCache.put(query, query_embedding, generation, fileMetadatas, scope)
+    return fileMetadatas, None, None
+
+
+async def searchDB_initial(query: str, roots: list[str] = None) -> dict:
     """
     Fast initial search: query Pinecone and return file candidates immediately
     without waiting for Gemini ranking. This gives instant results to the user.
+
+    Repeats and close paraphrases of a recent query reuse its candidates while
+    the index is unchanged (see queryCache.py); `cache` says which kind of hit.
+
+    Bounded by SEARCH_BUDGET_MS: if the embedding or vector query misses its
+    deadline, the last results for the same query are returned (even if the index
+    changed since), or else keyword-only matches from the local chunks. `skipped`
+    names the stages that didn't make it and `fallback` what was served instead.
+
+    `roots` scopes the search to files under those folders: only their shards are
+    queried, and hits elsewhere in them are dropped (see shards.py).
     """
-    pc = PineconeService()
+    budget = Budget(SEARCH_BUDGET_MS)
 
     # Query Pinecone for relevant files based on the search query
-    fileMetadatas = pc.query(query)
+    # (on the interactive lane so it never queues behind indexing)
+    with queryTrace.traced("search", query):
+        fileMetadatas, cache, fallback = await _budgetedQuery(query, budget, roots)
 
     # Return basic file info for immediate display (no AI summary yet)
-    return [
+    results = [
         {
             'filePath': m.get('filePath', ''),
             'fileName': m.get('fileName', ''),
@@ -27,32 +150,63 @@ async def searchDB_initial(query: str):
             'lastModifiedReadable': m.get('lastModifiedReadable', ''),
             'lastAccessedReadable': m.get('lastAccessedReadable', ''),
             'score': m.get('score', 0),
+            'alsoAt': m.get('alsoAt', []),
             'summary': '',
             'rank': idx + 1,
         }
         for idx, m in enumerate(fileMetadatas)
     ]
+    return {"results": results, "cache": cache, "skipped": budget.skipped, "fallback": fallback}
+
+
+def _unranked(filePaths: list[str]) -> list[dict]:
+    # The order /search returned, without summaries
+    return [{'filePath': p, 'summary': '', 'rank': idx + 1} for idx, p in enumerate(filePaths)]
 
 
-async def rankFiles(query: str, filePaths: list[str]):
+async def rankFiles(query: str, filePaths: list[str], roots: list[str] = None) -> dict:
     """
     Background ranking: send file candidates to Gemini for intelligent
     re-ranking and summary generation. Called after initial results are shown.
+
+    Bounded by RANK_BUDGET_MS: if loading the files or the Gemini call misses its
+    deadline, the files come back unranked, in the order given. `skipped` names
+    the stages that didn't make it.
+
+    `roots` should be the ones the candidates were searched with, so a cached
+    ranking for the same scoped search is found.
     """
-    # Parse files and prepare for ranking
-    files = FileProcessor.sendToRankingService(filePaths)
+    budget = Budget(RANK_BUDGET_MS)
+    scope = _scope(roots)
+    with queryTrace.traced("rank", query) as trace:
+        if trace:
+            queryTrace.candidates([_traceId(p) for p in filePaths])
+
+        # The same candidates for the same query (or a paraphrase /search folded into it)
+        generation = IndexStore.generation()
+        cached = queryCache.ranking(query, filePaths, generation, scope)
+        if QUERY_CACHE_RANKING:
+            queryTrace.cacheEvent("ranking", cached is not None)
+        if cached is not None:
+            return {"results": cached, "cache": "ranking", "skipped": []}
 
-    # Load API key
-    dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
-    load_dotenv(dotenv_path)
+        try:
+            # Parse files and prepare for ranking (cache misses re-parse, so keep it off the event loop)
+            files = await budget.stage("load", FileProcessor.sendToRankingService, filePaths, share=0.3)
 
-    ranking_service = FileRankingService(os.getenv('GEMINI_API_KEY') or '')
+            ranking_service = getRankingService()
 
-    # Run the blocking Gemini call in a thread so it doesn't block the event loop
-    # (otherwise /search can't respond while /rank is processing)
-    loop = asyncio.get_event_loop()
-    ranking_result = await loop.run_in_executor(
-        None, ranking_service.rank_files_sync, query, files
-    )
+            # Run the blocking Gemini call on the remote lane so it doesn't block the event loop
+            # (otherwise /search can't respond while /rank is processing) or the interactive
+            # workers /search needs. Not hedged — a duplicate LLM call costs as much as the first
+            ranking_result = await budget.stage(
+                "llm", ranking_service.rank_files_sync, query, files, remote=True
+            )
+        except StageSkipped:
+            if budget.skipped[-1] == "load":
+                budget.skipped.append("llm")
+            return {"results": _unranked(filePaths), "cache": None, "skipped": budget.skipped}
 
-    return ranking_result['rankedFiles']
\ No newline at end of file
+    if ranking_result['success']:
+        queryCache.putRanking(query, filePaths, generation, ranking_result['rankedFiles'], scope)
+    return {"results": ranking_result['rankedFiles'], "cache": None, "skipped": budget.skipped}
@@ -0,0 +1,163 @@
+"""Index shards — one vector namespace per watched root (or per configured shard).
+
+With INDEX_SHARDING=roots, every watched root handed to /reconcile gets a shard
+(a Pinecone namespace) named after it, unless /shards assigned it one — several
+roots may share a shard. A file's vectors go to the shard of the longest root
+containing it; files outside every root stay in the default namespace (""), as
+does everything with sharding off.
+
+Queries fan out concurrently across the shards searched (all, or the ones for
+the roots a search is scoped to) and merge the top matches. A scoped search
+also keeps only hits under its roots: a shard can hold more than the roots asked
+for, and roots without a shard (all of them with sharding off) are searched in
+the default namespace, with more matches fetched to make up for the filtering. A whole shard is
+dropped or rebuilt with one delete_all call instead of per-file deletes.
+
+Duplicate detection only pairs files in the same shard, so a file always has
+its vectors (or its canonical file's) in its own shard.
+
+    INDEX_SHARDING        off (default) | roots
+    SHARD_QUERY_WORKERS   8 — shards queried at once
+"""
+
+import hashlib
+import os
+import re
+
+from indexStore import IndexStore
+
+INDEX_SHARDING = os.getenv("INDEX_SHARDING", "off")
+if INDEX_SHARDING not in ("off", "roots"):
+    raise ValueError(f"INDEX_SHARDING must be off or roots, not {INDEX_SHARDING!r}")
+SHARDING_ENABLED = INDEX_SHARDING == "roots"
+
+DEFAULT_NAMESPACE = ""
+
+
+def shardName(root: str) -> str:
+    """Default shard for a root: its folder name plus a hash of the full path (namespaces are ASCII)."""
+    root = os.path.abspath(root)
+    base = re.sub(r"[^A-Za-z0-9_-]+", "-", os.path.basename(root.rstrip(os.sep)) or "root").strip("-")[:32]
+    return f"{base or 'root'}-{hashlib.md5(root.encode()).hexdigest()[:8]}"
+
+
+def validName(shard: str) -> bool:
+    return bool(re.fullmatch(r"[A-Za-z0-9_-]{1,64}", shard))
+
+
+def resolver():
+    """namespaceFor() with the root mapping read once — for resolving many paths."""
+    if not SHARDING_ENABLED:
+        return lambda path: DEFAULT_NAMESPACE
+    # Longest root first, so nested roots win
+    roots = sorted(IndexStore.shardRoots().items(), key=lambda item: len(item[0]), reverse=True)
+
+    def resolve(path: str) -> str:
+        for root, shard in roots:
+            if path == root or path.startswith(os.path.join(root, "")):
+                return shard
+        return DEFAULT_NAMESPACE
+    return resolve
+
+
+def namespaceFor(path: str) -> str:
+    """The namespace a file's vectors belong in (archive members follow their archive's path)."""
+    return resolver()(os.path.abspath(path))
+
+
+def register(root: str, shard: str = None) -> str:
+    """Map a root to a shard (its default shard unless given). Returns the shard name."""
+    shard = shard or shardName(root)
+    if not validName(shard):
+        raise ValueError(f"Shard names are 1-64 letters, digits, '-' or '_': {shard!r}")
+    IndexStore.setShardRoot(root, shard)
+    return shard
+
+
+def registerRoots(roots: list[str]) -> None:
+    """Give roots their default shard, leaving already mapped roots alone."""
+    if not SHARDING_ENABLED:
+        return
+    mapped = IndexStore.shardRoots()
+    for root in roots:
+        if os.path.abspath(root) not in mapped:
+            register(root)
+
+
+def rootsOf(shard: str) -> list[str]:
+    return sorted(root for root, name in IndexStore.shardRoots().items() if name == shard)
+
+
+def allNamespaces() -> list[str]:
+    """Every namespace a query may have to search: the default one and every shard."""
+    if not SHARDING_ENABLED:
+        return [DEFAULT_NAMESPACE]
+    return sorted({DEFAULT_NAMESPACE, *IndexStore.shardRoots().values()})
+
+
+def namespacesForRoots(roots: list[str]) -> list[str]:
+    """
+    The shards holding files under the given roots (a root inside a shard's root maps to that shard).
+    They can hold more than the roots — filter hits with underRoots.
+    """
+    resolve = resolver()
+    return sorted({resolve(os.path.abspath(root)) for root in roots})
+
+
+def unshardedRoots(roots: list[str]) -> list[str]:
+    """The roots without a shard of their own — their files share the default namespace with everything else."""
+    resolve = resolver()
+    return [root for root in roots if resolve(os.path.abspath(root)) == DEFAULT_NAMESPACE]
+
+
+def underRoots(roots: list[str]):
+    """A predicate: is a (real or virtual) path under one of the roots?"""
+    prefixes = [os.path.abspath(root) for root in roots]
+    return lambda path: any(path == root or path.startswith(os.path.join(root, "")) for root in prefixes)
+
+
+def listShards(vector_counts: dict = None) -> list[dict]:
+    """Shards with their roots, manifest counts and (if given) vector counts from the index."""
+    stats = IndexStore.namespaceStats()
+    names = set(allNamespaces()) | set(stats)
+    return [
+        {
+            "name": name,
+            "roots": rootsOf(name) if name else [],
+            "files": stats.get(name, {}).get("files", 0),
+            "chunks": stats.get(name, {}).get("chunks", 0),
+            **({"vectors": vector_counts.get(name, 0)} if vector_counts is not None else {}),
+        }
+        for name in sorted(names)
+    ]
+
+
+def drop(shard: str) -> dict:
+    """
+    Delete a shard: its vectors (one delete_all call), its files' manifest rows
+    and its root mappings. Files under its roots are indexed afresh (into the
+    default namespace) when next reconciled or changed.
+    """
+    from pineconeService import PineconeService
+
+    PineconeService().dropNamespace(shard)
+    removed = IndexStore.removeNamespace(shard)
+    roots = rootsOf(shard)
+    IndexStore.removeShardRoots(shard)
+    return {"shard": shard, "roots": roots, "filesRemoved": removed}
+
+
+def rebuild(shard: str) -> dict:
+    """
+    Re-index a shard from scratch: drop its vectors and manifest rows in one go,
+    then reconcile its roots, which queues every file under them — including
+    files still indexed into another namespace, whose old vectors their jobs delete.
+    """
+    from pineconeService import PineconeService
+    from reconcile import reconcile
+
+    roots = rootsOf(shard)
+    PineconeService().dropNamespace(shard)
+    removed = IndexStore.removeNamespace(shard)
+    result = reconcile(roots) if roots else {"jobIds": []}
+    return {"shard": shard, "roots": roots, "filesRemoved": removed, **result}
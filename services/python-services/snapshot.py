@@ -0,0 +1,382 @@
+"""Index snapshots — export the index to one compact file and restore it without re-embedding.
+
+    python snapshot.py export findly.snapshot
+    python snapshot.py import findly.snapshot --remap /Users/me/docs=/home/me/docs
+    python snapshot.py import findly.snapshot --local-only   # vector index still intact
+
+A snapshot holds every manifest row (duplicates and archive members included)
+with its shard, each file's chunk text and offsets, its MinHash signature, its
+vectors as float16, and the watched roots' shard mapping. Vectors come from the
+local vector cache when it is complete, otherwise from the vector index. Files
+with no vectors available are exported without them and queued for indexing on
+import.
+
+Import restores the shard mapping first (so reconciling the same roots afterwards
+finds every file already in its root's shard), then rebuilds the local store and
+upserts the vectors with parallel workers, under the same file IDs (so later
+re-indexing overwrites rather than duplicates), into the shard each file's
+(remapped) path maps to now. --remap rewrites path prefixes, mapped roots
+included, when watched roots moved. Snapshots from a larger embedding profile
+are truncated to EMBEDDING_DIMENSIONS on import.
+
+File layout: a magic line, a length-prefixed JSON header, then blocks of
+(uint32 JSON length, uint32 vector bytes, zlib-compressed JSON of files and
+chunks, float16 vector rows). The last block holds only {"summary": ...}.
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+# Load .env from project root (two levels up from services/python-services/)
+load_dotenv(os.path.join(os.path.dirname(__file__), "../../.env"))
+
+import archives
+import dedupe
+import shards
+from embeddingProfile import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, VECTOR_CACHE_DTYPE, quantize, dequantize, truncate
+from indexStore import IndexStore
+from jobQueue import jobQueue
+from pineconeService import PineconeService
+
+MAGIC = b"FINDLY-SNAPSHOT\n"
+VERSION = 1
+SNAPSHOT_DTYPE = "float16"
+# Chunks per block — bounds memory on both ends (about 3 MB of vectors at 1536 dims)
+BLOCK_CHUNKS = 1000
+UPSERT_BATCH = 100
+EXPORT_SLICE = 256
+
+_BLOCK = struct.Struct("<II")
+
+
+# ── Export ──
+
+def _fetchVectors(pc: PineconeService, file_id: str, count: int, namespace: str) -> list | None:
+    ids = [f"{file_id}_{idx}" for idx in range(count)]
+    fetched = {}
+    for i in range(0, len(ids), 100):
+        fetched.update(pc.index.fetch(ids=ids[i:i + 100], namespace=namespace).vectors)
+    if len(fetched) != count:
+        return None
+    return [fetched[i].values for i in ids]
+
+
+def _exportEntry(entry: dict, pc: PineconeService | None) -> tuple[dict, list]:
+    """(snapshot record, vectors) for one manifest row."""
+    file_id = entry["file_id"]
+    rows = IndexStore.getChunkRows(file_id) if entry["chunk_count"] else []
+
+    vectors = []
+    if rows:
+        vectors = IndexStore.getVectors(file_id)
+        if len(vectors) != len(rows) and pc is not None:
+            vectors = _fetchVectors(pc, file_id, len(rows), entry["namespace"]) or []
+        if len(vectors) != len(rows) or len(vectors[0]) < EMBEDDING_DIMENSIONS:
+            vectors = []
+
+    record = {
+        "path": entry["path"],
+        "fileId": file_id,
+        "size": entry["size"],
+        "mtime": entry["mtime"],
+        "chunkCount": entry["chunk_count"],
+        "contentHash": entry["content_hash"],
+        "metadata": entry["metadata"],
+        "canonicalId": entry["canonical_id"],
+        "namespace": entry["namespace"],
+        "minhash": entry["minhash"].hex() if entry["minhash"] else None,
+        "chunks": [row["text"] for row in rows],
+        "offsets": [row["start_offset"] for row in rows],
+        "vectors": len(vectors),
+    }
+    return record, [truncate(v, EMBEDDING_DIMENSIONS) if len(v) > EMBEDDING_DIMENSIONS else v for v in vectors]
+
+
+def _writeBlock(f, records: list[dict], vectors: bytes) -> None:
+    payload = zlib.compress(json.dumps({"files": records}, ensure_ascii=False).encode("utf-8"), 6)
+    f.write(_BLOCK.pack(len(payload), len(vectors)))
+    f.write(payload)
+    f.write(vectors)
+
+
+def export(path: str, use_index: bool = True, workers: int = 8) -> dict:
+    """Write a snapshot of the whole index to path. Returns counts."""
+    pc = None
+    if use_index:
+        pc = PineconeService()
+        pc.ensure_initialize()
+
+    entries = IndexStore.listFiles()
+    summary = {"files": 0, "chunks": 0, "vectors": 0, "withoutVectors": 0}
+    header = {
+        "version": VERSION,
+        "createdAt": time.time(),
+        "model": EMBEDDING_MODEL,
+        "dimensions": EMBEDDING_DIMENSIONS,
+        "dtype": SNAPSHOT_DTYPE,
+        "shardRoots": IndexStore.shardRoots(),
+    }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        header_bytes = json.dumps(header).encode()
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+
+        records, vector_bytes, block_chunks = [], [], 0
+        # Vector fetches run in parallel; results are written in manifest order,
+        # a slice at a time so finished-but-unwritten files don't pile up in memory
+        results = (
+            result
+            for i in range(0, len(entries), EXPORT_SLICE)
+            for result in pool.map(lambda e: _exportEntry(e, pc), entries[i:i + EXPORT_SLICE])
+        )
+        for done, (record, vectors) in enumerate(results, 1):
+            records.append(record)
+            vector_bytes.extend(quantize(v, SNAPSHOT_DTYPE) for v in vectors)
+            block_chunks += len(record["chunks"])
+            summary["files"] += 1
+            summary["chunks"] += len(record["chunks"])
+            summary["vectors"] += len(vectors)
+            if record["chunks"] and not vectors:
+                summary["withoutVectors"] += 1
+
+            if block_chunks >= BLOCK_CHUNKS:
+                _writeBlock(f, records, b"".join(vector_bytes))
+                records, vector_bytes, block_chunks = [], [], 0
+            if done % 1000 == 0:
+                print(f"Exported {done}/{len(entries)} files")
+
+        if records:
+            _writeBlock(f, records, b"".join(vector_bytes))
+        summary_bytes = zlib.compress(json.dumps({"summary": summary}).encode())
+        f.write(_BLOCK.pack(len(summary_bytes), 0) + summary_bytes)
+
+    os.replace(tmp_path, path)
+    return summary
+
+
+# ── Import ──
+
+def readSnapshot(path: str):
+    """Yield ("header", dict, None), then ("files", records, vector bytes) per block, then ("summary", dict, None)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a findly snapshot")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+        if header["version"] > VERSION:
+            raise ValueError(f"Snapshot version {header['version']} is newer than this tool ({VERSION})")
+        yield "header", header, None
+
+        while True:
+            prefix = f.read(_BLOCK.size)
+            if len(prefix) < _BLOCK.size:
+                raise ValueError(f"{path} is truncated (no summary block)")
+            json_len, vector_len = _BLOCK.unpack(prefix)
+            block = json.loads(zlib.decompress(f.read(json_len)))
+            if "summary" in block:
+                yield "summary", block["summary"], None
+                return
+            yield "files", block["files"], f.read(vector_len)
+
+
+def parseRemaps(specs: list[str]) -> list[tuple[str, str]]:
+    """OLD=NEW prefixes, longest first so nested roots win."""
+    remaps = []
+    for spec in specs or []:
+        old, sep, new = spec.partition("=")
+        if not sep or not old:
+            raise ValueError(f"--remap expects OLD=NEW, got {spec!r}")
+        remaps.append((old.rstrip("/"), new.rstrip("/")))
+    return sorted(remaps, key=lambda r: len(r[0]), reverse=True)
+
+
+def remapPath(path: str, remaps: list[tuple[str, str]]) -> str:
+    for old, new in remaps:
+        if path == old or path.startswith(old + "/"):
+            return new + path[len(old):]
+    return path
+
+
+def _placeholder(record: dict) -> None:
+    """
+    Manifest row for a file exported without vectors (or an archive with such members):
+    it keeps its file ID (so its duplicates stay attached) but never looks unchanged,
+    so its index job re-embeds it.
+    """
+    IndexStore.recordFile(
+        record["path"], record["fileId"], -1, -1, 0, None, record["metadata"], namespace=record["namespace"]
+    )
+
+
+def _restoreFile(record: dict, vectors: list, adopt_mtimes: bool) -> None:
+    file_id = record["fileId"]
+    size, mtime = record["size"], record["mtime"]
+    if adopt_mtimes:
+        # Copies that didn't keep mtimes would otherwise all look changed and be re-indexed
+        try:
+            stats = os.stat(record["path"])
+            if stats.st_size == size:
+                mtime = stats.st_mtime
+        except OSError:
+            pass
+
+    IndexStore.recordFile(
+        record["path"], file_id, size, mtime, record["chunkCount"],
+        record["contentHash"], record["metadata"], record["canonicalId"], record["namespace"],
+    )
+    if record["chunks"]:
+        IndexStore.storeChunks(file_id, record["chunks"], record["offsets"])
+    if vectors and VECTOR_CACHE_DTYPE != "none":
+        IndexStore.storeVectors(file_id, vectors, VECTOR_CACHE_DTYPE)
+    signature = bytes.fromhex(record["minhash"]) if record["minhash"] else None
+    IndexStore.setSignature(file_id, signature, dedupe.buckets(dedupe.unpack(signature)) if signature else [])
+
+
+def restore(path: str, remaps: list[tuple[str, str]] = None, workers: int = 8,
+            local_only: bool = False, adopt_mtimes: bool = False) -> dict:
+    """Load a snapshot into the local store and (unless local_only) the vector index."""
+    remaps = remaps or []
+    blocks = readSnapshot(path)
+    _, header, _ = next(blocks)
+    dimensions = header["dimensions"]
+    if dimensions < EMBEDDING_DIMENSIONS:
+        raise ValueError(
+            f"Snapshot has {dimensions}-dim vectors but EMBEDDING_DIMENSIONS is {EMBEDDING_DIMENSIONS}"
+        )
+    row_bytes = 2 * dimensions
+
+    pc = None
+    if not local_only:
+        pc = PineconeService()
+        pc.ensure_initialize()
+
+    # Before any namespace is resolved: the roots keep their shards wherever they live now
+    for root, shard in header.get("shardRoots", {}).items():
+        shards.register(remapPath(root, remaps), shard)
+
+    counts = {"files": 0, "chunks": 0, "upserted": 0, "queued": 0}
+    namespaceFor = shards.resolver()
+    requeue = []
+    in_flight = set()
+    started = time.perf_counter()
+
+    def upsert(batch, namespace):
+        pc.index.upsert(vectors=batch, namespace=namespace)
+        return len(batch)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for kind, records, vector_data in blocks:
+            if kind == "summary":
+                counts["snapshot"] = records
+                break
+
+            offset = 0
+            batches = {}
+            for record in records:
+                vectors = [
+                    dequantize(vector_data[offset + i * row_bytes:offset + (i + 1) * row_bytes], SNAPSHOT_DTYPE)
+                    for i in range(record["vectors"])
+                ]
+                offset += record["vectors"] * row_bytes
+                if dimensions > EMBEDDING_DIMENSIONS:
+                    vectors = [truncate(v, EMBEDDING_DIMENSIONS) for v in vectors]
+
+                record["path"] = remapPath(record["path"], remaps)
+                if "filePath" in record["metadata"]:
+                    record["metadata"]["filePath"] = remapPath(record["metadata"]["filePath"], remaps)
+                # Shards are looked up for where the file lives now, not where it was exported
+                # from — unless the vectors stay put, in the namespace they were exported from
+                if not (local_only and "namespace" in record):
+                    record["namespace"] = namespaceFor(record["path"])
+
+                if record["chunks"] and not vectors:
+                    # Nothing to restore the vectors from — index it from scratch
+                    _placeholder(record)
+                    requeue.append(record["path"])
+                    continue
+
+                _restoreFile(record, vectors, adopt_mtimes)
+                counts["files"] += 1
+                counts["chunks"] += len(record["chunks"])
+
+                if pc is not None:
+                    batch = batches.setdefault(record["namespace"], [])
+                    for idx, (chunk, values) in enumerate(zip(record["chunks"], vectors)):
+                        batch.append({
+                            "id": f"{record['fileId']}_{idx}",
+                            "values": values,
+                            "metadata": PineconeService._vectorMetadata(
+                                record["fileId"], idx, chunk, record["metadata"]
+                            ),
+                        })
+                        if len(batch) >= UPSERT_BATCH:
+                            in_flight.add(pool.submit(upsert, batch, record["namespace"]))
+                            batch = batches[record["namespace"]] = []
+
+            for namespace, batch in batches.items():
+                if batch:
+                    in_flight.add(pool.submit(upsert, batch, namespace))
+            # Keep a bounded number of batches in memory
+            while len(in_flight) > workers * 4:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                counts["upserted"] += sum(f.result() for f in done)
+
+            if counts["files"] // 1000 != (counts["files"] - len(records)) // 1000:
+                print(f"Restored {counts['files']} files, {counts['chunks']} chunks")
+
+        counts["upserted"] += sum(f.result() for f in wait(in_flight).done)
+
+    # Archive members aren't files on disk — re-indexing their archive brings them back,
+    # so the archive's own (restored) row mustn't look unchanged either
+    queued = set()
+    for member in filter(archives.isMember, requeue):
+        archive = archives.splitVirtualPath(member)[0]
+        entry = IndexStore.getFile(archive)
+        if archive not in queued and entry is not None:
+            _placeholder({"path": archive, "fileId": entry["file_id"], "metadata": entry["metadata"],
+                          "namespace": entry["namespace"]})
+        queued.add(archive)
+    queued.update(p for p in requeue if not archives.isMember(p))
+    counts["queued"] = len(jobQueue.enqueueMany([p for p in queued if os.path.exists(p)]))
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="write a snapshot")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--local-only", action="store_true",
+                            help="only use the local vector cache, never fetch from the index")
+    export_cmd.add_argument("--workers", type=int, default=8)
+
+    import_cmd = commands.add_parser("import", help="restore a snapshot")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--remap", action="append", metavar="OLD=NEW", help="rewrite a path prefix (repeatable)")
+    import_cmd.add_argument("--local-only", action="store_true",
+                            help="restore the local store only; the vector index already has the vectors")
+    import_cmd.add_argument("--adopt-mtimes", action="store_true",
+                            help="trust files on disk whose size matches, recording their current mtime")
+    import_cmd.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        summary = export(args.path, use_index=not args.local_only, workers=args.workers)
+        print(f"Done. {summary} -> {args.path} ({os.path.getsize(args.path) / 2**20:.1f} MB)")
+    else:
+        counts = restore(args.path, parseRemaps(args.remap), args.workers, args.local_only, args.adopt_mtimes)
+        print(f"Done. {counts}")
+
+
+if __name__ == "__main__":
+    main()
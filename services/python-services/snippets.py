@@ -0,0 +1,146 @@
+"""Query-term snippets for result previews — computed from locally stored chunks.
+
+No LLM call and no re-parsing: each result's chunks come from the index store
+(a duplicate uses its canonical file's chunks), are scored by the query terms they
+contain, and the best passages are returned with highlight offsets. Files that
+were never chunked fall back to the parsed-content cache, split into passages of
+FALLBACK_PASSAGE_CHARS.
+"""
+
+import math
+import os
+import re
+
+from indexStore import IndexStore
+
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS", "240"))
+MAX_SNIPPETS = 3
+# Cached content is split up like chunks, so scoring and windowing stay per-passage
+FALLBACK_PASSAGE_CHARS = 2000
+
+# Too common to say anything about where a match is
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were with".split()
+)
+
+
+def queryTerms(query: str) -> list[str]:
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t not in STOPWORDS]
+    return list(dict.fromkeys(terms))
+
+
+def _termPattern(terms: list[str]) -> re.Pattern:
+    # Prefix match on word starts, so "report" also highlights "reports" and "reporting"
+    alternatives = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE)
+
+
+def _passages(file_id: str, filePath: str) -> list[dict]:
+    """[{text, start}] for a file: stored chunks, else the cached parsed content in passages."""
+    rows = IndexStore.getChunkRows(file_id) if file_id else []
+    if rows:
+        return [{"text": row["text"], "start": row["start_offset"], "chunkIndex": row["chunk_index"]}
+                for row in rows]
+    cached = IndexStore.getCachedContent(filePath)
+    if cached and cached["content"]:
+        content = cached["content"]
+        return [{"text": content[i:i + FALLBACK_PASSAGE_CHARS], "start": i, "chunkIndex": None}
+                for i in range(0, len(content), FALLBACK_PASSAGE_CHARS)]
+    return []
+
+
+def _bestWindow(text: str, spans: list[tuple[int, int]], width: int) -> tuple[int, int]:
+    """
+    The width-character window of text covering the most match spans (sorted and
+    non-overlapping, as finditer returns them). Windows are tried at each span in
+    one sweep: as the window moves right, both ends of its run of spans only advance.
+    """
+    if len(text) <= width:
+        return 0, len(text)
+    best_start, best_count = 0, -1
+    first = last = 0
+    for anchor, _ in spans:
+        start = max(0, min(anchor - width // 4, len(text) - width))
+        while first < len(spans) and spans[first][0] < start:
+            first += 1
+        while last < len(spans) and spans[last][1] <= start + width:
+            last += 1
+        count = max(0, last - first)
+        if count > best_count:
+            best_start, best_count = start, count
+    start, end = best_start, best_start + width
+    # Widen (a little) to word boundaries so snippets don't start or end mid-word
+    while start > 0 and not text[start - 1].isspace() and best_start - start < 20:
+        start -= 1
+    while end < len(text) and not text[end].isspace() and end - (best_start + width) < 20:
+        end += 1
+    return start, end
+
+
+def snippetsFor(filePath: str, query: str, max_snippets: int = MAX_SNIPPETS,
+                width: int = SNIPPET_CHARS) -> dict:
+    """
+    Best-matching passages of an indexed file for a query. Highlight offsets are
+    relative to each snippet's text; `start` is the snippet's offset in the file's
+    parsed text (None if unknown).
+    """
+    entry = IndexStore.getFile(filePath)
+    path = entry["path"] if entry else os.path.abspath(filePath)
+    file_id = (entry["canonical_id"] or entry["file_id"]) if entry else None
+    passages = _passages(file_id, path)
+    terms = queryTerms(query)
+    if not passages:
+        return {"filePath": filePath, "status": "not-indexed", "snippets": []}
+    if not terms:
+        return {"filePath": filePath, "status": "ok", "snippets": []}
+
+    # Score with plain substring counts (C speed, no regex over the whole file);
+    # only the passages actually returned are matched precisely for highlights
+    counts = []
+    for passage in passages:
+        lowered = passage["text"].lower()
+        counts.append({term: lowered.count(term) for term in terms})
+
+    # Rarer terms (within this file) count for more; distinct terms beat repeats
+    document_frequency = {t: sum(1 for c in counts if c[t]) for t in terms}
+    weight = {t: math.log(1 + len(passages) / (1 + df)) for t, df in document_frequency.items()}
+
+    scored = []
+    for passage, count in zip(passages, counts):
+        total = sum(count.values())
+        if total:
+            score = sum(weight[t] for t, n in count.items() if n) + 0.1 * total
+            scored.append((score, passage))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    pattern = _termPattern(terms)
+    snippets = []
+    taken = []
+    for score, passage in scored:
+        spans = [m.span() for m in pattern.finditer(passage["text"])]
+        if not spans:
+            continue
+        lo, hi = _bestWindow(passage["text"], spans, width)
+        start = passage["start"] + lo if passage["start"] is not None else None
+
+        # Chunks overlap — skip a window that repeats text already shown
+        if start is not None and any(start < end and s < start + (hi - lo) for s, end in taken):
+            continue
+        if start is not None:
+            taken.append((start, start + (hi - lo)))
+
+        snippets.append({
+            "text": passage["text"][lo:hi],
+            "start": start,
+            "chunkIndex": passage["chunkIndex"],
+            "score": round(score, 4),
+            "highlights": [[s - lo, e - lo] for s, e in spans if s >= lo and e <= hi],
+        })
+        if len(snippets) >= max_snippets:
+            break
+
+    return {"filePath": filePath, "status": "ok", "snippets": snippets}
+
+
+def snippets(query: str, filePaths: list[str], max_snippets: int = MAX_SNIPPETS) -> list[dict]:
+    return [snippetsFor(filePath, query, max_snippets) for filePath in filePaths]
@@ -0,0 +1,55 @@
+"""Shared fixtures. Run from services/python-services: python -m pytest tests"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Modules read their configuration at import time — never touch the real index.db
+os.environ.setdefault("INDEX_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="findly-tests-"), "index.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import indexStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh, empty index database for the test (per-thread connections included)."""
+    monkeypatch.setattr(indexStore, "INDEX_DB_PATH", str(tmp_path / "index.db"))
+    monkeypatch.setattr(indexStore, "_local", threading.local())
+    return indexStore.IndexStore
+
+
+class FakeVectorIndex:
+    """In-memory stand-in for PineconeService: namespace -> vector ID -> embedding."""
+
+    def __init__(self):
+        self.namespaces: dict[str, dict[str, list[float]]] = {}
+
+    def indexFile(self, chunks, metadata, file_id, namespace=""):
+        embeddings = [[float(len(chunk)), 1.0] for chunk in chunks]
+        for idx, embedding in enumerate(embeddings):
+            self.namespaces.setdefault(namespace, {})[f"{file_id}_{idx}"] = embedding
+        return embeddings
+
+    def deleteChunks(self, file_id, chunk_indexes, namespace=""):
+        for idx in chunk_indexes:
+            self.namespaces.get(namespace, {}).pop(f"{file_id}_{idx}", None)
+
+    def dropNamespace(self, namespace):
+        self.namespaces.pop(namespace, None)
+
+    def ids(self, namespace=""):
+        return set(self.namespaces.get(namespace, {}))
+
+
+@pytest.fixture
+def vectors(monkeypatch):
+    """Route indexing's vector store calls to a FakeVectorIndex."""
+    import indexing
+
+    fake = FakeVectorIndex()
+    monkeypatch.setattr(indexing, "PineconeService", lambda: fake)
+    return fake
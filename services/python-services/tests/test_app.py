@@ -0,0 +1,44 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+import indexStore
+
+
+@pytest.fixture
+def client(store):
+    from app import app
+
+    store.generation()  # create the schema before another connection locks it
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_job_queue_writes_do_not_block_other_endpoints(client, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("alpha beta")
+
+    # Another process holding the write lock on index.db
+    other = sqlite3.connect(indexStore.INDEX_DB_PATH, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(1.0, other.rollback).start()
+
+    async def run():
+        async with client:
+            started = time.perf_counter()
+            enqueue = asyncio.create_task(
+                client.post("/process-file", json={"filePath": str(path), "wait": False})
+            )
+            await asyncio.sleep(0.1)
+            ready = await client.get("/ready")
+            # Answered while the enqueue still waits for the lock
+            answered = time.perf_counter() - started
+            return (await enqueue), ready, answered
+
+    queued, ready, answered = asyncio.run(run())
+    assert ready.status_code in (200, 503)
+    assert answered < 0.5
+    assert queued.json()["status"] == "queued"
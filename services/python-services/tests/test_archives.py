@@ -0,0 +1,78 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+import archives
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w") as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return str(path)
+
+
+def _tar(path, members):
+    with tarfile.open(path, "w:gz") as t:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+def test_split_virtual_path():
+    assert archives.splitVirtualPath("/a/b.zip!/docs/c.txt") == ("/a/b.zip", "docs/c.txt")
+    assert archives.splitVirtualPath("/a/b.TAR.GZ!/c.txt") == ("/a/b.TAR.GZ", "c.txt")
+    # "!/" only separates after an archive suffix — in directory or member names it is literal
+    assert archives.splitVirtualPath("/a/wow!/b.zip!/c.txt") == ("/a/wow!/b.zip", "c.txt")
+    assert archives.splitVirtualPath("/a/b.zip!/x!/c.txt") == ("/a/b.zip", "x!/c.txt")
+    with pytest.raises(ValueError):
+        archives.splitVirtualPath("/a/wow!/c.txt")
+
+
+def test_member_and_archive_paths():
+    assert archives.isMember("/a/b.zip!/c.txt")
+    assert not archives.isMember("/a/wow!/c.txt")
+    assert archives.isArchive("/a/wow!/b.zip")
+    assert archives.isArchive("/a/b.tgz")
+    assert not archives.isArchive("/a/b.zip!/inner.zip")
+    assert not archives.isArchive("/a/b.txt")
+    assert archives.virtualPath("/a/b.zip", "c.txt") == "/a/b.zip!/c.txt"
+
+
+def test_path_exists(tmp_path):
+    archive = _zip(tmp_path / "a.zip", {"c.txt": "hi"})
+    assert archives.pathExists(archive + "!/c.txt")
+    assert not archives.pathExists(str(tmp_path / "gone.zip") + "!/c.txt")
+
+    (tmp_path / "wow!").mkdir()
+    (tmp_path / "wow!" / "c.txt").write_text("hi")
+    assert archives.pathExists(str(tmp_path / "wow!" / "c.txt"))
+
+
+@pytest.mark.parametrize("make", [_zip, _tar])
+def test_iter_members(tmp_path, make):
+    suffix = ".zip" if make is _zip else ".tar.gz"
+    archive = make(tmp_path / f"a{suffix}", {
+        "docs/a.txt": b"alpha",
+        "docs/.hidden.txt": b"hidden",
+        "inner.zip": b"nested",
+        "image.bin": b"\x00",
+        "b.txt": b"beta",
+    })
+    members = [(m.virtualPath, m.read()) for m in archives.iterMembers(archive, lambda n: n.endswith(".txt"))]
+    assert members == [(f"{archive}!/docs/a.txt", b"alpha"), (f"{archive}!/b.txt", b"beta")]
+    assert archives.readMember(f"{archive}!/b.txt").read() == b"beta"
+    with pytest.raises(FileNotFoundError):
+        archives.readMember(f"{archive}!/missing.txt")
+
+
+def test_member_limits(tmp_path, monkeypatch):
+    archive = _zip(tmp_path / "a.zip", {f"{i}.txt": "x" * 10 for i in range(5)} | {"big.txt": "x" * 100})
+    monkeypatch.setattr(archives, "ARCHIVE_MAX_MEMBER_BYTES", 50)
+    monkeypatch.setattr(archives, "ARCHIVE_MAX_MEMBERS", 3)
+    names = [archives.splitVirtualPath(m.virtualPath)[1] for m in archives.iterMembers(archive)]
+    assert names == ["0.txt", "1.txt", "2.txt"]
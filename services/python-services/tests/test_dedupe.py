@@ -0,0 +1,113 @@
+import random
+
+import dedupe
+import indexing
+
+WORDS = [f"word{i}" for i in range(500)]
+
+
+def _text(seed, n=400):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _canonical(store, tmp_path, name, text, namespace=""):
+    path = tmp_path / name
+    path.write_text(text)
+    file_id = indexing._file_id(str(path))
+    sig = dedupe.signature(text)
+    store.recordFile(str(path), file_id, len(text), 1.0, 1, indexing._content_hash(text), {}, namespace=namespace)
+    store.setSignature(file_id, dedupe.pack(sig), dedupe.buckets(sig))
+    return file_id
+
+
+def test_signature_similarity():
+    text = _text(1)
+    words = text.split()
+    edited = " ".join(words[:200] + ["changed"] + words[201:])
+
+    assert dedupe.signature("") is None
+    assert dedupe.similarity(dedupe.signature(text), dedupe.signature(text)) == 1.0
+    assert dedupe.similarity(dedupe.signature(text), dedupe.signature(edited)) >= 0.9
+    assert dedupe.similarity(dedupe.signature(text), dedupe.signature(_text(2))) < 0.2
+
+
+def test_pack_round_trip():
+    sig = dedupe.signature(_text(3))
+    assert dedupe.unpack(dedupe.pack(sig)) == sig
+    assert len(dedupe.buckets(sig)) == dedupe.BANDS
+
+
+def test_exact_duplicate(store, tmp_path):
+    text = _text(4)
+    canonical_id = _canonical(store, tmp_path, "a.txt", text)
+    found = dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), indexing._content_hash(text),
+                                 dedupe.signature(text))
+    assert found["file_id"] == canonical_id
+
+
+def test_near_duplicate(store, tmp_path):
+    text = _text(5)
+    canonical_id = _canonical(store, tmp_path, "a.txt", text)
+    _canonical(store, tmp_path, "unrelated.txt", _text(6))
+
+    words = text.split()
+    edited = " ".join(words[:-1] + ["tail"])
+    found = dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), indexing._content_hash(edited),
+                                 dedupe.signature(edited))
+    assert found["file_id"] == canonical_id
+
+
+def test_unique_content(store, tmp_path):
+    _canonical(store, tmp_path, "a.txt", _text(7))
+    text = _text(8)
+    assert dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), indexing._content_hash(text),
+                                dedupe.signature(text)) is None
+
+
+def test_ineligible_canonicals(store, tmp_path):
+    text = _text(9)
+    sig, content_hash = dedupe.signature(text), indexing._content_hash(text)
+
+    # Deleted from disk
+    _canonical(store, tmp_path, "gone.txt", text)
+    (tmp_path / "gone.txt").unlink()
+    assert dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), content_hash, sig) is None
+
+    # In another shard
+    _canonical(store, tmp_path, "other.txt", text, namespace="work")
+    assert dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), content_hash, sig) is None
+    assert dedupe.findCanonical("file_new", str(tmp_path / "b.txt"), content_hash, sig, "work") is not None
+
+
+def test_duplicate_reuses_canonical_vectors(store, vectors, tmp_path):
+    text = _text(10)
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(text)
+    results = [
+        indexing._indexPrepared(str(tmp_path / name), {"chunks": [text], "metadata": {}}, len(text), 1.0, False)
+        for name in ("a.txt", "b.txt")
+    ]
+    assert results == ["processed", "duplicate"]
+
+    canonical = store.getFile(str(tmp_path / "a.txt"))
+    duplicate = store.getFile(str(tmp_path / "b.txt"))
+    assert duplicate["canonical_id"] == canonical["file_id"]
+    assert vectors.ids() == {f"{canonical['file_id']}_0"}
+    assert [d["path"] for d in store.duplicatesOf(canonical["file_id"])] == [str(tmp_path / "b.txt")]
+
+
+def test_exact_copies_are_found_without_signing(store, vectors, tmp_path, monkeypatch):
+    text = _text(5)
+    original = tmp_path / "a.txt"
+    original.write_text(text)
+    assert indexing._indexPrepared(str(original), {"chunks": [text], "metadata": {}}, len(text), 1.0, False) \
+        == "processed"
+
+    signed = []
+    monkeypatch.setattr(dedupe, "signature", lambda t: signed.append(t) or None)
+    copy = tmp_path / "b.txt"
+    copy.write_text(text)
+    assert indexing._indexPrepared(str(copy), {"chunks": [text], "metadata": {}}, len(text), 1.0, False) \
+        == "duplicate"
+    assert signed == []
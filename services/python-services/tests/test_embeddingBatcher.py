@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tokenizer
+from embeddingBatcher import EmbeddingBatcher
+
+
+@pytest.fixture(autouse=True)
+def estimated(monkeypatch):
+    """Force the estimator (what runs without tiktoken or its downloaded encoding)."""
+    monkeypatch.setattr(tokenizer, "_encoding", None)
+    monkeypatch.setattr(tokenizer, "_encoding_loaded", True)
+
+
+class Backend:
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def embed(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def _batcher(backend, **limits):
+    batcher = EmbeddingBatcher(backend.embed)
+    batcher.linger = 0.01
+    for name, value in limits.items():
+        setattr(batcher, name, value)
+    return batcher
+
+
+def test_estimate_errs_high():
+    # Code, numbers and CSV run ~2.5-3 characters per token; the estimate must not go below that
+    csv = "1234,5678,9012,3456\n" * 100
+    assert tokenizer.countTokens(csv) >= len(csv) / 2.5
+    assert tokenizer.countTokens("日本語") == 3
+    assert tokenizer.countTokens(tokenizer.truncateToTokens("word " * 100, 10)) <= 10
+
+
+def test_batches_respect_token_and_input_limits():
+    backend = Backend()
+    batcher = _batcher(backend, max_batch_tokens=100, max_batch_inputs=3)
+    texts = ["x" * 60] * 7  # 30 estimated tokens each
+    assert batcher.embed(texts) == [[60.0]] * 7
+    assert all(len(batch) <= 3 for batch in backend.batches)
+    assert all(sum(tokenizer.countTokens(t) for t in batch) <= 100 for batch in backend.batches)
+    assert sum(len(batch) for batch in backend.batches) == 7
+
+
+def test_concurrent_callers_share_requests_and_keep_order():
+    backend = Backend()
+    batcher = _batcher(backend, max_batch_tokens=10_000)
+    batcher.linger = 0.2
+    files = [[f"{i}-{j}" * (j + 1) for j in range(5)] for i in range(4)]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(batcher.embed, files))
+    assert results == [[[float(len(t))] for t in texts] for texts in files]
+    assert len(backend.batches) < len(files)
+
+
+def test_long_inputs_are_truncated():
+    backend = Backend()
+    batcher = _batcher(backend, max_input_tokens=8)
+    batcher.embed(["word " * 100])
+    assert tokenizer.countTokens(backend.batches[0][0]) <= 8
+
+
+def test_failed_request_fails_its_callers():
+    def broken(texts):
+        raise RuntimeError("rate limited")
+
+    batcher = EmbeddingBatcher(broken)
+    with pytest.raises(RuntimeError):
+        batcher.embed(["a", "b"])
+    assert batcher.stats()["requests"] == 1
+
+
+def test_requests_wait_for_interactive_work(monkeypatch):
+    from scheduler import scheduler, INTERACTIVE
+
+    monkeypatch.setattr(scheduler, "max_yield_seconds", 5)
+    backend = Backend()
+    batcher = _batcher(backend)
+    query_running, release = threading.Event(), threading.Event()
+
+    def query():
+        query_running.set()
+        release.wait(5)
+
+    scheduler.submit(INTERACTIVE, query)
+    query_running.wait(1)
+    with ThreadPoolExecutor(1) as pool:
+        embedded = pool.submit(batcher.embed, ["chunk"])
+        time.sleep(0.3)
+        assert backend.batches == []
+        release.set()
+        assert embedded.result(5) == [[5.0]]
@@ -0,0 +1,93 @@
+import math
+import random
+
+import pytest
+
+import embeddingProfile as ep
+
+
+def _embedding(seed: int, dimensions: int = ep.FULL_DIMENSIONS) -> list[float]:
+    rng = random.Random(seed)
+    return ep.truncate([rng.gauss(0, 1) for _ in range(dimensions)], dimensions)
+
+
+def _norm(vector: list[float]) -> float:
+    return math.sqrt(sum(x * x for x in vector))
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    return sum(x * y for x, y in zip(a, b)) / (_norm(a) * _norm(b))
+
+
+@pytest.mark.parametrize("dtype", ep.SUPPORTED_DTYPES)
+def test_round_trip_keeps_length_and_size(dtype):
+    vector = _embedding(1)
+    data = ep.quantize(vector, dtype)
+    assert len(data) == ep.bytesPerVector(len(vector), dtype)
+    assert len(ep.dequantize(data, dtype)) == len(vector)
+
+
+def test_float32_round_trip_is_within_single_precision():
+    vector = _embedding(2)
+    restored = ep.dequantize(ep.quantize(vector, "float32"), "float32")
+    assert all(abs(x - y) <= abs(x) * 2 ** -23 for x, y in zip(vector, restored))
+
+
+def test_float16_round_trip_is_within_half_precision():
+    vector = _embedding(3)
+    restored = ep.dequantize(ep.quantize(vector, "float16"), "float16")
+    # Half of a unit in the last place: relative 2^-11 for normal values, 2^-25 absolute for subnormals
+    assert all(abs(x - y) <= max(abs(x) * 2 ** -11, 2 ** -25) for x, y in zip(vector, restored))
+    assert _cosine(vector, restored) > 0.99999
+
+
+def test_int8_round_trip_is_within_half_a_step():
+    vector = _embedding(4)
+    restored = ep.dequantize(ep.quantize(vector, "int8"), "int8")
+    step = max(abs(x) for x in vector) / 127
+    assert all(abs(x - y) <= step / 2 * (1 + 1e-6) for x, y in zip(vector, restored))
+    assert _cosine(vector, restored) > 0.999
+
+
+def test_int8_handles_a_zero_vector():
+    assert ep.dequantize(ep.quantize([0.0] * 8, "int8"), "int8") == [0.0] * 8
+
+
+def test_unsupported_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        ep.quantize([1.0], "bfloat16")
+    with pytest.raises(ValueError):
+        ep.dequantize(b"\x00\x00", "bfloat16")
+
+
+@pytest.mark.parametrize("dimensions", ep.SUPPORTED_DIMENSIONS)
+def test_truncate_renormalizes_to_unit_length(dimensions):
+    full = _embedding(5)
+    short = ep.truncate(full, dimensions)
+    assert len(short) == dimensions
+    assert _norm(short) == pytest.approx(1.0, abs=1e-12)
+    # Same direction as the prefix it came from
+    assert _cosine(short, full[:dimensions]) == pytest.approx(1.0, abs=1e-12)
+
+
+def test_truncating_in_steps_matches_truncating_once():
+    full = _embedding(6)
+    stepped = ep.truncate(ep.truncate(full, 512), 256)
+    direct = ep.truncate(full, 256)
+    assert all(abs(x - y) < 1e-12 for x, y in zip(stepped, direct))
+
+
+def test_truncate_after_dequantize_is_a_unit_vector():
+    # Migration path: cached float16/int8 vectors are truncated to a smaller profile
+    for dtype in ep.SUPPORTED_DTYPES:
+        restored = ep.dequantize(ep.quantize(_embedding(7), dtype), dtype)
+        assert _norm(ep.truncate(restored, 256)) == pytest.approx(1.0, abs=1e-12)
+
+
+def test_truncate_leaves_a_zero_vector_alone():
+    assert ep.truncate([0.0] * 4, 2) == [0.0, 0.0]
+
+
+def test_embedding_kwargs_omit_dimensions_at_full_size():
+    assert "dimensions" not in ep.embeddingKwargs(ep.FULL_DIMENSIONS)
+    assert ep.embeddingKwargs(256)["dimensions"] == 256
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import indexing
+
+
+def _write(path, text):
+    path.write_text(text)
+    stats = os.stat(path)
+    return str(path), stats.st_size, stats.st_mtime
+
+
+def _index(path, size, mtime, chunks):
+    return indexing._indexPrepared(path, {"chunks": chunks, "metadata": {"filePath": path}}, size, mtime, False)
+
+
+@pytest.fixture
+def compact(monkeypatch):
+    monkeypatch.setattr(indexing, "VECTOR_PAYLOAD", "compact")
+
+
+def test_rename_reuses_vectors(store, vectors, compact, tmp_path):
+    old = _write(tmp_path / "notes.txt", "alpha beta")
+    assert _index(*old, ["alpha beta"]) == "processed"
+    file_id = store.getFile(old[0])["file_id"]
+
+    os.rename(old[0], tmp_path / "renamed.txt")
+    new = str(tmp_path / "renamed.txt")
+    stats = os.stat(new)
+    assert _index(new, stats.st_size, stats.st_mtime, ["alpha beta"]) == "renamed"
+
+    assert store.getFile(old[0]) is None
+    assert store.getFile(new)["file_id"] == file_id
+    assert vectors.ids() == {f"{file_id}_0"}
+
+
+def test_new_file_at_renamed_path_gets_its_own_id(store, vectors, compact, tmp_path):
+    old = _write(tmp_path / "notes.txt", "alpha beta")
+    _index(*old, ["alpha beta"])
+    renamed_id = store.getFile(old[0])["file_id"]
+    os.rename(old[0], tmp_path / "renamed.txt")
+    stats = os.stat(tmp_path / "renamed.txt")
+    _index(str(tmp_path / "renamed.txt"), stats.st_size, stats.st_mtime, ["alpha beta"])
+
+    # A different file now appears at the old path
+    recreated = _write(tmp_path / "notes.txt", "gamma delta epsilon")
+    assert _index(*recreated, ["gamma delta", "epsilon"]) == "processed"
+
+    new_id = store.getFile(recreated[0])["file_id"]
+    assert new_id != renamed_id
+    assert store.getFileById(renamed_id)["path"] == str(tmp_path / "renamed.txt")
+    assert store.getChunks(renamed_id) == ["alpha beta"]
+    assert vectors.ids() == {f"{renamed_id}_0", f"{new_id}_0", f"{new_id}_1"}
+
+
+def test_new_file_id_is_deterministic(store, tmp_path):
+    path = str(tmp_path / "notes.txt")
+    assert indexing._newFileId(path) == indexing._file_id(path)
+
+    store.recordFile(str(tmp_path / "elsewhere.txt"), indexing._file_id(path), 1, 1.0, 0)
+    taken = indexing._newFileId(path)
+    assert taken != indexing._file_id(path)
+    assert indexing._newFileId(path) == taken
+
+
+def test_unchanged_content_only_updates_manifest(store, vectors, compact, tmp_path):
+    path, size, mtime = _write(tmp_path / "notes.txt", "alpha beta")
+    _index(path, size, mtime, ["alpha beta"])
+    os.utime(path, (mtime + 10, mtime + 10))
+    assert _index(path, size, mtime + 10, ["alpha beta"]) == "updated"
+    assert store.getFile(path)["mtime"] == mtime + 10
+
+
+def test_rename_onto_an_indexed_path_removes_the_overwritten_file(store, vectors, compact, tmp_path):
+    from jobQueue import jobQueue
+
+    moved = _write(tmp_path / "draft.txt", "alpha beta")
+    _index(*moved, ["alpha beta"])
+    target = _write(tmp_path / "final.txt", "gamma delta epsilon")
+    _index(*target, ["gamma delta", "epsilon"])
+    copy = _write(tmp_path / "copy.txt", "gamma delta epsilon")
+    assert _index(*copy, ["gamma delta", "epsilon"]) == "duplicate"
+    moved_id = store.getFile(moved[0])["file_id"]
+    overwritten_id = store.getFile(target[0])["file_id"]
+
+    os.replace(moved[0], target[0])
+    stats = os.stat(target[0])
+    assert _index(target[0], stats.st_size, stats.st_mtime, ["alpha beta"]) == "renamed"
+
+    assert store.getFile(target[0])["file_id"] == moved_id
+    assert store.getChunks(overwritten_id) == []
+    assert vectors.ids() == {f"{moved_id}_0"}
+    # The overwritten file's duplicate lost its canonical file, so it's indexed on its own
+    assert store.getFile(copy[0]) is None
+    assert [job["file_path"] for job in jobQueue.listJobs()] == [copy[0]]
@@ -0,0 +1,136 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import jobQueue as jq
+from indexStore import connect
+
+
+@pytest.fixture
+def queue(store):
+    queue = jq.JobQueue()
+    queue.settle_seconds = 0
+    queue.retry_delay = 0
+    return queue
+
+
+def _setJob(job_id, **columns):
+    assignments = ", ".join(f"{name} = ?" for name in columns)
+    connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+
+def _deadPid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_requests_for_a_pending_file_coalesce(queue, tmp_path):
+    first = queue.enqueue(str(tmp_path / "a.txt"))
+    assert queue.enqueue(str(tmp_path / "a.txt")) == first
+    assert queue.enqueue(str(tmp_path / "b.txt")) != first
+    assert queue.getJob(first)["coalesced"] == 1
+
+
+def test_settle_window_delays_claim(queue, tmp_path):
+    queue.settle_seconds = 60
+    queue.enqueue(str(tmp_path / "a.txt"))
+    assert queue._claim() is None
+
+
+def test_one_running_job_per_file(queue, tmp_path):
+    path = str(tmp_path / "a.txt")
+    queue.enqueue(path)
+    job = queue._claim()
+    assert job["status"] == jq.RUNNING and job["owner"] == jq.OWNER_ID
+
+    follow_up = queue.enqueue(path)
+    assert follow_up != job["id"]
+    assert queue._claim() is None
+
+    queue._finish(job, jq.DONE, result="processed")
+    assert queue._claim()["id"] == follow_up
+
+
+def test_lapsed_lease_is_reclaimed_even_with_a_live_local_owner(queue, tmp_path):
+    job_id = queue.enqueue(str(tmp_path / "a.txt"))
+    queue._claim()
+    # A live PID on this host (e.g. a reused one) does not keep a lapsed lease alive
+    _setJob(job_id, owner=f"{socket.gethostname()}:{os.getpid()}:deadbeef", lease_until=time.time() - 1)
+    assert queue._requeueOrphans() == 1
+    assert queue.getJob(job_id)["status"] == jq.PENDING
+
+
+def test_hung_job_in_this_process_is_reclaimed(queue, tmp_path):
+    job_id = queue.enqueue(str(tmp_path / "a.txt"))
+    hung = queue._claim()
+    _setJob(job_id, started_at=time.time() - queue.max_run_seconds - 1, lease_until=time.time() - 1)
+    queue._renewLeases()
+    assert queue._requeueOrphans() == 1
+
+    rerun = queue._claim()
+    assert rerun["id"] == job_id and rerun["attempts"] == 2
+    # The hung run finishing late must not overwrite the re-run
+    queue._finish(hung, jq.FAILED, error="late")
+    assert queue.getJob(job_id)["status"] == jq.RUNNING
+    queue._finish(rerun, jq.DONE, result="processed")
+    assert queue.getJob(job_id)["result"] == "processed"
+
+
+def test_exited_local_owner_is_reclaimed_before_its_lease_lapses(queue, tmp_path):
+    job_id = queue.enqueue(str(tmp_path / "a.txt"))
+    queue._claim()
+    _setJob(job_id, owner=f"{socket.gethostname()}:{_deadPid()}:deadbeef")
+    assert queue._requeueOrphans() == 1
+
+
+def test_leased_jobs_are_left_alone(queue, tmp_path):
+    remote = queue.enqueue(str(tmp_path / "a.txt"))
+    local = queue.enqueue(str(tmp_path / "b.txt"))
+    queue._claim()
+    queue._claim()
+    _setJob(remote, owner="elsewhere:123:deadbeef")
+    queue._renewLeases()
+    assert queue._requeueOrphans() == 0
+    assert {queue.getJob(remote)["status"], queue.getJob(local)["status"]} == {jq.RUNNING}
+
+
+def test_failed_job_is_retried_then_fails(queue, tmp_path):
+    queue.max_attempts = 2
+    queue.register(jq.INDEX, lambda path: 1 / 0)
+    job_id = queue.enqueue(str(tmp_path / "a.txt"))
+
+    queue._run(queue._claim())
+    assert queue.getJob(job_id)["status"] == jq.PENDING
+    queue._run(queue._claim())
+    job = queue.getJob(job_id)
+    assert job["status"] == jq.FAILED and job["attempts"] == 2
+
+
+def test_failed_job_with_a_newer_request_is_superseded(queue, tmp_path):
+    queue.register(jq.INDEX, lambda path: 1 / 0)
+    path = str(tmp_path / "a.txt")
+    job_id = queue.enqueue(path)
+    job = queue._claim()
+    newer = queue.enqueue(path)
+
+    queue._run(job)
+    assert queue.getJob(job_id)["result"] == "superseded"
+    assert queue.getJob(newer)["status"] == jq.PENDING
+
+
+def test_deterministic_failure_is_not_retried(queue, tmp_path):
+    def missing(path):
+        raise FileNotFoundError(path)
+
+    queue.register(jq.INDEX, missing)
+    job_id = queue.enqueue(str(tmp_path / "a.txt"))
+    queue._run(queue._claim())
+    assert queue.getJob(job_id)["status"] == jq.FAILED
+    assert queue.progress([job_id]) == {
+        jq.PENDING: 0, jq.RUNNING: 0, jq.DONE: 0, jq.FAILED: 1, "total": 1, "progress": 1.0,
+    }
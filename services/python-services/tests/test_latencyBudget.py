@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import search
+from latencyBudget import Budget, StageSkipped, tracker
+from queryCache import QueryCache
+from scheduler import REMOTE
+
+
+def _slow(seconds, value="done", timeout=None):
+    time.sleep(seconds if timeout is None else min(seconds, timeout))
+    if timeout is not None and seconds > timeout:
+        raise TimeoutError("client timed out")
+    return value
+
+
+def test_stage_within_budget_returns_its_result():
+    budget = Budget(1000)
+    assert asyncio.run(budget.stage("fast", _slow, 0.01)) == "done"
+    assert budget.skipped == []
+
+
+def test_stage_past_its_deadline_is_skipped():
+    budget = Budget(100)
+    with pytest.raises(StageSkipped) as e:
+        asyncio.run(budget.stage("slow", _slow, 1.0))
+    assert e.value.reason == "timedOut"
+    assert budget.skipped == ["slow"]
+
+
+def test_failing_stage_is_skipped_as_failed():
+    def fail():
+        raise RuntimeError("upstream down")
+
+    budget = Budget(1000)
+    with pytest.raises(StageSkipped) as e:
+        asyncio.run(budget.stage("broken", fail))
+    assert e.value.reason == "failed"
+
+
+def test_remote_stage_gets_the_time_left_as_client_timeout():
+    seen = []
+
+    def remote(timeout=None):
+        seen.append((timeout, threading.current_thread().name))
+        return "ok"
+
+    budget = Budget(1000)
+    assert asyncio.run(budget.stage("remote", remote, share=0.5, remote=True)) == "ok"
+    assert 0 < seen[0][0] <= 0.5
+    assert seen[0][1].startswith(REMOTE)
+
+    # Without a budget there is no deadline to pass on
+    seen.clear()
+    asyncio.run(Budget(0).stage("remote", remote, remote=True))
+    assert seen[0][0] is None
+
+
+def test_abandoned_call_gives_up_at_the_deadline():
+    finished = []
+
+    def remote(timeout=None):
+        try:
+            return _slow(2.0, timeout=timeout)
+        finally:
+            finished.append(time.perf_counter())
+
+    budget = Budget(100)
+    started = time.perf_counter()
+    with pytest.raises(StageSkipped):
+        asyncio.run(budget.stage("remote", remote, remote=True))
+    time.sleep(0.2)
+    # The worker was released around the deadline, not after the full two seconds
+    assert finished and finished[0] - started < 1.0
+
+
+def test_call_queued_past_its_deadline_never_starts():
+    started = []
+    deadline = time.perf_counter() - 0.01
+
+    async def wait():
+        with pytest.raises(TimeoutError):
+            await Budget(1000)._submit("late", lambda: started.append(1), (), deadline, False)
+    asyncio.run(wait())
+    assert started == []
+
+
+def test_slow_read_is_hedged_and_the_duplicate_wins(monkeypatch):
+    monkeypatch.setattr(tracker, "hedgeDelay", lambda stage: 0.05)
+    calls = []
+
+    def read():
+        calls.append(1)
+        return _slow(1.0 if len(calls) == 1 else 0.01, value=len(calls))
+
+    budget = Budget(800)
+    assert asyncio.run(budget.stage("read", read, hedge=True)) == 2
+    assert len(calls) == 2
+
+
+class _SlowPinecone:
+    def embedQuery(self, query, timeout=None):
+        return _slow(5.0, timeout=timeout)
+
+
+@pytest.fixture
+def slowSearch(store, monkeypatch):
+    cache = QueryCache()
+    monkeypatch.setattr(search, "queryCache", cache)
+    monkeypatch.setattr(search, "PineconeService", _SlowPinecone)
+    monkeypatch.setattr(search, "SEARCH_BUDGET_MS", 100)
+    return cache
+
+
+def test_search_falls_back_to_stale_results(slowSearch):
+    slowSearch.put("quarterly report", [1.0, 0.0], -1, [{"filePath": "/docs/old.txt", "score": 0.9}])
+    response = asyncio.run(search.searchDB_initial("quarterly report"))
+    assert response["fallback"] == "stale"
+    assert response["skipped"] == ["embed", "vectorQuery"]
+    assert [r["filePath"] for r in response["results"]] == ["/docs/old.txt"]
+
+
+def test_search_falls_back_to_keywords_without_a_stale_entry(slowSearch):
+    response = asyncio.run(search.searchDB_initial("quarterly report"))
+    assert response["fallback"] == "keyword"
+    assert response["results"] == []
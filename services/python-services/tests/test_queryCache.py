@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import search
+from queryCache import QueryCache
+
+VECTOR = [1.0, 0.0, 0.5]
+PARAPHRASE = [1.0, 0.01, 0.5]
+UNRELATED = [0.0, 1.0, 0.0]
+
+
+@pytest.fixture
+def cache():
+    return QueryCache(size=8, threshold=0.95)
+
+
+def test_exact_and_paraphrase_hits(cache):
+    cache.put("Math Homework", VECTOR, 1, ["a"])
+    assert cache.byText("math  homework", 1).results == ["a"]
+    assert cache.byVector("math hw", PARAPHRASE, 1).results == ["a"]
+    # The paraphrase is remembered under its own text too
+    assert cache.byText("math hw", 1).results == ["a"]
+    assert cache.byVector("cooking", UNRELATED, 1) is None
+
+
+def test_index_change_invalidates_entries(cache, store):
+    generation = store.generation()
+    cache.put("report", VECTOR, generation, ["a"])
+    store.recordFile("/docs/new.txt", "file_new", 1, 1.0, 0)
+
+    assert store.generation() != generation
+    assert cache.byText("report", store.generation()) is None
+    assert cache.byVector("report", VECTOR, store.generation()) is None
+    # Stale entries stay available for the latency-budget fallback
+    assert cache.byText("report", None).results == ["a"]
+
+
+def test_scopes_do_not_share_entries(cache):
+    cache.put("report", VECTOR, 1, ["everywhere"])
+    cache.put("report", VECTOR, 1, ["work only"], scope="work-1234")
+    assert cache.byText("report", 1).results == ["everywhere"]
+    assert cache.byText("report", 1, "work-1234").results == ["work only"]
+    assert cache.byVector("report", VECTOR, 1, "home-5678") is None
+
+
+def test_rankings_are_cached_per_scope_and_generation(cache):
+    cache.put("report", VECTOR, 1, ["a", "b"], scope="work-1234")
+    cache.putRanking("report", ["a", "b"], 1, ["ranked"], scope="work-1234")
+    assert cache.ranking("report", ["a", "b"], 1, "work-1234") == ["ranked"]
+    assert cache.ranking("report", ["b", "a"], 1, "work-1234") is None
+    assert cache.ranking("report", ["a", "b"], 1) is None
+    assert cache.ranking("report", ["a", "b"], 2, "work-1234") is None
+
+
+class _CountingRanker:
+    def __init__(self):
+        self.calls = 0
+
+    def rank_files_sync(self, query, files, timeout=None):
+        self.calls += 1
+        return {"success": True, "rankedFiles": [{"filePath": f, "summary": "", "rank": 1} for f in files]}
+
+
+def test_scoped_rank_reuses_its_cached_ranking(cache, store, tmp_path, monkeypatch):
+    ranker = _CountingRanker()
+    monkeypatch.setattr(search, "queryCache", cache)
+    monkeypatch.setattr(search, "_ranking_service", ranker)
+    monkeypatch.setattr(search.FileProcessor, "sendToRankingService", staticmethod(lambda paths: paths))
+
+    paths = [str(tmp_path / "a.txt")]
+    cache.put("report", VECTOR, store.generation(), paths, scope=str(tmp_path))
+    first = asyncio.run(search.rankFiles("report", paths, [str(tmp_path)]))
+    second = asyncio.run(search.rankFiles("report", paths, [str(tmp_path)]))
+
+    assert first["cache"] is None and second["cache"] == "ranking"
+    assert ranker.calls == 1
@@ -0,0 +1,57 @@
+import json
+import threading
+
+import pytest
+
+import indexStore
+import queryTrace
+
+
+@pytest.fixture(autouse=True)
+def fresh_key(monkeypatch):
+    monkeypatch.setattr(queryTrace, "_hash_key", None)
+    monkeypatch.setattr(queryTrace, "QUERY_TRACE_SALT", None)
+    monkeypatch.setattr(queryTrace, "QUERY_TRACE_ANONYMIZE", True)
+
+
+def test_anonymized_query_keeps_no_text(store):
+    record = queryTrace.anonymize("Math Homework, math")
+    assert set(record) == {"queryHash", "terms", "queryChars"}
+    assert "math" not in json.dumps(record).lower()
+    # Repeats and term overlap survive hashing
+    assert record["terms"][0] == record["terms"][2]
+    assert queryTrace.anonymize("math homework math")["queryHash"] == record["queryHash"]
+
+
+def test_salt_is_random_per_install_and_persisted(store, tmp_path, monkeypatch):
+    salt = store.traceSalt()
+    assert store.traceSalt() == salt
+    first = queryTrace.anonymize("math")["queryHash"]
+
+    # Another install (index database) hashes the same query differently
+    monkeypatch.setattr(indexStore, "INDEX_DB_PATH", str(tmp_path / "other.db"))
+    monkeypatch.setattr(indexStore, "_local", threading.local())
+    monkeypatch.setattr(queryTrace, "_hash_key", None)
+    assert store.traceSalt() != salt
+    assert queryTrace.anonymize("math")["queryHash"] != first
+
+
+def test_configured_salt_is_shared(store, monkeypatch):
+    monkeypatch.setattr(queryTrace, "QUERY_TRACE_SALT", "shared secret")
+    shared = queryTrace.anonymize("math")["queryHash"]
+    monkeypatch.setattr(queryTrace, "_hash_key", None)
+    assert queryTrace.anonymize("math")["queryHash"] == shared
+
+
+def test_traced_request_writes_one_record(store, tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(queryTrace, "QUERY_TRACE_PATH", str(path))
+    with queryTrace.traced("search", "math homework"):
+        with queryTrace.stage("embed"):
+            pass
+        queryTrace.candidates(["file_1"])
+        queryTrace.cacheEvent("queryCache", hit=False)
+
+    record = json.loads(path.read_text())
+    assert record["endpoint"] == "search" and record["candidates"] == ["file_1"]
+    assert set(record["stagesMs"]) == {"embed"} and record["cache"] == {"queryCache.miss": 1}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import jobQueue as jq
+from reconcile import reconcile
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    (root / "sub").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    for path in ("a.txt", "sub/b.txt", ".hidden/c.txt", "image.xyz"):
+        (root / path).write_text("text")
+    return root
+
+
+def _record(store, path):
+    stats = os.stat(path)
+    store.recordFile(str(path), "file_" + path.name, stats.st_size, stats.st_mtime, 1)
+
+
+def test_diff_against_manifest(store, tree):
+    _record(store, tree / "a.txt")
+    _record(store, tree / "sub" / "b.txt")
+    store.recordFile(str(tree / "gone.txt"), "file_gone", 1, 1.0, 1)
+    (tree / "sub" / "b.txt").write_text("longer text")
+    (tree / "new.txt").write_text("text")
+
+    result = reconcile([str(tree)])
+    assert {k: result[k] for k in ("scanned", "added", "changed", "deleted", "unchanged")} == {
+        "scanned": 3, "added": 1, "changed": 1, "deleted": 1, "unchanged": 1,
+    }
+    jobs = {(job["kind"], os.path.basename(job["file_path"])) for job in jq.jobQueue.listJobs()}
+    assert jobs == {(jq.INDEX, "new.txt"), (jq.INDEX, "b.txt"), (jq.DELETE, "gone.txt")}
+
+
+def test_failed_file_is_not_requeued_until_it_changes(store, tree):
+    queue = jq.JobQueue()
+    queue.max_attempts = 1
+
+    def broken(path):
+        raise RuntimeError("parser crashed")
+
+    queue.register(jq.INDEX, broken)
+    assert reconcile([str(tree)])["added"] == 2
+    while (job := queue._claim()) is not None:
+        queue._run(job)
+
+    result = reconcile([str(tree)])
+    assert (result["added"], result["failedBefore"]) == (0, 2)
+
+    (tree / "a.txt").write_text("edited")
+    result = reconcile([str(tree)])
+    assert (result["added"], result["failedBefore"]) == (1, 1)
+
+
+def test_successful_index_clears_failure(store, tree):
+    store.recordFailure(str(tree / "a.txt"), 1, 1.0, "old failure")
+    store.recordFailure(str(tree / "deleted.txt"), 1, 1.0, "old failure")
+    _record(store, tree / "a.txt")
+    reconcile([str(tree)])
+    assert store.failuresUnder(str(tree)) == {}
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import reconcile
+import search
+import shards
+import snapshot
+from pineconeService import PineconeService
+from queryCache import QueryCache
+from test_snapshot import _freshStore, _indexed
+
+
+@pytest.fixture
+def sharded(store, monkeypatch):
+    monkeypatch.setattr(shards, "SHARDING_ENABLED", True)
+    return store
+
+
+def test_everything_is_in_the_default_namespace_with_sharding_off(store, monkeypatch):
+    monkeypatch.setattr(shards, "SHARDING_ENABLED", False)
+    store.setShardRoot("/docs", "docs")
+    assert shards.namespaceFor("/docs/a.txt") == shards.DEFAULT_NAMESPACE
+    assert shards.allNamespaces() == [shards.DEFAULT_NAMESPACE]
+
+
+def test_longest_root_wins(sharded):
+    shards.register("/home/me", "home")
+    shards.register("/home/me/work", "work")
+    resolve = shards.resolver()
+    assert resolve("/home/me/notes.txt") == "home"
+    assert resolve("/home/me/work/plan.txt") == "work"
+    assert resolve("/home/me/work") == "work"
+    # A sibling that merely shares the prefix isn't inside the root
+    assert resolve("/home/me/workshop/a.txt") == "home"
+    assert resolve("/tmp/a.txt") == shards.DEFAULT_NAMESPACE
+    assert shards.namespaceFor("/home/me/work/a.zip!/inner.txt") == "work"
+
+
+def test_register_roots_keeps_assigned_shards(sharded):
+    shards.register("/home/me/work", "work")
+    shards.registerRoots(["/home/me/work", "/home/me/photos"])
+    assert sharded.shardRoots() == {
+        "/home/me/work": "work",
+        "/home/me/photos": shards.shardName("/home/me/photos"),
+    }
+    assert shards.namespacesForRoots(["/home/me/work/sub", "/elsewhere"]) == ["", "work"]
+    assert shards.rootsOf("work") == ["/home/me/work"]
+
+
+def test_invalid_shard_names_are_rejected(sharded):
+    with pytest.raises(ValueError):
+        shards.register("/docs", "no spaces")
+
+
+def test_snapshot_restores_remapped_shard_roots(sharded, tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "notes.txt").write_text("alpha beta")
+    shards.register(str(docs), "docs")
+    _indexed(sharded, str(docs / "notes.txt"), "file_notes", ["alpha beta"], namespace="docs")
+    path = str(tmp_path / "index.snapshot")
+    snapshot.export(path, use_index=False)
+
+    _freshStore(tmp_path, monkeypatch, "restored.db")
+    moved = tmp_path / "moved"
+    os.rename(docs, moved)
+    snapshot.restore(path, snapshot.parseRemaps([f"{docs}={moved}"]), local_only=True)
+
+    assert sharded.shardRoots() == {str(moved): "docs"}
+    assert sharded.getFile(str(moved / "notes.txt"))["namespace"] == "docs"
+    # Reconciling the moved root finds nothing to re-embed
+    result = reconcile.reconcile([str(moved)])
+    assert (result["added"], result["changed"], result["deleted"]) == (0, 0, 0)
+
+
+class _ScopedIndex:
+    """Vector index stand-in whose matches span the whole disk."""
+
+    hydrateMatches = PineconeService.hydrateMatches
+    _hydrate = staticmethod(PineconeService._hydrate)
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.queries = []
+
+    def embedQuery(self, query, timeout=None):
+        return [1.0, 0.0]
+
+    def vectorQuery(self, embedding, filter=None, top_k=20, namespaces=None, timeout=None):
+        self.queries.append((top_k, namespaces))
+        return [SimpleNamespace(id=f"file_{i}_0", score=1 - i / 100,
+                                metadata={"fileId": f"file_{i}", "filePath": path, "fileName": os.path.basename(path)})
+                for i, path in enumerate(self.paths[:top_k])]
+
+
+@pytest.fixture
+def scopedSearch(store, monkeypatch):
+    index = _ScopedIndex(["/home/me/photos/cat.txt", "/home/me/work/plan.txt",
+                          "/home/me/workshop/saw.txt", "/home/me/work/sub/notes.txt"])
+    monkeypatch.setattr(search, "PineconeService", lambda: index)
+    monkeypatch.setattr(search, "queryCache", QueryCache())
+    monkeypatch.setattr(search, "SEARCH_BUDGET_MS", 0)
+    return index
+
+
+def test_scoped_search_without_shards_keeps_only_hits_under_the_roots(scopedSearch, monkeypatch):
+    monkeypatch.setattr(shards, "SHARDING_ENABLED", False)
+    response = asyncio.run(search.searchDB_initial("plan", ["/home/me/work"]))
+    assert [r["filePath"] for r in response["results"]] == ["/home/me/work/plan.txt", "/home/me/work/sub/notes.txt"]
+    # The default namespace holds everything, so more matches are fetched to filter from
+    assert scopedSearch.queries == [(search.VECTOR_MATCHES * search.SCOPED_OVERFETCH, [""])]
+
+    # An unscoped search of the same query isn't served from the scoped cache entry, or vice versa
+    assert len(asyncio.run(search.searchDB_initial("plan"))["results"]) == 4
+
+
+def test_scoped_search_filters_a_shard_shared_with_other_roots(sharded, scopedSearch):
+    shards.register("/home/me", "home")
+    response = asyncio.run(search.searchDB_initial("plan", ["/home/me/photos"]))
+    assert [r["filePath"] for r in response["results"]] == ["/home/me/photos/cat.txt"]
+    assert scopedSearch.queries == [(search.VECTOR_MATCHES, ["home"])]
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+
+import archives
+import indexStore
+import snapshot
+from embeddingProfile import EMBEDDING_DIMENSIONS
+from jobQueue import jobQueue
+
+
+def _indexed(store, path, file_id, chunks, with_vectors=True, namespace=""):
+    stats = os.stat(archives.splitVirtualPath(path)[0] if archives.isMember(path) else path)
+    store.recordFile(path, file_id, stats.st_size, stats.st_mtime, len(chunks), f"hash-{file_id}",
+                     {"filePath": path, "fileName": os.path.basename(path)}, namespace=namespace)
+    if chunks:
+        store.storeChunks(file_id, chunks, [i * 10 for i in range(len(chunks))])
+    if with_vectors:
+        store.storeVectors(file_id, [[0.5 + i] * EMBEDDING_DIMENSIONS for i in range(len(chunks))], "float32")
+
+
+def _freshStore(tmp_path, monkeypatch, name):
+    monkeypatch.setattr(indexStore, "INDEX_DB_PATH", str(tmp_path / name))
+    monkeypatch.setattr(indexStore, "_local", threading.local())
+
+
+@pytest.fixture
+def exported(store, tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "notes.txt").write_text("alpha beta gamma")
+    (docs / "bundle.zip").write_bytes(b"PK\x05\x06" + b"\x00" * 18)
+
+    _indexed(store, str(docs / "notes.txt"), "file_notes", ["alpha beta", "gamma"])
+    _indexed(store, str(docs / "bundle.zip"), "file_bundle", [])
+    member = archives.virtualPath(str(docs / "bundle.zip"), "inner.txt")
+    _indexed(store, member, "file_inner", ["inner text"], with_vectors=False)
+
+    path = str(tmp_path / "index.snapshot")
+    summary = snapshot.export(path, use_index=False)
+    assert summary == {"files": 3, "chunks": 3, "vectors": 2, "withoutVectors": 1}
+
+    _freshStore(tmp_path, monkeypatch, "restored.db")
+    return path, docs
+
+
+def test_round_trip_restores_files_chunks_and_ids(exported, store):
+    path, docs = exported
+    counts = snapshot.restore(path, local_only=True)
+    assert counts["files"] == 2 and counts["chunks"] == 2
+
+    notes = store.getFile(str(docs / "notes.txt"))
+    assert notes["file_id"] == "file_notes"
+    assert notes["content_hash"] == "hash-file_notes"
+    assert store.getChunks("file_notes") == ["alpha beta", "gamma"]
+    assert store.isUnchanged(str(docs / "notes.txt"), notes["size"], notes["mtime"], "")
+
+
+def test_members_without_vectors_requeue_their_archive(exported, store):
+    path, docs = exported
+    archive = str(docs / "bundle.zip")
+    counts = snapshot.restore(path, local_only=True)
+    assert counts["queued"] == 1
+
+    # The archive's own row must not let its index job skip it as unchanged
+    stats = os.stat(archive)
+    assert not store.isUnchanged(archive, stats.st_size, stats.st_mtime, "")
+    assert store.getFile(archive)["file_id"] == "file_bundle"
+    member = store.getFile(archives.virtualPath(archive, "inner.txt"))
+    assert (member["size"], member["mtime"]) == (-1, -1)
+    assert [job["file_path"] for job in jobQueue.listJobs()] == [archive]
+
+
+def test_remap_rewrites_paths(exported, store, tmp_path):
+    path, docs = exported
+    moved = tmp_path / "moved"
+    os.rename(docs, moved)
+    snapshot.restore(path, snapshot.parseRemaps([f"{docs}={moved}"]), local_only=True)
+
+    notes = store.getFile(str(moved / "notes.txt"))
+    assert notes["file_id"] == "file_notes"
+    assert notes["metadata"]["filePath"] == str(moved / "notes.txt")
+    assert store.getFile(str(docs / "notes.txt")) is None
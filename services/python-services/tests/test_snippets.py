@@ -0,0 +1,86 @@
+import time
+
+import snippets
+from snippets import snippetsFor
+
+
+def _chunked(store, path, file_id, chunks, canonical_id=None):
+    store.recordFile(path, file_id, 1, 1.0, 0 if canonical_id else len(chunks), canonical_id=canonical_id)
+    if not canonical_id:
+        offsets, cursor = [], 0
+        for chunk in chunks:
+            offsets.append(cursor)
+            cursor += len(chunk)
+        store.storeChunks(file_id, chunks, offsets)
+
+
+def _highlighted(snippet):
+    return [snippet["text"][s:e] for s, e in snippet["highlights"]]
+
+
+def test_highlights_are_relative_to_the_snippet(store):
+    chunks = ["Nothing relevant here at all. ", "The quarterly reports were filed late. ",
+              "More filler text without matches. "]
+    _chunked(store, "/docs/a.txt", "file_a", chunks)
+    result = snippetsFor("/docs/a.txt", "quarterly report")
+
+    assert result["status"] == "ok"
+    best = result["snippets"][0]
+    assert best["chunkIndex"] == 1
+    assert best["start"] == len(chunks[0])
+    assert _highlighted(best) == ["quarterly", "reports"]
+
+
+def test_best_window_covers_the_densest_matches(store):
+    text = "report " + "filler " * 100 + "budget report budget " + "filler " * 100
+    _chunked(store, "/docs/long.txt", "file_long", [text])
+    best = snippetsFor("/docs/long.txt", "budget report", width=60)["snippets"][0]
+    assert _highlighted(best) == ["budget", "report", "budget"]
+    assert text[best["start"]:best["start"] + len(best["text"])] == best["text"]
+
+
+def test_duplicates_use_their_canonical_files_chunks(store):
+    _chunked(store, "/docs/original.txt", "file_orig", ["Meeting notes about the budget."])
+    _chunked(store, "/backup/copy.txt", "file_copy", [], canonical_id="file_orig")
+    result = snippetsFor("/backup/copy.txt", "budget")
+    assert result["filePath"] == "/backup/copy.txt"
+    assert _highlighted(result["snippets"][0]) == ["budget"]
+
+
+def test_unchunked_files_fall_back_to_the_content_cache(store):
+    content = "filler " * 1000 + "the invoice total is due " + "filler " * 1000
+    store.cacheContent("/docs/scan.png", content, {})
+    result = snippetsFor("/docs/scan.png", "invoice")
+
+    snippet = result["snippets"][0]
+    assert snippet["chunkIndex"] is None
+    assert content[snippet["start"]:snippet["start"] + len(snippet["text"])] == snippet["text"]
+    assert _highlighted(snippet) == ["invoice"]
+
+
+def test_unknown_files_are_not_indexed(store):
+    assert snippetsFor("/docs/missing.txt", "anything")["status"] == "not-indexed"
+
+
+def test_many_matches_stay_fast(store):
+    # A common term thousands of times over, in one cached document
+    content = "data point recorded. " * 5000
+    store.cacheContent("/docs/data.log", content, {})
+    started = time.perf_counter()
+    result = snippetsFor("/docs/data.log", "data")
+    assert time.perf_counter() - started < 0.25
+    assert len(result["snippets"]) == snippets.MAX_SNIPPETS
+
+
+def test_window_sweep_matches_brute_force():
+    text = "".join("term " if i % 7 in (0, 1, 5) else "word " for i in range(400))
+    spans = [(i, i + 4) for i in range(0, len(text), 5) if text[i:i + 4] == "term"]
+    width = 60
+
+    def covered(start, end):
+        return sum(1 for s, e in spans if s >= start and e <= end)
+
+    starts = [max(0, min(anchor - width // 4, len(text) - width)) for anchor, _ in spans]
+    best = max(covered(start, start + width) for start in starts)
+    lo, hi = snippets._bestWindow(text, spans, width)
+    assert covered(lo, hi) >= best
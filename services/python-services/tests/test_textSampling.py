@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+import parsers
+import textSampling
+from parsers import FileProcessor
+
+BUDGET = 16 * 1024
+# Notes, separators and the JSON key summary come on top of the sampled bytes
+OVERHEAD = 4 * 1024
+
+
+def _csv(rows: int) -> bytes:
+    return b"id,name,amount\n" + b"".join(b"%d,name-%d,%d.50\n" % (i, i, i * 3) for i in range(rows))
+
+
+def _jsonLines(records: int) -> bytes:
+    return b"".join(json.dumps({"id": i, "user": f"u{i}", "event": "click"}).encode() + b"\n"
+                    for i in range(records))
+
+
+def _log(lines: int) -> bytes:
+    return b"".join(b"2026-01-01 12:00:%06d INFO request handled in %d ms\n" % (i, i % 97) for i in range(lines))
+
+
+def _within(sampled: str, budget: int = BUDGET) -> None:
+    assert len(sampled.encode()) <= budget + OVERHEAD
+
+
+def test_csv_keeps_the_header_and_samples_rows_across_the_file():
+    data = _csv(100_000)
+    sampled = textSampling.sample(data, ".csv", BUDGET)
+    _within(sampled)
+    lines = sampled.splitlines()
+    assert lines[0] == "id,name,amount"
+    assert lines[1].startswith("[Sampled ~")
+    ids = [int(line.split(",")[0]) for line in lines[2:] if line]
+    # Every stratum contributes, so rows come from the start, middle and end
+    assert min(ids) < 1000 and max(ids) > 90_000
+    assert any(40_000 < i < 60_000 for i in ids)
+    # Rows are never cut mid-line
+    assert all(len(line.split(",")) == 3 for line in lines[2:] if line)
+
+
+def test_json_lines_lists_keys_and_samples_records():
+    sampled = textSampling.sample(_jsonLines(50_000), ".json", BUDGET)
+    _within(sampled)
+    note = sampled.splitlines()[0]
+    assert note.startswith("[JSON Lines,")
+    assert "id (" in note and "user (" in note and "event (" in note
+    records = [json.loads(line) for line in sampled.splitlines()[1:] if line.startswith("{")]
+    assert records[0]["id"] == 0 and records[-1]["id"] > 45_000
+
+
+def test_single_json_document_is_sampled_in_windows():
+    data = json.dumps({"items": [{"sku": f"s{i}", "price": i} for i in range(50_000)]}, indent=1).encode()
+    sampled = textSampling.sample(data, ".json", BUDGET)
+    _within(sampled)
+    assert sampled.startswith("[JSON,")
+    assert "sku (" in sampled.splitlines()[0]
+
+
+def test_log_keeps_head_and_tail():
+    data = _log(100_000)
+    sampled = textSampling.sample(data, ".log", BUDGET)
+    _within(sampled)
+    assert sampled.startswith("2026-01-01 12:00:000000")
+    assert sampled.rstrip().endswith(data.rstrip().rsplit(b"\n", 1)[1].decode())
+    assert "bytes omitted" in sampled
+
+
+def test_other_text_is_head_plus_windows():
+    data = b"".join(b"paragraph %d of a very long text file\n" % i for i in range(100_000))
+    sampled = textSampling.sample(data, ".txt", BUDGET)
+    _within(sampled)
+    assert sampled.startswith("paragraph 0 ")
+    assert sampled.count("\n...\n") == 8
+
+
+def test_lines_longer_than_the_scan_limit_are_still_bounded():
+    data = b"x" * (4 * 1024 * 1024)
+    for file_type in (".csv", ".json", ".log", ".txt"):
+        _within(textSampling.sample(data, file_type, BUDGET))
+
+
+def test_small_files_are_read_whole_and_large_ones_sampled(tmp_path, monkeypatch):
+    monkeypatch.setattr(textSampling, "TEXT_FULL_READ_BYTES", 64 * 1024)
+    small = tmp_path / "small.log"
+    small.write_bytes(_log(100))
+    assert textSampling.extractText(str(small)) == _log(100).decode()
+
+    large = tmp_path / "large.log"
+    large.write_bytes(_log(100_000))
+    _within(textSampling.extractText(str(large)), textSampling.TEXT_BYTE_BUDGET)
+    _within(textSampling.extractBytes(_log(100_000), ".log"), textSampling.TEXT_BYTE_BUDGET)
+
+
+@pytest.fixture
+def chunkCap(monkeypatch):
+    monkeypatch.setattr(parsers, "MAX_CHUNKS_PER_FILE", 50)
+    monkeypatch.setattr(parsers.tokenizer, "CHUNK_UNIT", "chars")
+
+
+def _parsed(file_type: str, content: str) -> dict:
+    return {"content": content, "metadata": {"fileName": "f" + file_type, "fileType": file_type}}
+
+
+def test_plain_text_is_capped_at_the_chunk_budget(chunkCap):
+    content = "".join(f"sentence {i} of the sampled text. " for i in range(5000))
+    prepared = FileProcessor.prepareForPinecone("big.txt", parsed=_parsed(".txt", content))
+    assert len(prepared["chunks"]) == 50
+    assert len(prepared["offsets"]) == 50
+    # Evenly spaced: the last kept chunk is from near the end of the file
+    assert prepared["offsets"][-1] > len(content) * 0.9
+
+
+def test_documents_are_never_capped(chunkCap):
+    content = "".join(f"sentence {i} of a long report. " for i in range(5000))
+    prepared = FileProcessor.prepareForPinecone("report.pdf", parsed=_parsed(".pdf", content))
+    assert len(prepared["chunks"]) > 50
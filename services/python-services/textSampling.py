@@ -0,0 +1,143 @@
+"""Size-aware extraction for plain-text files (text, code, CSV, JSON, logs).
+
+Small files are read whole. Past TEXT_FULL_READ_BYTES, the file is memory-mapped and
+only a sample of at most TEXT_BYTE_BUDGET bytes is decoded, so memory and embedding
+cost per file stay bounded however large the file is:
+
+    .csv    header row plus rows sampled evenly across the file (stratified by offset)
+    .json   key/schema summary plus sampled records (JSON Lines) or sampled windows
+    .log    head and tail
+    other   head plus evenly spaced windows
+
+    TEXT_FULL_READ_BYTES   1 MB
+    TEXT_BYTE_BUDGET       256 KB
+"""
+
+import json
+import mmap
+import os
+import re
+from collections import Counter
+
+TEXT_FULL_READ_BYTES = int(os.getenv("TEXT_FULL_READ_BYTES", str(1024 * 1024)))
+TEXT_BYTE_BUDGET = int(os.getenv("TEXT_BYTE_BUDGET", str(256 * 1024)))
+
+STRATA = 32
+# How far to look for a line break before cutting mid-line (minified JSON, binary-ish logs)
+MAX_LINE_SCAN = 64 * 1024
+_JSON_KEY = re.compile(rb'"([^"\\\n]{1,64})"\s*:')
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="ignore")
+
+
+def _nextLine(buf, pos: int) -> int:
+    """Offset of the first line starting at or after pos."""
+    if pos <= 0:
+        return 0
+    if pos >= len(buf):
+        return len(buf)
+    newline = buf.find(b"\n", pos - 1, pos - 1 + MAX_LINE_SCAN)
+    return pos if newline < 0 else newline + 1
+
+
+def _window(buf, start: int, size: int) -> bytes:
+    """Up to `size` bytes of whole lines starting at the first line boundary >= start."""
+    begin = _nextLine(buf, start)
+    end = min(len(buf), begin + size)
+    if end < len(buf):
+        last_newline = buf.rfind(b"\n", begin, end)
+        if last_newline > begin:
+            end = last_newline + 1
+    return buf[begin:end]
+
+
+def _stratified(buf, offset: int, budget: int, strata: int = STRATA) -> list[bytes]:
+    """Windows spread evenly over buf[offset:], together about `budget` bytes."""
+    span = len(buf) - offset
+    per_window = max(1, budget // strata)
+    return [_window(buf, offset + i * span // strata, per_window) for i in range(strata)]
+
+
+def _estimateLines(buf, sample: bytes) -> int:
+    return int(len(buf) * sample.count(b"\n") / max(1, len(sample)))
+
+
+def sampleCsv(buf, budget: int) -> str:
+    # A header row longer than a quarter of the budget (no line breaks at all?) is cut
+    limit = min(MAX_LINE_SCAN, budget // 4)
+    end = buf.find(b"\n", 0, limit)
+    header = buf[:end + 1] if end >= 0 else buf[:limit]
+    rows = _stratified(buf, len(header), max(STRATA, budget - len(header)))
+    sampled = sum(r.count(b"\n") for r in rows)
+    note = f"[Sampled ~{sampled} of ~{_estimateLines(buf, b''.join(rows))} rows]\n"
+    return _decode(header) + note + _decode(b"".join(rows))
+
+
+def sampleJson(buf, budget: int) -> str:
+    head = _window(buf, 0, budget // 4)
+    windows = _stratified(buf, len(head), budget - budget // 4)
+
+    # JSON Lines if the first lines each parse as a JSON value on their own
+    first_lines = [line for line in head.split(b"\n")[:5] if line.strip()]
+    try:
+        for line in first_lines:
+            json.loads(line)
+        is_lines = len(first_lines) > 1
+    except ValueError:
+        is_lines = False
+
+    # Key sampling: field names seen across the sampled regions, most common first
+    keys = Counter()
+    for part in [head, *windows]:
+        keys.update(match.decode("utf-8", errors="ignore") for match in _JSON_KEY.findall(part))
+    schema = ", ".join(f"{key} ({count})" for key, count in keys.most_common(50))
+
+    kind = "JSON Lines" if is_lines else "JSON"
+    note = f"[{kind}, {len(buf)} bytes, sampled. Keys: {schema}]\n"
+    return note + _decode(head) + "\n...\n" + "\n...\n".join(_decode(w) for w in windows)
+
+
+def sampleLog(buf, budget: int) -> str:
+    head = _window(buf, 0, budget // 2)
+    tail = _window(buf, len(buf) - budget // 2, budget // 2)
+    note = f"\n[... {len(buf) - len(head) - len(tail)} bytes omitted ...]\n"
+    return _decode(head) + note + _decode(tail)
+
+
+def sampleText(buf, budget: int) -> str:
+    head = _window(buf, 0, budget // 4)
+    windows = _stratified(buf, len(head), budget - budget // 4, strata=8)
+    return _decode(head) + "\n...\n" + "\n...\n".join(_decode(w) for w in windows)
+
+
+def sample(buf, file_type: str, budget: int = TEXT_BYTE_BUDGET) -> str:
+    """Sample a large text buffer (bytes or mmap) according to its type."""
+    if file_type == ".csv":
+        return sampleCsv(buf, budget)
+    if file_type == ".json":
+        return sampleJson(buf, budget)
+    if file_type == ".log":
+        return sampleLog(buf, budget)
+    return sampleText(buf, budget)
+
+
+def extractText(fileName: str) -> str:
+    """Read a text file — whole if small, otherwise an mmap-backed sample."""
+    size = os.path.getsize(fileName)
+    if size <= TEXT_FULL_READ_BYTES:
+        with open(fileName, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+
+    file_type = os.path.splitext(fileName)[1].lower()
+    with open(fileName, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return sample(buf, file_type)
+
+
+def extractBytes(data: bytes, file_type: str) -> str:
+    """Same policy for an in-memory file (e.g. an archive member)."""
+    if len(data) <= TEXT_FULL_READ_BYTES:
+        return _decode(data)
+    return sample(data, file_type)
@@ -0,0 +1,120 @@
+"""Token counting for embedding batches and token-based chunking.
+
+Uses tiktoken (exact counts for the OpenAI embedding models). If it is missing or
+its encoding can't be loaded (it is downloaded on first use unless TIKTOKEN_CACHE_DIR
+has it), counts are estimated: 2 ASCII characters and 1 non-ASCII character per
+token. English prose runs ~4 characters per token and code, numbers and CSV ~2.5-3,
+so the estimate errs high and estimated batches stay under the provider's limits.
+
+    CHUNK_UNIT             chars (default) | tokens
+    CHUNK_TOKENS           128 — chunk size in token mode
+    CHUNK_OVERLAP_TOKENS   25
+"""
+
+import math
+import os
+import threading
+
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "128"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "25"))
+
+if CHUNK_UNIT not in ("chars", "tokens"):
+    raise ValueError(f"CHUNK_UNIT must be chars or tokens, got {CHUNK_UNIT}")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _getEncoding():
+    """The cl100k_base encoding, or None if tiktoken isn't installed. Loaded on first use."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except ImportError:
+                    _encoding = None
+                except Exception as e:
+                    print(f"tiktoken encoding unavailable, estimating token counts: {e}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def _charTokens(ch: str) -> float:
+    return 0.5 if ch < "\x80" else 1.0
+
+
+def countTokens(text: str) -> int:
+    encoding = _getEncoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = len(text.encode("ascii", errors="ignore"))
+    return math.ceil(ascii_chars / 2 + (len(text) - ascii_chars))
+
+
+def truncateToTokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    encoding = _getEncoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    budget = float(max_tokens)
+    for i, ch in enumerate(text):
+        budget -= _charTokens(ch)
+        if budget < 0:
+            return text[:i]
+    return text
+
+
+def chunkByTokens(content: str, chunk_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Split content into chunks of about chunk_tokens tokens, overlapping by `overlap` tokens."""
+    if not content:
+        return []
+    step = max(1, chunk_tokens - overlap)
+
+    encoding = _getEncoding()
+    if encoding is not None:
+        tokens = encoding.encode(content, disallowed_special=())
+        chunks = []
+        for start in range(0, len(tokens), step):
+            chunks.append(encoding.decode(tokens[start:start + chunk_tokens]).strip())
+            if start + chunk_tokens >= len(tokens):
+                break
+        return [c for c in chunks if c]
+
+    # Estimated: token offset of every character, then cut at the nearest whitespace
+    offsets = []
+    total = 0.0
+    for ch in content:
+        offsets.append(total)
+        total += _charTokens(ch)
+
+    def charAt(token_offset: float) -> int:
+        lo, hi = 0, len(offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if offsets[mid] < token_offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    chunks = []
+    start_token = 0.0
+    while True:
+        start = charAt(start_token)
+        end = charAt(start_token + chunk_tokens)
+        if end < len(content):
+            space = content.rfind(" ", start, end)
+            if space > start + (end - start) // 2:
+                end = space
+        chunks.append(content[start:end].strip())
+        if end >= len(content):
+            break
+        start_token = max(offsets[end] - overlap, start_token + 1) if end < len(offsets) else total
+    return [c for c in chunks if c]
@@ -0,0 +1,70 @@
+"""Background warm-up — builds API clients and opens connection pools after startup.
+
+The service answers requests as soon as the port is bound ("up"); the first
+search only avoids client construction and connection setup once warm-up
+has finished ("warm"). /ready reports which of the two we are in. With
+WARM_ON_STARTUP=0 there is no warm-up to wait for, so the service is ready but
+"cold" from the start.
+"""
+
+import threading
+import time
+
+WARMING = "warming"
+WARM = "warm"
+# Warm-up disabled — ready, with clients built on first use
+COLD = "cold"
+FAILED = "failed"
+
+
+class Warmup:
+
+    def __init__(self):
+        self.status = WARMING
+        self.error = None
+        # stage name -> seconds taken
+        self.stages: dict[str, float] = {}
+        self._started_at = None
+        self._thread = None
+
+    def _stage(self, name: str, fn) -> None:
+        start = time.perf_counter()
+        fn()
+        self.stages[name] = round(time.perf_counter() - start, 4)
+
+    def _run(self) -> None:
+        # Imported here so none of this is paid for at module load
+        from pineconeService import PineconeService
+        from search import getRankingService
+
+        try:
+            self._stage("vectorStore", PineconeService().warm)
+            self._stage("ranking", getRankingService)
+            self.status = WARM
+            print(f"Warm-up complete in {time.perf_counter() - self._started_at:.2f}s: {self.stages}")
+        except Exception as e:
+            # Not fatal — requests fall back to initializing on first use
+            self.status = FAILED
+            self.error = str(e)
+            print(f"Warm-up failed: {e}")
+
+    def skip(self) -> None:
+        if self._thread is None:
+            self.status = COLD
+
+    def ready(self) -> bool:
+        return self.status in (WARM, COLD)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def state(self) -> dict:
+        return {"status": self.status, "stages": self.stages, "error": self.error}
+
+
+# Shared process-wide warm-up state
+warmup = Warmup()
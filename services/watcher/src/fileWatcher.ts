@@ -1,6 +1,6 @@
 import chokidar, { type FSWatcher } from 'chokidar';
 import { stat } from 'node:fs/promises';
-import { onFileAdded, onFileChanged } from './handlers.js';
+import { fetchJobProgress, onFileAdded, onFileChanged, reconcileRoots } from './handlers.js';
 
 export interface FileWatcherOptions {
   paths: string[];
@@ -9,6 +9,8 @@ export interface FileWatcherOptions {
   onIndexingComplete?: () => void;
 }
 
+const PROGRESS_POLL_MS = 1000;
+
 type FileMetadata = {
   mtimeMs: number;
   size: number;
@@ -20,6 +22,9 @@ export class FileWatcherService {
   private readonly knownFiles = new Map<string, FileMetadata>();
   private watcher: FSWatcher | null = null;
   private metadataTimer: ReturnType<typeof setInterval> | null = null;
+  private progressTimer: ReturnType<typeof setInterval> | null = null;
+  // Initial-scan files are synced in one /reconcile call instead of one request each
+  private readonly reconcileOnStart = process.env.WATCH_RECONCILE !== '0';
   private metadataCheckInFlight = false;
 
   // Indexing progress tracking
@@ -28,6 +33,7 @@ export class FileWatcherService {
   private filesToProcess = 0;
   private filesProcessed = 0;
   private initialScanComplete = false;
+  private chokidarReady = false;
   private pendingAddHandlers = 0;
   private indexingDone = false;
 
@@ -67,6 +73,11 @@ export class FileWatcherService {
         console.log('[watcher] File removed:', filePath);
       })
       .on('ready', () => {
+        this.chokidarReady = true;
+        if (this.reconcileOnStart) {
+          void this.reconcileInitialScan();
+          return;
+        }
         this.initialScanComplete = true;
         console.log('[watcher] Initial scan complete. Files to process:', this.filesToProcess);
         this.checkIndexingComplete();
@@ -94,6 +105,11 @@ export class FileWatcherService {
       this.metadataTimer = null;
     }
 
+    if (this.progressTimer) {
+      clearInterval(this.progressTimer);
+      this.progressTimer = null;
+    }
+
     if (this.watcher) {
       await this.watcher.close();
       this.watcher = null;
@@ -103,6 +119,7 @@ export class FileWatcherService {
     this.filesToProcess = 0;
     this.filesProcessed = 0;
     this.initialScanComplete = false;
+    this.chokidarReady = false;
     this.pendingAddHandlers = 0;
     this.indexingDone = false;
   }
@@ -124,20 +141,72 @@ export class FileWatcherService {
     }
   }
 
+  private async reconcileInitialScan(): Promise<void> {
+    // Let in-flight add handlers record their files first
+    while (this.pendingAddHandlers > 0) {
+      await new Promise((resolve) => setTimeout(resolve, 50));
+    }
+
+    const jobIds = await reconcileRoots(this.paths);
+    if (!jobIds) {
+      // Document processor unreachable or too old — fall back to one request per file
+      for (const filePath of this.knownFiles.keys()) {
+        this.sendAdded(filePath);
+      }
+    } else {
+      this.filesToProcess += jobIds.length;
+      this.emitProgress();
+      if (jobIds.length > 0) {
+        this.trackReconcileJobs(jobIds);
+      }
+    }
+
+    this.initialScanComplete = true;
+    console.log('[watcher] Initial scan complete. Files to process:', this.filesToProcess);
+    this.checkIndexingComplete();
+  }
+
+  private trackReconcileJobs(jobIds: number[]): void {
+    let finished = 0;
+    this.progressTimer = setInterval(async () => {
+      const progress = await fetchJobProgress(jobIds);
+      if (!progress) return;
+
+      const nowFinished = progress.done + progress.failed;
+      this.filesProcessed += nowFinished - finished;
+      finished = nowFinished;
+      this.emitProgress();
+
+      if (finished >= progress.total && this.progressTimer) {
+        clearInterval(this.progressTimer);
+        this.progressTimer = null;
+        this.checkIndexingComplete();
+      }
+    }, PROGRESS_POLL_MS);
+    this.progressTimer.unref();
+  }
+
+  private sendAdded(filePath: string): void {
+    this.filesToProcess++;
+    this.emitProgress();
+    onFileAdded(filePath, () => {
+      this.filesProcessed++;
+      this.emitProgress();
+      this.checkIndexingComplete();
+    });
+  }
+
   private async handleAdd(filePath: string): Promise<void> {
     try {
       const metadata = await this.readMetadata(filePath);
       if (!metadata) return;
 
       this.knownFiles.set(filePath, metadata);
-      this.filesToProcess++;
-      this.emitProgress();
+      // Files from the initial scan are covered by /reconcile
+      if (this.reconcileOnStart && !this.chokidarReady) return;
+
       console.log('[watcher] File added:', filePath);
-      onFileAdded(filePath, () => {
-        this.filesProcessed++;
-        this.emitProgress();
-        this.checkIndexingComplete();
-      });
+      this.sendAdded(filePath);
     } catch (error) {
       console.error('[watcher] Failed to process added file:', filePath, error);
     }
@@ -4,6 +4,14 @@ const DOCUMENT_PROCESSOR_URL =
 
 const MAX_CONCURRENT = 3;
 
+type JobProgress = {
+  pending: number;
+  running: number;
+  done: number;
+  failed: number;
+  total: number;
+};
+
 type QueueItem = {
   filePath: string;
   onComplete?: () => void;
@@ -60,3 +68,48 @@ async function sendToDocumentProcessor(filePath: string): Promise<void> {
     console.error('[watcher] Failed to send to document processor:', filePath, error);
   }
 }
+
+// Bulk startup sync: the document processor crawls the roots itself and enqueues only
+// added/changed/deleted files. Returns the queued job IDs, or null if the call failed.
+export async function reconcileRoots(roots: string[]): Promise<number[] | null> {
+  try {
+    const response = await fetch(new URL('/reconcile', DOCUMENT_PROCESSOR_URL), {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ roots }),
+    });
+
+    if (!response.ok) {
+      const body = await response.text();
+      console.error(`[watcher] Reconcile failed: ${response.status} ${body}`);
+      return null;
+    }
+
+    const result = await response.json();
+    console.log(
+      `[watcher] Reconciled ${result.scanned} files: ${result.added} added, ` +
+        `${result.changed} changed, ${result.deleted} deleted`
+    );
+    return result.jobIds as number[];
+  } catch (error) {
+    console.error('[watcher] Failed to reconcile:', error);
+    return null;
+  }
+}
+
+export async function fetchJobProgress(jobIds: number[]): Promise<JobProgress | null> {
+  try {
+    const response = await fetch(new URL('/jobs/progress', DOCUMENT_PROCESSOR_URL), {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ jobIds }),
+    });
+    return response.ok ? ((await response.json()) as JobProgress) : null;
+  } catch {
+    return null;
+  }
+}
@@ -1,2 +1,2 @@
 export { FileWatcherService } from "./fileWatcher.js";
-export { onFileAdded, onFileChanged } from "./handlers.js";
+export { onFileAdded, onFileChanged, reconcileRoots } from "./handlers.js";